@@ -0,0 +1,65 @@
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import FileResponse, JSONResponse, Response
+from starlette.routing import Route
+
+from chat_app.services import backend_client
+from chat_app.services.admission import admission
+from chat_app.services.answer_cache import answer_cache
+from chat_app.services.blob_store import BLOB_MEDIA_TYPES, BLOB_URL_PREFIX, blob_store
+from chat_app.services.conversations import conversations
+from chat_app.services.generations import generations
+from chat_app.services.semantic_cache import semantic_cache
+from chat_app.services.single_flight import query_flights
+from chat_app.services.warmup import warmer
+
+
+async def metrics(request: Request) -> JSONResponse:
+    """Expose in-process counters (cache sizing, backend load) as JSON."""
+
+    return JSONResponse(
+        {
+            "answer_cache": answer_cache.stats(),
+            "semantic_cache": semantic_cache.stats(),
+            "query_flights": query_flights.stats(),
+            "generations": generations.stats(),
+            "admission": admission.stats(),
+            "backend_endpoints": backend_client.endpoints.stats(),
+            "backend_resilience": backend_client.resilience_stats(),
+            "warmups": warmer.stats(),
+            "conversations": conversations.stats(),
+        }
+    )
+
+
+async def blob(request: Request) -> Response:
+    """Serve a content-addressed upload with long-lived caching headers.
+
+    Blob names are derived from their content, so a URL never changes
+    meaning: the name doubles as the ETag and clients may cache forever.
+    The media type comes from the store's own allowlist, never from
+    guessing, and browsers are told not to sniff another one.
+    """
+
+    name = request.path_params["name"]
+    path = blob_store.path_for(name)
+    if path is None or not path.is_file():
+        return Response(status_code=404)
+    headers = {
+        "ETag": f'"{path.name}"',
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "X-Content-Type-Options": "nosniff",
+    }
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    media_type = BLOB_MEDIA_TYPES.get(path.suffix.lower(), "application/octet-stream")
+    return FileResponse(path, headers=headers, media_type=media_type)
+
+
+# Extra HTTP routes mounted alongside the Reflex backend.
+api = Starlette(
+    routes=[
+        Route("/api/metrics", metrics),
+        Route(f"{BLOB_URL_PREFIX}/{{name:path}}", blob),
+    ]
+)
@@ -1,6 +1,14 @@
 import reflex as rx
+from chat_app.api import api
 from chat_app.components.chat_interface import chat_interface
 from chat_app.components.preset_cards import preset_cards
+from chat_app.services import backend_client
+from chat_app.services.blob_store import blob_store
+from chat_app.services.conversations import conversations
+from chat_app.services.generations import generations
+from chat_app.services.job_queue import job_queue
+from chat_app.services.template_catalogue import template_catalogue
+from chat_app.states.chat_state import ChatState
 from chat_app.states.layout_state import LayoutState
 
 
@@ -323,6 +331,28 @@ def assistant_page() -> rx.Component:
             rx.alert_dialog.description(
                 LayoutState.assistant_dialog_message,
             ),
+            # Per-document ingest status, updated live while the
+            # knowledge base is being built.
+            rx.el.ul(
+                rx.foreach(
+                    LayoutState.ingest_progress,
+                    lambda item: rx.el.li(
+                        rx.el.span(item["name"], class_name="truncate"),
+                        rx.el.span(
+                            item["status"],
+                            class_name=rx.match(
+                                item["status"],
+                                ("done", "text-emerald-600"),
+                                ("failed", "text-red-600"),
+                                ("ingesting", "text-blue-600"),
+                                "text-gray-400",
+                            ),
+                        ),
+                        class_name="flex justify-between gap-4 text-sm text-gray-700",
+                    ),
+                ),
+                class_name="mt-3 mb-3 flex flex-col gap-1 max-h-48 overflow-y-auto",
+            ),
             rx.alert_dialog.action(
                 rx.button(
                     "OK",
@@ -360,8 +390,16 @@ def index() -> rx.Component:
     return rx.hstack(sidebar(), rx.box(preset_cards(), width="100%"))
 
 
-app = rx.App(theme=rx.theme(appearance="light"))
-app.add_page(index, route="/", title="Dashboard")
+app = rx.App(theme=rx.theme(appearance="light"), api_transformer=api)
+app.register_lifespan_task(backend_client.lifespan)
+app.register_lifespan_task(job_queue.lifespan)
+app.register_lifespan_task(template_catalogue.lifespan)
+app.register_lifespan_task(generations.lifespan, rx_app=app)
+app.register_lifespan_task(conversations.lifespan)
+app.register_lifespan_task(blob_store.lifespan)
+app.add_page(
+    index, route="/", title="Dashboard", on_load=LayoutState.watch_catalogue
+)
 
 
 def chat_page() -> rx.Component:
@@ -369,5 +407,7 @@ def chat_page() -> rx.Component:
     return rx.hstack(sidebar(), rx.box(chat_interface(), width="100%"))
 
 
-app.add_page(chat_page, route="/chat", title="Chat")
+app.add_page(
+    chat_page, route="/chat", title="Chat", on_load=ChatState.load_history
+)
 app.add_page(assistant_page, route="/assistant-studio", title="Assistant Studio")
@@ -1,7 +1,7 @@
 import reflex as rx
 
 from chat_app.components.input_area import input_area
-from chat_app.components.message_bubble import message_bubble
+from chat_app.components.message_bubble import message_bubble, queued_bubble
 from chat_app.states.chat_state import ChatState
 
 
@@ -11,14 +11,27 @@ def chat_interface() -> rx.Component:
     main_section = rx.cond(
         ChatState.messages,
         rx.auto_scroll(
+            # Long conversations are loaded a page at a time, newest first.
+            rx.cond(
+                ChatState.has_older_messages,
+                rx.el.button(
+                    "Load earlier messages",
+                    on_click=ChatState.load_older,
+                    type="button",
+                    class_name="self-center text-xs text-gray-500 hover:text-gray-700",
+                ),
+            ),
             rx.foreach(
                 ChatState.messages,
                 lambda m, i: message_bubble(
                     m["text"],
                     m["is_ai"],
                     i == ChatState.messages.length() - 1,
+                    (i == ChatState.messages.length() - 1) & ChatState.typing,
+                    ChatState.queue_position,
                 ),
             ),
+            rx.foreach(ChatState.pending_messages, queued_bubble),
             class_name="flex flex-col gap-4 pb-24 pt-6",
             # class_name="text-gray-500 text-sm mt-8 text-center"
         ),
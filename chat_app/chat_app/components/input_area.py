@@ -32,18 +32,15 @@ def input_area() -> rx.Component:
                         on_click=ChatState.clear_messages,
                     ),
                 ),
+                # Never disabled: messages sent while a reply is being
+                # generated are queued and answered next.
                 rx.el.button(
-                    rx.cond(
-                        ChatState.typing,
-                        rx.icon("loader-circle", class_name="animate-spin"),
-                        rx.icon("arrow-up"),
-                    ),
+                    rx.icon("arrow-up"),
                     class_name=(
                         "self-end rounded-full bg-blue-500 text-white p-2 "
                         "disabled:opacity-50 shadow-sm size-9 inline-flex "
                         "items-center justify-center"
                     ),
-                    disabled=ChatState.typing,
                 ),
                 class_name=(
                     "flex flex-row mb-2 peer-placeholder-shown:[&>*:last-child]:opacity-50 "
@@ -3,8 +3,19 @@ import reflex as rx
 from chat_app.components.typing_indicator import typing_indicator
 
 
-def ai_bubble(message: str, is_last: bool = False) -> rx.Component:
-    """Assistant (AI) message with avatar on the left."""
+def ai_bubble(
+    message: str,
+    is_last: bool = False,
+    is_streaming: bool = False,
+    queue_position: int = 0,
+) -> rx.Component:
+    """Assistant (AI) message with avatar on the left.
+
+    While the reply is empty the typing indicator is shown, along with the
+    query's place in the queue if it is waiting for a backend slot; as
+    soon as the first streamed chunk lands the partial text replaces it,
+    followed by a blinking caret until the stream finishes.
+    """
 
     return rx.el.div(
         # Avatar column
@@ -19,10 +30,33 @@ def ai_bubble(message: str, is_last: bool = False) -> rx.Component:
         rx.el.div(
             rx.cond(
                 message,
-                rx.el.p(message, class_name="text-sm sm:text-base"),
+                rx.el.p(
+                    message,
+                    rx.cond(
+                        is_streaming,
+                        rx.el.span(
+                            class_name=(
+                                "inline-block w-1.5 h-4 ml-0.5 align-middle "
+                                "bg-gray-400 animate-pulse"
+                            ),
+                        ),
+                    ),
+                    class_name="text-sm sm:text-base",
+                ),
                 rx.cond(
                     is_last,
-                    typing_indicator(),
+                    rx.el.div(
+                        rx.cond(
+                            queue_position > 0,
+                            rx.el.p(
+                                "Waiting for a free assistant: you are #",
+                                queue_position,
+                                " in the queue.",
+                                class_name="text-xs text-gray-500",
+                            ),
+                        ),
+                        typing_indicator(),
+                    ),
                 ),
             ),
             class_name=(
@@ -42,7 +76,7 @@ def user_bubble(message: str) -> rx.Component:
         rx.el.div(class_name="size-8"),
         # User bubble aligned to the right
         rx.el.div(
-            rx.el.p(message, class_name="text-sm sm:text-base"),
+            rx.el.p(message, class_name="text-sm sm:text-base whitespace-pre-line"),
             class_name=(
                 "text-white px-3 py-2 bg-blue-500 rounded-2xl w-fit max-w-[90%] "
                 "ml-auto mr-12 shadow-sm"
@@ -52,13 +86,33 @@ def user_bubble(message: str) -> rx.Component:
     )
 
 
+def queued_bubble(message: str) -> rx.Component:
+    """A follow-up the user sent while the previous reply was streaming."""
+
+    return rx.el.div(
+        rx.el.div(
+            rx.el.p(message, class_name="text-sm sm:text-base"),
+            rx.el.p("Queued", class_name="text-xs text-blue-100 mt-1"),
+            class_name=(
+                "text-white px-3 py-2 bg-blue-500/60 rounded-2xl w-fit max-w-[90%] "
+                "ml-auto mr-12 shadow-sm"
+            ),
+        ),
+        class_name="w-full flex flex-col mx-auto max-w-3xl px-6 pl-[4.75rem]",
+    )
+
+
 def message_bubble(
-    message: str, is_ai: bool = False, is_last: bool = False
+    message: str,
+    is_ai: bool = False,
+    is_last: bool = False,
+    is_streaming: bool = False,
+    queue_position: int = 0,
 ) -> rx.Component:
     return rx.el.div(
         rx.cond(
             is_ai,
-            ai_bubble(message, is_last),
+            ai_bubble(message, is_last, is_streaming, queue_position),
             user_bubble(message),
         ),
         class_name="w-full flex flex-col gap-4 mx-auto max-w-3xl px-6",
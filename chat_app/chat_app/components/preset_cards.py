@@ -1,5 +1,8 @@
 import reflex as rx
 
+from chat_app.services.blob_store import blob_src
+from chat_app.services.images import THUMBNAIL_SIZES
+from chat_app.services.warmup import WARMUP_ON_HOVER
 from chat_app.states.chat_state import ChatState
 from chat_app.states.layout_state import LayoutState
 
@@ -10,28 +13,85 @@ def template_card(
     description: str,
     tag_color: str = "purple-500",
     knowledge_base_id: str | None = None,
+    status: str = "ready",
+    avif_srcset: str = "",
+    webp_srcset: str = "",
 ) -> rx.Component:
     """Large template-style card with image, title, and tag.
 
     Clicking the card selects the assistant (knowledge base) and
     navigates to the dedicated chat page, where the user can then
-    type their question.
+    type their question. While the assistant's knowledge base is still
+    being ingested the card shows a badge and is not clickable.
+
+    Images are served as resized AVIF/WebP thumbnails when available,
+    falling back to the original file, and load lazily. Hovering a card
+    starts warming its knowledge base (see ``WARMUP_ON_HOVER``).
     """
 
+    hover = {"on_mouse_enter": ChatState.warm_up(knowledge_base_id)}
+
     button = rx.el.button(
         # Outer card container
         rx.el.div(
             # Top image area
-            rx.el.img(
-                src=image_src,
-                class_name="w-full h-40 object-cover rounded-t-3xl",
+            rx.el.picture(
+                rx.cond(
+                    avif_srcset != "",
+                    rx.el.source(
+                        src_set=blob_src(avif_srcset),
+                        sizes=THUMBNAIL_SIZES,
+                        type="image/avif",
+                    ),
+                ),
+                rx.cond(
+                    webp_srcset != "",
+                    rx.el.source(
+                        src_set=blob_src(webp_srcset),
+                        sizes=THUMBNAIL_SIZES,
+                        type="image/webp",
+                    ),
+                ),
+                rx.el.img(
+                    src=blob_src(image_src),
+                    loading="lazy",
+                    decoding="async",
+                    class_name="w-full h-40 object-cover rounded-t-3xl",
+                ),
             ),
             # Bottom text area
             rx.el.div(
-                rx.el.p(
-                    title,
-                    class_name="text-lg md:text-xl font-medium text-gray-900",
-                    # class_name="text-base md:text-lg font-medium text-gray-900",
+                rx.el.div(
+                    rx.el.p(
+                        title,
+                        class_name="text-lg md:text-xl font-medium text-gray-900",
+                        # class_name="text-base md:text-lg font-medium text-gray-900",
+                    ),
+                    rx.match(
+                        status,
+                        (
+                            "building",
+                            rx.el.span(
+                                "Building...",
+                                class_name=(
+                                    "text-xs font-medium text-blue-700 bg-blue-50 "
+                                    "rounded-full px-2 py-0.5 animate-pulse"
+                                ),
+                            ),
+                        ),
+                        (
+                            "failed",
+                            rx.el.span(
+                                "Failed",
+                                class_name=(
+                                    "text-xs font-medium text-red-700 bg-red-50 "
+                                    "rounded-full px-2 py-0.5"
+                                ),
+                            ),
+                        ),
+                        rx.fragment(),
+                    ),
+                    class_name="flex items-center justify-between gap-2",
                 ),
                 rx.el.div(
                     rx.el.span(
@@ -55,13 +115,67 @@ def template_card(
         # types into the input area on the /chat page.
         on_click=ChatState.select_assistant(knowledge_base_id),
         type="button",
-        class_name="w-full max-w-md focus:outline-none",
+        disabled=status != "ready",
+        class_name="w-full max-w-md focus:outline-none disabled:cursor-wait",
+        **(hover if WARMUP_ON_HOVER else {}),
     )
 
     # Wrap the button in a link so that clicking a preset both seeds
     # the conversation and navigates to the chat page where the user
-    # can continue chatting.
-    return rx.link(button, href="/chat", underline="none")
+    # can continue chatting. Assistants that are not ready stay put.
+    return rx.cond(
+        status == "ready",
+        rx.link(button, href="/chat", underline="none"),
+        button,
+    )
+
+
+def dashboard_search() -> rx.Component:
+    return rx.el.div(
+        rx.icon("search", size=16, class_name="text-gray-400"),
+        rx.el.input(
+            placeholder="Search assistants",
+            default_value=LayoutState.dashboard_query,
+            on_change=LayoutState.set_dashboard_query.debounce(300),
+            class_name="w-full bg-transparent text-sm focus:outline-none",
+        ),
+        class_name=(
+            "flex items-center gap-2 w-full max-w-sm bg-white border "
+            "rounded-full px-4 py-2"
+        ),
+    )
+
+
+def dashboard_pagination() -> rx.Component:
+    button_class = (
+        "text-sm font-medium px-3 py-1.5 rounded-full border bg-white "
+        "hover:bg-gray-50 disabled:opacity-40 disabled:cursor-not-allowed"
+    )
+    return rx.el.div(
+        rx.el.button(
+            "Previous",
+            on_click=LayoutState.prev_dashboard_page,
+            disabled=LayoutState.dashboard_page_number <= 1,
+            type="button",
+            class_name=button_class,
+        ),
+        rx.el.span(
+            "Page ",
+            LayoutState.dashboard_page_number,
+            " of ",
+            LayoutState.dashboard_page_count,
+            class_name="text-sm text-gray-500",
+        ),
+        rx.el.button(
+            "Next",
+            on_click=LayoutState.next_dashboard_page,
+            disabled=LayoutState.dashboard_page_number
+            >= LayoutState.dashboard_page_count,
+            type="button",
+            class_name=button_class,
+        ),
+        class_name="flex items-center justify-center gap-4 w-full",
+    )
 
 
 def preset_cards() -> rx.Component:
@@ -78,7 +192,15 @@ def preset_cards() -> rx.Component:
                 "Instanda AI Agentic Assistant",
                 class_name="text-2xl md:text-3xl font-medium",
             ),
-            class_name="text-black flex flex-row gap-4 items-center mb-6",
+            class_name="text-black flex flex-row gap-4 items-center",
+        ),
+        dashboard_search(),
+        rx.cond(
+            LayoutState.dashboard_total == 0,
+            rx.el.p(
+                "No assistants match your search.",
+                class_name="text-sm text-gray-500",
+            ),
         ),
         rx.el.div(
             rx.foreach(
@@ -89,10 +211,17 @@ def preset_cards() -> rx.Component:
                     card["description"],
                     card.get("tag_color", "purple-500"),
                     card.get("knowledge_base_id"),
+                    card.get("status", "ready"),
+                    card.get("image_avif_srcset", ""),
+                    card.get("image_webp_srcset", ""),
                 ),
             ),
             class_name="gap-8 grid grid-cols-1 lg:grid-cols-2 w-full",
         ),
+        rx.cond(
+            LayoutState.dashboard_page_count > 1,
+            dashboard_pagination(),
+        ),
         class_name=(
             "flex flex-col justify-center items-start gap-8 w-full max-w-[72rem] "
             "mx-auto px-12 py-12"
@@ -0,0 +1,221 @@
+import asyncio
+import collections
+import contextlib
+import os
+from typing import AsyncIterator, Awaitable, Callable, Iterator
+
+
+# Backend queries a worker runs at once, in total and per knowledge base.
+ADMISSION_GLOBAL_LIMIT = int(os.environ.get("ADMISSION_GLOBAL_LIMIT", "32"))
+ADMISSION_PER_KB_LIMIT = int(os.environ.get("ADMISSION_PER_KB_LIMIT", "8"))
+
+# Queries waiting beyond this many are rejected straight away rather than
+# queued behind a backlog they would time out in.
+ADMISSION_MAX_QUEUE = int(os.environ.get("ADMISSION_MAX_QUEUE", "100"))
+
+
+class AdmissionRejected(RuntimeError):
+    """Raised when the admission queue is full and a query is shed."""
+
+
+class _Waiter:
+    def __init__(self, knowledge_base_id: str, session: str):
+        self.knowledge_base_id = knowledge_base_id
+        self.session = session
+        self.admitted = False
+        # Set whenever the waiter is admitted or its queue position moves.
+        self.wake = asyncio.Event()
+
+
+class AdmissionController:
+    """Caps concurrent backend queries, queueing the excess fairly.
+
+    At most ``global_limit`` queries run at once, and at most
+    ``per_kb_limit`` for any one knowledge base, so a burst on a popular
+    assistant cannot starve the others. Queued queries are admitted
+    round-robin across knowledge bases, and within a knowledge base
+    round-robin across sessions. Once ``max_queue`` queries are waiting,
+    new ones are shed with AdmissionRejected.
+    """
+
+    def __init__(
+        self,
+        global_limit: int = ADMISSION_GLOBAL_LIMIT,
+        per_kb_limit: int = ADMISSION_PER_KB_LIMIT,
+        max_queue: int = ADMISSION_MAX_QUEUE,
+    ):
+        self.global_limit = global_limit
+        self.per_kb_limit = per_kb_limit
+        self.max_queue = max_queue
+        self._active = 0
+        self._active_by_kb: collections.Counter[str] = collections.Counter()
+        # knowledge base -> session -> that session's waiters, oldest first.
+        # Both levels are kept in round-robin order: whoever was just
+        # served moves to the back.
+        self._queues: collections.OrderedDict[
+            str, collections.OrderedDict[str, collections.deque[_Waiter]]
+        ] = collections.OrderedDict()
+        self._waiting = 0
+        self.admitted = 0
+        self.shed = 0
+
+    def _has_capacity(self, knowledge_base_id: str) -> bool:
+        return (
+            self._active < self.global_limit
+            and self._active_by_kb[knowledge_base_id] < self.per_kb_limit
+        )
+
+    def _start(self, knowledge_base_id: str) -> None:
+        self._active += 1
+        self._active_by_kb[knowledge_base_id] += 1
+        self.admitted += 1
+
+    def _take_next(self, knowledge_base_id: str) -> _Waiter:
+        sessions = self._queues[knowledge_base_id]
+        session, waiters = next(iter(sessions.items()))
+        waiter = waiters.popleft()
+        if waiters:
+            sessions.move_to_end(session)
+        else:
+            del sessions[session]
+        if sessions:
+            self._queues.move_to_end(knowledge_base_id)
+        else:
+            del self._queues[knowledge_base_id]
+        self._waiting -= 1
+        return waiter
+
+    def _dispatch(self) -> None:
+        """Admit queued queries while there is capacity for them."""
+
+        moved = False
+        while self._active < self.global_limit:
+            knowledge_base_id = next(
+                (kb for kb in self._queues if self._has_capacity(kb)), None
+            )
+            if knowledge_base_id is None:
+                break
+            waiter = self._take_next(knowledge_base_id)
+            self._start(knowledge_base_id)
+            waiter.admitted = True
+            waiter.wake.set()
+            moved = True
+        if moved:
+            # Everyone behind them moved up.
+            for sessions in self._queues.values():
+                for waiters in sessions.values():
+                    for waiter in waiters:
+                        waiter.wake.set()
+
+    def _fair_order(self) -> Iterator[_Waiter]:
+        """The queue in the order it would drain, ignoring the caps."""
+
+        queues = [
+            collections.deque(collections.deque(w) for w in sessions.values())
+            for sessions in self._queues.values()
+        ]
+        while queues:
+            sessions = queues.pop(0)
+            waiters = sessions.popleft()
+            yield waiters.popleft()
+            if waiters:
+                sessions.append(waiters)
+            if sessions:
+                queues.append(sessions)
+
+    def position(self, waiter: _Waiter) -> int:
+        """1-based place of a queued waiter."""
+
+        for i, queued in enumerate(self._fair_order(), start=1):
+            if queued is waiter:
+                return i
+        return 0
+
+    def _remove(self, waiter: _Waiter) -> None:
+        sessions = self._queues[waiter.knowledge_base_id]
+        waiters = sessions[waiter.session]
+        waiters.remove(waiter)
+        if not waiters:
+            del sessions[waiter.session]
+        if not sessions:
+            del self._queues[waiter.knowledge_base_id]
+        self._waiting -= 1
+        for sessions in self._queues.values():
+            for waiters in sessions.values():
+                for queued in waiters:
+                    queued.wake.set()
+
+    async def acquire(
+        self,
+        knowledge_base_id: str,
+        session: str,
+        on_position: Callable[[int], Awaitable[None]] | None = None,
+    ) -> None:
+        """Wait for a slot, reporting queue positions to ``on_position``."""
+
+        if not self._waiting and self._has_capacity(knowledge_base_id):
+            self._start(knowledge_base_id)
+            return
+        if self._waiting >= self.max_queue:
+            self.shed += 1
+            raise AdmissionRejected(
+                "The assistants are very busy right now; please try again "
+                "in a minute."
+            )
+
+        waiter = _Waiter(knowledge_base_id, session)
+        sessions = self._queues.setdefault(
+            knowledge_base_id, collections.OrderedDict()
+        )
+        sessions.setdefault(session, collections.deque()).append(waiter)
+        self._waiting += 1
+        self._dispatch()
+        reported = None
+        try:
+            while not waiter.admitted:
+                waiter.wake.clear()
+                position = self.position(waiter)
+                if on_position is not None and position != reported:
+                    await on_position(position)
+                    reported = position
+                    continue
+                await waiter.wake.wait()
+        except BaseException:
+            if waiter.admitted:
+                self.release(knowledge_base_id)
+            else:
+                self._remove(waiter)
+            raise
+
+    def release(self, knowledge_base_id: str) -> None:
+        self._active -= 1
+        self._active_by_kb[knowledge_base_id] -= 1
+        if not self._active_by_kb[knowledge_base_id]:
+            del self._active_by_kb[knowledge_base_id]
+        self._dispatch()
+
+    @contextlib.asynccontextmanager
+    async def slot(
+        self,
+        knowledge_base_id: str,
+        session: str,
+        on_position: Callable[[int], Awaitable[None]] | None = None,
+    ) -> AsyncIterator[None]:
+        """Hold an admission slot for the duration of the block."""
+
+        await self.acquire(knowledge_base_id, session, on_position)
+        try:
+            yield
+        finally:
+            self.release(knowledge_base_id)
+
+    def stats(self) -> dict:
+        return {
+            "active": self._active,
+            "waiting": self._waiting,
+            "admitted": self.admitted,
+            "shed": self.shed,
+        }
+
+
+admission = AdmissionController()
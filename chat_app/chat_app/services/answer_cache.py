@@ -0,0 +1,212 @@
+import asyncio
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+
+# Maximum number of answers kept in memory per worker.
+ANSWER_CACHE_MAX_ENTRIES = int(os.environ.get("ANSWER_CACHE_MAX_ENTRIES", "1024"))
+
+# How long (seconds) a cached answer stays valid. 0 disables expiry.
+ANSWER_CACHE_TTL = float(os.environ.get("ANSWER_CACHE_TTL", "3600"))
+
+# Optional SQLite file for the on-disk tier; empty disables it.
+ANSWER_CACHE_PATH = os.environ.get("ANSWER_CACHE_PATH", "")
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalise_query(query: str) -> str:
+    """Canonical form of a question used as the cache key.
+
+    Case, surrounding/inner whitespace and trailing punctuation do not
+    change the answer, so they are folded away.
+    """
+
+    return _WHITESPACE_RE.sub(" ", query.strip().lower()).rstrip(" ?!.")
+
+
+class AnswerCache:
+    """Two-tier answer cache keyed on ``(knowledge_base_id, query)``.
+
+    The memory tier is a bounded LRU; the optional disk tier is a SQLite
+    table so answers survive restarts and are shared between workers on
+    the same host. Entries expire after ``ttl`` seconds and can be
+    invalidated per knowledge base when it is re-ingested.
+
+    Each answer is also stored with the content version of its knowledge
+    base (see `chat_app.services.kb_versions`) and only served under that
+    version, so an ingest on another worker invalidates it here too.
+
+    Memory hits are answered on the event loop; the disk tier is only
+    touched from a worker thread, so a slow disk never stalls other
+    sessions.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+        ttl: float = ANSWER_CACHE_TTL,
+        path: str | Path | None = ANSWER_CACHE_PATH or None,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[tuple[str, str], tuple[str, float, int]] = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+        # Guards the SQLite connection, separately from the memory tier so
+        # the event loop never waits for a disk operation.
+        self._db_lock = threading.Lock()
+        self._db: sqlite3.Connection | None = None
+        # Invalidations per knowledge base, so a disk read that raced
+        # with one is not put back into memory.
+        self._invalidations: dict[str, int] = {}
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(path), check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                " knowledge_base_id TEXT NOT NULL,"
+                " query TEXT NOT NULL,"
+                " answer TEXT NOT NULL,"
+                " expires_at REAL NOT NULL,"
+                " version INTEGER NOT NULL DEFAULT 0,"
+                " PRIMARY KEY (knowledge_base_id, query))"
+            )
+            columns = {
+                row[1] for row in self._db.execute("PRAGMA table_info(answers)")
+            }
+            if "version" not in columns:
+                # Files written before answers were versioned.
+                self._db.execute(
+                    "ALTER TABLE answers ADD COLUMN version INTEGER NOT NULL DEFAULT 0"
+                )
+            self._db.commit()
+
+    def _expiry(self) -> float:
+        return time.time() + self.ttl if self.ttl > 0 else float("inf")
+
+    def _remember(
+        self, key: tuple[str, str], answer: str, expires_at: float, version: int
+    ):
+        self._entries[key] = (answer, expires_at, version)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _db_execute(self, sql: str, params: tuple) -> tuple | None:
+        """Run one statement on the disk tier; blocking."""
+
+        with self._db_lock:
+            row = self._db.execute(sql, params).fetchone()
+            self._db.commit()
+        return row
+
+    async def get(
+        self, knowledge_base_id: str, query: str, version: int = 0
+    ) -> str | None:
+        """Return the cached answer, or None on a miss or expired entry.
+
+        Answers cached under another ``version`` of the knowledge base
+        are misses.
+        """
+
+        key = (knowledge_base_id, normalise_query(query))
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                answer, expires_at, entry_version = entry
+                if expires_at > now and entry_version == version:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return answer
+                del self._entries[key]
+            invalidations = self._invalidations.get(knowledge_base_id, 0)
+
+        row = None
+        if self._db is not None:
+            row = await asyncio.to_thread(
+                self._db_execute,
+                "SELECT answer, expires_at FROM answers"
+                " WHERE knowledge_base_id = ? AND query = ? AND version = ?",
+                (*key, version),
+            )
+        with self._lock:
+            if row is not None and row[1] > now:
+                if self._invalidations.get(knowledge_base_id, 0) == invalidations:
+                    self._remember(key, row[0], row[1], version)
+                self.hits += 1
+                self.disk_hits += 1
+                return row[0]
+            self.misses += 1
+            return None
+
+    async def set(
+        self, knowledge_base_id: str, query: str, answer: str, version: int = 0
+    ) -> None:
+        """Store an answer in both tiers.
+
+        ``version`` must be the knowledge base's version read *before*
+        the answer was fetched, so an ingest racing with the fetch leaves
+        the answer stale rather than current.
+        """
+
+        key = (knowledge_base_id, normalise_query(query))
+        expires_at = self._expiry()
+        with self._lock:
+            self._remember(key, answer, expires_at, version)
+        if self._db is not None:
+            await asyncio.to_thread(
+                self._db_execute,
+                "INSERT OR REPLACE INTO answers"
+                " (knowledge_base_id, query, answer, expires_at, version)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (*key, answer, expires_at, version),
+            )
+
+    async def invalidate(self, knowledge_base_id: str) -> None:
+        """Drop every cached answer for a knowledge base."""
+
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == knowledge_base_id]:
+                del self._entries[key]
+            self._invalidations[knowledge_base_id] = (
+                self._invalidations.get(knowledge_base_id, 0) + 1
+            )
+        if self._db is not None:
+            await asyncio.to_thread(
+                self._db_execute,
+                "DELETE FROM answers WHERE knowledge_base_id = ?",
+                (knowledge_base_id,),
+            )
+
+    def stats(self) -> dict:
+        """Hit/miss counters used to size the cache."""
+
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+answer_cache = AnswerCache()
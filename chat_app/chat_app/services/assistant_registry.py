@@ -0,0 +1,212 @@
+import contextlib
+import json
+import time
+import uuid
+from pathlib import Path
+
+from chat_app.services import storage
+
+
+# Built-in/legacy assistant definitions, imported into the registry the
+# first time it starts.
+TEMPLATES_JSON_PATH = (
+    Path(__file__).resolve().parent.parent / "assets" / "assistant_templates.json"
+)
+
+# Fields mirrored into their own columns so they can be indexed.
+_INDEXED_FIELDS = ("knowledge_base_id", "content_hash", "status")
+
+
+def _load_templates_from_file(path: Path = TEMPLATES_JSON_PATH) -> list[dict]:
+    """Load assistant templates from the JSON file.
+
+    Tolerant of missing/invalid files.
+    """
+
+    try:
+        if path.exists():
+            with path.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+                return data if isinstance(data, list) else []
+        return []
+    except (OSError, json.JSONDecodeError):
+        return []
+
+
+class AssistantRegistry:
+    """Concurrency-safe store of assistant definitions.
+
+    Backed by SQLite in WAL mode: every insert/update is a single atomic
+    transaction (so concurrent creations, even from different Reflex
+    workers, never lose each other's writes), lookups by id,
+    ``knowledge_base_id`` and ``content_hash`` hit indexes, and listings
+    are paginated in creation order. The full entry is kept as JSON so new
+    template fields need no schema change.
+    """
+
+    def __init__(self, db_name: str = "assistants.db"):
+        self.db_name = db_name
+        self._initialised = False
+
+    @property
+    def path(self) -> Path:
+        """Location of the SQLite database file."""
+
+        return storage.DATA_DIR / self.db_name
+
+    def _connect(self):
+        db = storage.connect(self.db_name)
+        if not self._initialised:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS assistants ("
+                " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " id TEXT NOT NULL UNIQUE,"
+                " knowledge_base_id TEXT,"
+                " content_hash TEXT,"
+                " status TEXT,"
+                " data TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " updated_at REAL NOT NULL)"
+            )
+            db.execute(
+                "CREATE INDEX IF NOT EXISTS assistants_kb"
+                " ON assistants (knowledge_base_id)"
+            )
+            db.execute(
+                "CREATE INDEX IF NOT EXISTS assistants_content_hash"
+                " ON assistants (content_hash)"
+            )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+            )
+            self._migrate_from_json(db)
+            self._initialised = True
+        return db
+
+    def _migrate_from_json(self, db) -> None:
+        """One-off import of ``assistant_templates.json`` into the registry."""
+
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            done = db.execute(
+                "SELECT 1 FROM meta WHERE key = 'migrated_from_json'"
+            ).fetchone()
+            if done is None:
+                for entry in _load_templates_from_file():
+                    entry.setdefault("id", uuid.uuid4().hex)
+                    self._insert(db, entry)
+                db.execute(
+                    "INSERT INTO meta VALUES ('migrated_from_json', ?)",
+                    (str(time.time()),),
+                )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _insert(db, entry: dict) -> None:
+        now = time.time()
+        db.execute(
+            "INSERT INTO assistants (id, knowledge_base_id, content_hash, status,"
+            " data, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                entry["id"],
+                *(entry.get(field) for field in _INDEXED_FIELDS),
+                json.dumps(entry),
+                now,
+                now,
+            ),
+        )
+
+    def insert(self, entry: dict) -> dict:
+        """Add a new assistant; an ``id`` is assigned if missing."""
+
+        entry = {"id": uuid.uuid4().hex, **entry}
+        with contextlib.closing(self._connect()) as db:
+            self._insert(db, entry)
+        return entry
+
+    def update(self, assistant_id: str, **fields) -> dict | None:
+        """Merge ``fields`` into an assistant; returns it, or None if missing."""
+
+        with contextlib.closing(self._connect()) as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                row = db.execute(
+                    "SELECT data FROM assistants WHERE id = ?", (assistant_id,)
+                ).fetchone()
+                if row is None:
+                    db.execute("ROLLBACK")
+                    return None
+                entry = {**json.loads(row["data"]), **fields}
+                db.execute(
+                    "UPDATE assistants SET knowledge_base_id = ?, content_hash = ?,"
+                    " status = ?, data = ?, updated_at = ? WHERE id = ?",
+                    (
+                        *(entry.get(field) for field in _INDEXED_FIELDS),
+                        json.dumps(entry),
+                        time.time(),
+                        assistant_id,
+                    ),
+                )
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        return entry
+
+    def delete(self, assistant_id: str) -> dict | None:
+        """Remove an assistant; returns it, or None if missing."""
+
+        with contextlib.closing(self._connect()) as db:
+            row = db.execute(
+                "DELETE FROM assistants WHERE id = ? RETURNING data", (assistant_id,)
+            ).fetchone()
+        return json.loads(row["data"]) if row is not None else None
+
+    def get(self, assistant_id: str) -> dict | None:
+        with contextlib.closing(self._connect()) as db:
+            row = db.execute(
+                "SELECT data FROM assistants WHERE id = ?", (assistant_id,)
+            ).fetchone()
+        return json.loads(row["data"]) if row is not None else None
+
+    def find_by_knowledge_base(self, knowledge_base_id: str) -> list[dict]:
+        with contextlib.closing(self._connect()) as db:
+            rows = db.execute(
+                "SELECT data FROM assistants WHERE knowledge_base_id = ?"
+                " ORDER BY seq",
+                (knowledge_base_id,),
+            ).fetchall()
+        return [json.loads(row["data"]) for row in rows]
+
+    def find_ingested(self, content_hash: str) -> dict | None:
+        """A ready assistant whose knowledge base has exactly this content."""
+
+        with contextlib.closing(self._connect()) as db:
+            row = db.execute(
+                "SELECT data FROM assistants WHERE content_hash = ?"
+                " AND knowledge_base_id IS NOT NULL"
+                " AND coalesce(status, 'ready') = 'ready'"
+                " ORDER BY seq LIMIT 1",
+                (content_hash,),
+            ).fetchone()
+        return json.loads(row["data"]) if row is not None else None
+
+    def list_assistants(self, offset: int = 0, limit: int | None = None) -> list[dict]:
+        """Assistants in creation order, optionally one page at a time."""
+
+        with contextlib.closing(self._connect()) as db:
+            rows = db.execute(
+                "SELECT data FROM assistants ORDER BY seq LIMIT ? OFFSET ?",
+                (-1 if limit is None else limit, offset),
+            ).fetchall()
+        return [json.loads(row["data"]) for row in rows]
+
+    def count(self) -> int:
+        with contextlib.closing(self._connect()) as db:
+            return db.execute("SELECT count(*) FROM assistants").fetchone()[0]
+
+
+assistant_registry = AssistantRegistry()
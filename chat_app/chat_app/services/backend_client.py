@@ -0,0 +1,616 @@
+import asyncio
+import contextlib
+import json
+import os
+import secrets
+import time
+from typing import AsyncIterable, AsyncIterator, Callable
+
+import httpx
+
+from chat_app.services.endpoint_pool import Endpoint, EndpointPool, is_replica_failure
+from chat_app.services.local_engine import local_engine, spool_file
+from chat_app.services.resilience import (
+    CircuitBreaker,
+    LatencyTracker,
+    RetryBudget,
+    backoff_delay,
+)
+
+
+# Base URL of the llama-faq retrieval/LLM service. Both the chat query
+# and the knowledge base ingest endpoints live under this prefix.
+LLAMA_FAQ_BASE_URL = os.environ.get(
+    "LLAMA_FAQ_BASE_URL", "http://localhost:9000/llama-faq"
+).rstrip("/")
+
+# Replicas of the service, comma-separated. Requests are balanced across
+# them; defaults to the single LLAMA_FAQ_BASE_URL.
+LLAMA_FAQ_BASE_URLS = [
+    url.strip().rstrip("/")
+    for url in os.environ.get("LLAMA_FAQ_BASE_URLS", LLAMA_FAQ_BASE_URL).split(",")
+    if url.strip()
+]
+
+# Route each knowledge base's queries to the same replica (while it is
+# healthy and not overloaded), so its caches stay warm there.
+KB_AFFINITY = os.environ.get("LLAMA_FAQ_KB_AFFINITY", "0").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+# Which engine ingests documents and answers queries:
+# - "remote": the llama-faq service (default);
+# - "local": the in-process BM25 engine (offline use, load tests);
+# - "hybrid": the remote service, with documents also indexed locally so
+#   queries whose terms all appear in one passage are answered directly.
+ENGINE = os.environ.get("CHAT_ENGINE", "remote").lower()
+
+# Share of a query's terms the best local passage must contain for the
+# hybrid engine to answer it without the remote service.
+LOCAL_FASTPATH_COVERAGE = float(os.environ.get("LOCAL_FASTPATH_COVERAGE", "1.0"))
+
+QUERY_PATH = "/query"
+INGEST_PATH = "/ingest"
+
+# Endpoint asked to load a knowledge base ahead of its first query; empty
+# disables remote warm-ups. A backend answering it with a 4xx is taken
+# not to support warm-ups and is not asked again until restart.
+WARM_PATH = os.environ.get("LLAMA_FAQ_WARM_PATH", "/warm")
+
+# Ask the backend to stream tokens (SSE or NDJSON) instead of returning
+# the whole answer at once. Backends that ignore the flag and reply with
+# plain JSON are still handled.
+STREAMING_ENABLED = os.environ.get("LLAMA_FAQ_STREAMING", "1").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+# Connection pool sizing, applied per backend host. Each host gets its own
+# keep-alive pool so one slow replica cannot exhaust sockets for another.
+MAX_CONNECTIONS_PER_HOST = _env_int("LLAMA_FAQ_MAX_CONNECTIONS", 100)
+MAX_KEEPALIVE_PER_HOST = _env_int("LLAMA_FAQ_MAX_KEEPALIVE", 20)
+KEEPALIVE_EXPIRY = _env_float("LLAMA_FAQ_KEEPALIVE_EXPIRY", 30.0)
+
+# Per-phase timeouts (seconds). The read timeout bounds how long we wait
+# for the LLM to produce an answer; the others should fail fast.
+CONNECT_TIMEOUT = _env_float("LLAMA_FAQ_CONNECT_TIMEOUT", 5.0)
+READ_TIMEOUT = _env_float("LLAMA_FAQ_READ_TIMEOUT", 60.0)
+WRITE_TIMEOUT = _env_float("LLAMA_FAQ_WRITE_TIMEOUT", 60.0)
+POOL_TIMEOUT = _env_float("LLAMA_FAQ_POOL_TIMEOUT", 10.0)
+# Warm-ups are best effort and should not hold a connection for long.
+WARM_TIMEOUT = _env_float("LLAMA_FAQ_WARM_TIMEOUT", 10.0)
+
+# Chat queries fail fast once this many in a row failed, for
+# BREAKER_RESET_TIMEOUT seconds; then a single trial query is let through.
+BREAKER_FAILURE_THRESHOLD = _env_int("LLAMA_FAQ_BREAKER_FAILURES", 5)
+BREAKER_RESET_TIMEOUT = _env_float("LLAMA_FAQ_BREAKER_RESET_TIMEOUT", 15.0)
+
+# Queries that fail before producing any output are retried (on another
+# replica where possible) with jittered exponential backoff. Retries are
+# limited to RETRY_BUDGET_RATIO of recent queries, so an outage does not
+# multiply the load on the backend.
+QUERY_MAX_RETRIES = _env_int("LLAMA_FAQ_MAX_RETRIES", 2)
+RETRY_BUDGET_RATIO = _env_float("LLAMA_FAQ_RETRY_BUDGET_RATIO", 0.2)
+RETRY_BUDGET_MAX = _env_float("LLAMA_FAQ_RETRY_BUDGET_MAX", 10.0)
+RETRY_BACKOFF_BASE = _env_float("LLAMA_FAQ_RETRY_BACKOFF_BASE", 0.2)
+RETRY_BACKOFF_MAX = _env_float("LLAMA_FAQ_RETRY_BACKOFF_MAX", 2.0)
+
+# Hedged queries: if the first replica has not produced any output after
+# the p95 time-to-first-chunk (bounded below by HEDGE_MIN_DELAY), the same
+# query is also sent to a second replica and the faster one wins. Off by
+# default since it can add up to one extra backend call per slow query.
+HEDGING_ENABLED = os.environ.get("LLAMA_FAQ_HEDGING", "0").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+HEDGE_MIN_DELAY = _env_float("LLAMA_FAQ_HEDGE_MIN_DELAY", 0.5)
+# Delay used until enough latencies have been seen for a stable p95.
+HEDGE_DEFAULT_DELAY = _env_float("LLAMA_FAQ_HEDGE_DEFAULT_DELAY", 3.0)
+HEDGE_MIN_SAMPLES = 20
+
+
+_clients: dict[str, httpx.AsyncClient] = {}
+
+endpoints = EndpointPool(LLAMA_FAQ_BASE_URLS, affinity=KB_AFFINITY)
+
+breaker = CircuitBreaker(BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT)
+retry_budget = RetryBudget(RETRY_BUDGET_RATIO, RETRY_BUDGET_MAX)
+first_chunk_latency = LatencyTracker()
+_hedges = 0
+# Cleared once the backend rejects a warm-up request (see `WARM_PATH`).
+_remote_warm_supported = True
+
+# Marks the end of an attempt's output in `_hedged`.
+_DONE = object()
+
+
+def get_client(base_url: str = LLAMA_FAQ_BASE_URL) -> httpx.AsyncClient:
+    """Return the shared keep-alive client for a backend host.
+
+    Clients are created lazily on first use (inside the running event
+    loop) and reused by every session on this worker.
+    """
+
+    client = _clients.get(base_url)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            base_url=base_url,
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS_PER_HOST,
+                max_keepalive_connections=MAX_KEEPALIVE_PER_HOST,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(
+                connect=CONNECT_TIMEOUT,
+                read=READ_TIMEOUT,
+                write=WRITE_TIMEOUT,
+                pool=POOL_TIMEOUT,
+            ),
+            headers={"accept": "application/json"},
+        )
+        _clients[base_url] = client
+    return client
+
+
+async def query(knowledge_base_id: str, query_text: str) -> str:
+    """Ask the backend a question against a knowledge base.
+
+    Backend contract: ``{"response": "..."}``. HTTP and transport errors
+    are raised to the caller once retries are exhausted, and
+    CircuitOpenError while the backend is known to be down.
+    """
+
+    local_answer = await _local_answer(knowledge_base_id, query_text)
+    if local_answer is not None:
+        return local_answer
+    chunks = _resilient(
+        knowledge_base_id,
+        lambda endpoint: _query_from(endpoint, knowledge_base_id, query_text),
+    )
+    return "".join([chunk async for chunk in chunks])
+
+
+async def _query_from(
+    endpoint: Endpoint, knowledge_base_id: str, query_text: str
+) -> AsyncIterator[str]:
+    """Ask one specific replica, yielding the whole answer as one chunk."""
+
+    response = await get_client(endpoint.base_url).post(
+        QUERY_PATH,
+        json={"knowledge_base_id": knowledge_base_id, "query": query_text},
+    )
+    response.raise_for_status()
+    yield response.json().get("response", "")
+
+
+async def _local_answer(knowledge_base_id: str, query_text: str) -> str | None:
+    """The local engine's answer, if it is configured to give one."""
+
+    if ENGINE == "local":
+        return await local_engine.query(knowledge_base_id, query_text)
+    if ENGINE == "hybrid":
+        return await asyncio.to_thread(
+            local_engine.confident_answer,
+            knowledge_base_id,
+            query_text,
+            LOCAL_FASTPATH_COVERAGE,
+        )
+    return None
+
+
+def _hedge_delay() -> float:
+    if len(first_chunk_latency) < HEDGE_MIN_SAMPLES:
+        return HEDGE_DEFAULT_DELAY
+    return max(HEDGE_MIN_DELAY, first_chunk_latency.percentile(0.95))
+
+
+async def _hedged(
+    knowledge_base_id: str,
+    fetch: Callable[[Endpoint], AsyncIterator[str]],
+    tried: list[Endpoint],
+) -> AsyncIterator[str]:
+    """Run one query attempt, hedged onto a second replica if it is slow.
+
+    Each attempt runs as a task feeding a shared queue. The first attempt
+    to produce a chunk wins and the other is cancelled (closing its
+    request). Replicas used are appended to ``tried``, and are avoided by
+    the hedge and by later retries.
+    """
+
+    global _hedges
+    queue: asyncio.Queue = asyncio.Queue()
+    tasks: list[asyncio.Task] = []
+    failed: set[int] = set()
+
+    async def run(index: int) -> None:
+        try:
+            async with endpoints.acquire(knowledge_base_id, exclude=tried) as endpoint:
+                tried.append(endpoint)
+                started = time.monotonic()
+                first = True
+                async for chunk in fetch(endpoint):
+                    if first:
+                        first_chunk_latency.record(time.monotonic() - started)
+                        first = False
+                    queue.put_nowait((index, chunk))
+            queue.put_nowait((index, _DONE))
+        except Exception as e:
+            queue.put_nowait((index, e))
+
+    tasks.append(asyncio.create_task(run(0)))
+    hedge_at = time.monotonic() + _hedge_delay()
+    winner: int | None = None
+    try:
+        while True:
+            timeout = None
+            if (
+                HEDGING_ENABLED
+                and winner is None
+                and len(tasks) == 1
+                and len(endpoints.endpoints) > 1
+            ):
+                timeout = max(0.0, hedge_at - time.monotonic())
+            try:
+                index, item = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                _hedges += 1
+                tasks.append(asyncio.create_task(run(len(tasks))))
+                continue
+
+            if winner is not None and index != winner:
+                continue
+            if isinstance(item, Exception):
+                failed.add(index)
+                # Keep waiting while another attempt is still running.
+                if winner is None and len(failed) < len(tasks):
+                    continue
+                raise item
+            if winner is None:
+                winner = index
+                for i, task in enumerate(tasks):
+                    if i != winner:
+                        task.cancel()
+            if item is _DONE:
+                return
+            yield item
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def _resilient(
+    knowledge_base_id: str, fetch: Callable[[Endpoint], AsyncIterator[str]]
+) -> AsyncIterator[str]:
+    """Run a query through the circuit breaker, retries and hedging.
+
+    Only failures before the first chunk are retried: once output has
+    reached the user, replaying the query could duplicate it.
+    """
+
+    retry_budget.record_request()
+    tried: list[Endpoint] = []
+    retries = 0
+    while True:
+        breaker.allow()
+        chunks = _hedged(knowledge_base_id, fetch, tried)
+        try:
+            try:
+                first = await chunks.__anext__()
+            except StopAsyncIteration:
+                breaker.record_success()
+                return
+            except Exception as e:
+                if not is_replica_failure(e):
+                    # The backend answered; the request itself was bad.
+                    breaker.record_success()
+                    raise
+                breaker.record_failure()
+                if retries >= QUERY_MAX_RETRIES or not retry_budget.try_spend():
+                    raise
+                retries += 1
+                await asyncio.sleep(
+                    backoff_delay(retries, RETRY_BACKOFF_BASE, RETRY_BACKOFF_MAX)
+                )
+                continue
+            except BaseException:
+                breaker.abandon()
+                raise
+
+            breaker.record_success()
+            yield first
+            async for chunk in chunks:
+                yield chunk
+            return
+        finally:
+            await chunks.aclose()
+
+
+def _parse_stream_chunk(line: str) -> str:
+    """Extract the text token from one NDJSON line or SSE ``data`` payload."""
+
+    try:
+        data = json.loads(line)
+    except json.JSONDecodeError:
+        # Plain-text SSE payloads carry the token verbatim.
+        return line
+    if isinstance(data, str):
+        return data
+    if isinstance(data, dict):
+        for key in ("token", "delta", "response"):
+            value = data.get(key)
+            if isinstance(value, str):
+                return value
+    return ""
+
+
+async def stream_query(knowledge_base_id: str, query_text: str) -> AsyncIterator[str]:
+    """Like :func:`query`, but yield the answer in chunks as they arrive.
+
+    Understands ``text/event-stream`` (``data: ...`` lines, terminated by
+    ``[DONE]``) and newline-delimited JSON (``{"token": "..."}`` per line).
+    A plain ``application/json`` reply is yielded as a single chunk.
+    Failures are handled as in :func:`query`.
+    """
+
+    local_answer = await _local_answer(knowledge_base_id, query_text)
+    if local_answer is not None:
+        yield local_answer
+        return
+    chunks = _resilient(
+        knowledge_base_id,
+        lambda endpoint: _stream_from(endpoint, knowledge_base_id, query_text),
+    )
+    try:
+        async for token in chunks:
+            yield token
+    finally:
+        await chunks.aclose()
+
+
+async def _stream_from(
+    endpoint: Endpoint, knowledge_base_id: str, query_text: str
+) -> AsyncIterator[str]:
+    """Stream one answer from a specific replica."""
+
+    async with get_client(endpoint.base_url).stream(
+        "POST",
+        QUERY_PATH,
+        json={
+            "knowledge_base_id": knowledge_base_id,
+            "query": query_text,
+            "stream": True,
+        },
+        headers={
+            "accept": "text/event-stream, application/x-ndjson, application/json"
+        },
+    ) as response:
+        response.raise_for_status()
+        content_type = response.headers.get("content-type", "")
+
+        if content_type.startswith("application/json"):
+            data = json.loads(await response.aread())
+            yield data.get("response", "")
+            return
+
+        if content_type.startswith("text/event-stream"):
+            payloads = _sse_data(response.aiter_lines())
+        else:
+            payloads = (line async for line in response.aiter_lines() if line.strip())
+        async for payload in payloads:
+            if payload == "[DONE]":
+                break
+            token = _parse_stream_chunk(payload)
+            if token:
+                yield token
+
+
+async def _sse_data(lines: AsyncIterator[str]) -> AsyncIterator[str]:
+    """Yield the ``data`` of each server-sent event.
+
+    An event ends at a blank line; its ``data:`` lines are joined with
+    newlines, so a token containing line breaks arrives as one payload.
+    Other fields (``event:``, ``id:``, comments) are ignored.
+    """
+
+    data: list[str] = []
+    async for line in lines:
+        if line:
+            if line.startswith("data:"):
+                value = line[5:]
+                # The SSE spec strips exactly one leading space; any further
+                # whitespace belongs to the token.
+                data.append(value[1:] if value.startswith(" ") else value)
+            continue
+        if data:
+            yield "\n".join(data)
+            data = []
+    # A stream closed without the final blank line still ends its event.
+    if data:
+        yield "\n".join(data)
+
+
+async def _multipart_file_body(
+    boundary: str,
+    field: str,
+    file_name: str,
+    chunks: AsyncIterable[bytes],
+    form_fields: dict[str, str] | None = None,
+) -> AsyncIterator[bytes]:
+    """Encode a single-file multipart/form-data body without buffering it."""
+
+    for name, value in (form_fields or {}).items():
+        yield (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="{name}"\r\n\r\n'
+            f"{value}\r\n"
+        ).encode("utf-8")
+
+    # Escape the file name the way browsers do (HTML5 form encoding).
+    safe_name = (
+        file_name.replace("\\", "\\\\")
+        .replace('"', "%22")
+        .replace("\r", "%0D")
+        .replace("\n", "%0A")
+    )
+    yield (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="{field}"; filename="{safe_name}"\r\n'
+        "Content-Type: application/octet-stream\r\n\r\n"
+    ).encode("utf-8")
+    async for chunk in chunks:
+        yield chunk
+    yield f"\r\n--{boundary}--\r\n".encode("ascii")
+
+
+async def ingest(
+    file_name: str,
+    chunks: AsyncIterable[bytes],
+    knowledge_base_id: str | None = None,
+) -> dict:
+    """Upload a document to the backend and build a knowledge base from it.
+
+    The document is streamed from ``chunks`` straight into the request
+    body (chunked transfer encoding), so it is never held in memory whole.
+    Passing ``knowledge_base_id`` adds the document to that existing
+    knowledge base instead of creating a new one.
+    Returns the backend's JSON payload, which carries the
+    ``knowledge_base_id``, a status ``message`` and a ``documents`` count.
+    The local engine returns the same payload.
+    """
+
+    if ENGINE == "local":
+        return await local_engine.ingest(file_name, chunks, knowledge_base_id)
+    if ENGINE == "hybrid":
+        return await _ingest_hybrid(file_name, chunks, knowledge_base_id)
+    return await _ingest_remote(file_name, chunks, knowledge_base_id)
+
+
+async def _ingest_hybrid(
+    file_name: str,
+    chunks: AsyncIterable[bytes],
+    knowledge_base_id: str | None,
+) -> dict:
+    """Ingest remotely, then index the same bytes locally for the fast path."""
+
+    with spool_file() as spool:
+
+        async def tee() -> AsyncIterator[bytes]:
+            async for chunk in chunks:
+                await asyncio.to_thread(spool.write, chunk)
+                yield chunk
+
+        data = await _ingest_remote(file_name, tee(), knowledge_base_id)
+        try:
+            await asyncio.to_thread(
+                local_engine.add_document,
+                file_name,
+                spool,
+                data["knowledge_base_id"],
+            )
+        except Exception as e:
+            # The fast path is optional; the remote knowledge base is usable.
+            print(f"Local indexing of {file_name} failed:", e)
+    return data
+
+
+async def _ingest_remote(
+    file_name: str,
+    chunks: AsyncIterable[bytes],
+    knowledge_base_id: str | None,
+) -> dict:
+    boundary = secrets.token_hex(16)
+    form_fields = (
+        {"knowledge_base_id": knowledge_base_id} if knowledge_base_id else None
+    )
+    async with endpoints.acquire(knowledge_base_id) as endpoint:
+        response = await get_client(endpoint.base_url).post(
+            INGEST_PATH,
+            content=_multipart_file_body(
+                boundary, "file", file_name, chunks, form_fields
+            ),
+            headers={"content-type": f"multipart/form-data; boundary={boundary}"},
+        )
+        response.raise_for_status()
+        return response.json()
+
+
+async def warm(knowledge_base_id: str) -> None:
+    """Have the engine load a knowledge base before its first query.
+
+    The remote service is sent a warm-up request on the replica the
+    knowledge base's queries are routed to; the local engine opens the
+    index and has the OS read its files ahead. A remote that rejects the
+    request with a 4xx is not sent warm-ups any more.
+    """
+
+    global _remote_warm_supported
+    if ENGINE in ("local", "hybrid"):
+        await asyncio.to_thread(local_engine.preload, knowledge_base_id)
+    if ENGINE == "local" or not WARM_PATH or not _remote_warm_supported:
+        return
+    async with endpoints.acquire(knowledge_base_id) as endpoint:
+        response = await get_client(endpoint.base_url).post(
+            WARM_PATH,
+            params={"knowledge_base_id": knowledge_base_id},
+            timeout=WARM_TIMEOUT,
+        )
+        if response.is_client_error:
+            _remote_warm_supported = False
+            print(
+                f"Backend answered {WARM_PATH} with {response.status_code};"
+                " remote warm-ups disabled"
+            )
+            return
+        response.raise_for_status()
+
+
+def resilience_stats() -> dict:
+    """Circuit breaker, retry and hedging counters for the metrics route."""
+
+    p95 = first_chunk_latency.percentile(0.95)
+    return {
+        "breaker": breaker.stats(),
+        "retry_budget": retry_budget.stats(),
+        "hedges": _hedges,
+        "first_chunk_p95": round(p95, 3) if p95 is not None else None,
+    }
+
+
+async def aclose() -> None:
+    """Close every pooled client, e.g. on worker shutdown."""
+
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        await client.aclose()
+
+
+@contextlib.asynccontextmanager
+async def lifespan():
+    """Reflex lifespan task: probes replica health, drains pools on shutdown."""
+
+    try:
+        async with endpoints.probing(get_client):
+            yield
+    finally:
+        await aclose()
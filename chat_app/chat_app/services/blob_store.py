@@ -0,0 +1,330 @@
+import asyncio
+import contextlib
+import hashlib
+import os
+import time
+import uuid
+from pathlib import Path
+
+import reflex as rx
+from reflex.vars.base import Var, VarData
+
+from chat_app.services import storage
+from chat_app.services.uploads import MAX_UPLOAD_BYTES, save_upload, upload_filename
+
+
+# Blobs are served from here; names are content hashes, so responses can be
+# cached forever (see `chat_app.api`).
+BLOB_URL_PREFIX = "/_blobs"
+
+# Derived files (e.g. image thumbnails) live under this sub-directory of the
+# store. Their names must also be content-derived.
+DERIVED_DIR = "derived"
+
+# Media types of the files the store accepts and serves, by extension.
+# Only images are uploaded (assistant logos); anything else, SVG included,
+# is refused so the store never serves active content from the app's
+# origin.
+BLOB_MEDIA_TYPES = {
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".gif": "image/gif",
+    ".webp": "image/webp",
+    ".avif": "image/avif",
+}
+
+# Blobs nothing refers to (an image uploaded for an assistant that was
+# never created, or replaced by another upload) are deleted by the
+# periodic sweep once they are this old (seconds). Holds on pending
+# uploads left behind by sessions that went away expire after as long.
+BLOB_SWEEP_GRACE = float(os.environ.get("BLOB_SWEEP_GRACE", "86400"))
+
+# How often (seconds) the sweep runs.
+BLOB_SWEEP_INTERVAL = float(os.environ.get("BLOB_SWEEP_INTERVAL", "3600"))
+
+
+def blob_src(url: Var[str] | str) -> Var[str]:
+    """An image ``src`` or ``srcset`` with its store URLs made absolute.
+
+    Blobs are served by the backend, which usually listens on another
+    port than the frontend, so ``/_blobs/...`` is resolved against the
+    backend URL the same way ``rx.get_upload_url`` resolves uploads.
+    Other URLs are left as they are.
+    """
+
+    url = Var.create(url)
+    upload_root = rx.get_upload_url("")
+    prefix = BLOB_URL_PREFIX.strip("/")
+    return Var(
+        _js_expr=(
+            f"String({url} ?? '').replace(/(^|, )\\/{prefix}\\//g,"
+            f" '$1' + new URL('..', {upload_root}).href + '{prefix}/')"
+        ),
+        _var_data=VarData.merge(
+            url._get_all_var_data(), upload_root._get_all_var_data()
+        ),
+    ).to(str)
+
+
+class UnsupportedBlobTypeError(ValueError):
+    """Raised for an upload whose extension is not an accepted image type."""
+
+
+class BlobStore:
+    """Content-addressed store for uploaded files.
+
+    Each blob is stored once under the SHA-256 of its content (plus the
+    original extension), so two different files with the same name never
+    overwrite each other and identical uploads share one copy on disk. A
+    SQLite table keeps a reference count per blob: templates that use a blob
+    :meth:`retain` it and :meth:`release` drops the file once nothing refers
+    to it any more.
+
+    An upload not yet used by a template is *held* by the session that
+    uploaded it, so identical bytes uploaded by two sessions are not
+    deleted when one of them replaces or abandons its upload. A blob is
+    only deleted once it has no references and no holds: by
+    :meth:`discard`, which drops a session's hold, or by the :meth:`sweep`.
+    """
+
+    def __init__(self, db_name: str = "blobs.db", dir_name: str = "blobs"):
+        self.db_name = db_name
+        self.dir_name = dir_name
+        self._initialised = False
+
+    @property
+    def root(self) -> Path:
+        return storage.DATA_DIR / self.dir_name
+
+    def _connect(self):
+        db = storage.connect(self.db_name)
+        if not self._initialised:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS blobs ("
+                " name TEXT PRIMARY KEY,"
+                " size INTEGER NOT NULL,"
+                " refcount INTEGER NOT NULL DEFAULT 0,"
+                " created_at REAL NOT NULL)"
+            )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS holds ("
+                " name TEXT NOT NULL,"
+                " holder TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " PRIMARY KEY (name, holder))"
+            )
+            self._initialised = True
+        return db
+
+    def path_for(self, name: str) -> Path | None:
+        """Location of a stored blob or derived file, if ``name`` is safe."""
+
+        path = (self.root / name).resolve()
+        if not path.is_relative_to(self.root.resolve()):
+            return None
+        return path
+
+    @staticmethod
+    def url_for(name: str) -> str:
+        return f"{BLOB_URL_PREFIX}/{name}"
+
+    @staticmethod
+    def name_from_url(url: str) -> str | None:
+        """The blob name of a store URL, or None for any other URL."""
+
+        prefix = f"{BLOB_URL_PREFIX}/"
+        return url[len(prefix) :] if url.startswith(prefix) else None
+
+    def _record(self, name: str, size: int, holder: str | None) -> None:
+        # Uploading an unreferenced blob again restarts its sweep grace.
+        now = time.time()
+        with contextlib.closing(self._connect()) as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                db.execute(
+                    "INSERT INTO blobs (name, size, created_at) VALUES (?, ?, ?)"
+                    " ON CONFLICT (name) DO UPDATE"
+                    " SET created_at = excluded.created_at WHERE refcount = 0",
+                    (name, size, now),
+                )
+                if holder is not None:
+                    db.execute(
+                        "INSERT INTO holds (name, holder, created_at) VALUES (?, ?, ?)"
+                        " ON CONFLICT (name, holder) DO UPDATE"
+                        " SET created_at = excluded.created_at",
+                        (name, holder, now),
+                    )
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+    def _delete_if_unused(self, db, name: str) -> bool:
+        """Delete a blob nothing refers to or holds; returns whether it was.
+
+        Runs inside the caller's transaction on ``db``.
+        """
+
+        row = db.execute(
+            "DELETE FROM blobs WHERE name = ? AND refcount = 0"
+            " AND NOT EXISTS (SELECT 1 FROM holds WHERE holds.name = blobs.name)"
+            " RETURNING name",
+            (name,),
+        ).fetchone()
+        if row is not None:
+            self._unlink(name)
+        return row is not None
+
+    def _unlink(self, name: str) -> None:
+        """Delete a blob's file and the files derived from it."""
+
+        (self.root / name).unlink(missing_ok=True)
+        for path in (self.root / DERIVED_DIR).glob(f"{Path(name).stem}-*"):
+            path.unlink(missing_ok=True)
+
+    async def put(
+        self,
+        upload: rx.UploadFile,
+        max_bytes: int = MAX_UPLOAD_BYTES,
+        holder: str | None = None,
+    ) -> str:
+        """Store an upload and return its blob name.
+
+        The upload is streamed to a temporary file while being hashed,
+        then moved into place; if the content is already stored the
+        temporary copy is simply discarded. Raises UnsupportedBlobTypeError,
+        before reading anything, unless the file is an accepted image type.
+
+        ``holder`` (e.g. a session token) keeps the blob until it drops
+        its hold with :meth:`discard`, or the hold expires.
+        """
+
+        suffix = Path(upload_filename(upload, "upload")).suffix.lower()
+        if suffix not in BLOB_MEDIA_TYPES:
+            raise UnsupportedBlobTypeError(
+                f"only {', '.join(sorted(BLOB_MEDIA_TYPES))} images are accepted"
+            )
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.root / f".incoming-{uuid.uuid4().hex}"
+        hasher = hashlib.sha256()
+        size = await save_upload(upload, tmp_path, max_bytes, hasher=hasher)
+        name = f"{hasher.hexdigest()}{suffix}"
+        # Recorded before the file is moved into place, so a sweep running
+        # meanwhile sees a fresh blob and leaves it alone.
+        await asyncio.to_thread(self._record, name, size, holder)
+        await asyncio.to_thread(os.replace, tmp_path, self.root / name)
+        return name
+
+    def retain(self, name: str) -> None:
+        """Record one more reference to a blob.
+
+        Raises LookupError if the blob is not (or no longer) stored.
+        """
+
+        with contextlib.closing(self._connect()) as db:
+            row = db.execute(
+                "UPDATE blobs SET refcount = refcount + 1 WHERE name = ?"
+                " RETURNING name",
+                (name,),
+            ).fetchone()
+        if row is None:
+            raise LookupError(f"blob {name} is not stored")
+
+    def release(self, name: str) -> None:
+        """Drop a reference; the blob is deleted when none (nor holds) are left."""
+
+        with contextlib.closing(self._connect()) as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                row = db.execute(
+                    "UPDATE blobs SET refcount = refcount - 1"
+                    " WHERE name = ? AND refcount > 0 RETURNING refcount",
+                    (name,),
+                ).fetchone()
+                if row is not None and row["refcount"] == 0:
+                    self._delete_if_unused(db, name)
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+    def discard(self, name: str, holder: str | None = None) -> bool:
+        """Drop ``holder``'s hold and delete the blob if now unused.
+
+        Returns whether the blob was deleted.
+        """
+
+        with contextlib.closing(self._connect()) as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                if holder is not None:
+                    db.execute(
+                        "DELETE FROM holds WHERE name = ? AND holder = ?",
+                        (name, holder),
+                    )
+                deleted = self._delete_if_unused(db, name)
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        return deleted
+
+    def sweep(self, grace: float = BLOB_SWEEP_GRACE) -> int:
+        """Delete unreferenced blobs older than ``grace`` seconds.
+
+        Holds older than ``grace`` are expired first. Returns how many
+        blobs were deleted.
+        """
+
+        cutoff = time.time() - grace
+        with contextlib.closing(self._connect()) as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                db.execute("DELETE FROM holds WHERE created_at < ?", (cutoff,))
+                rows = db.execute(
+                    "DELETE FROM blobs WHERE refcount = 0 AND created_at < ?"
+                    " AND NOT EXISTS"
+                    " (SELECT 1 FROM holds WHERE holds.name = blobs.name)"
+                    " RETURNING name",
+                    (cutoff,),
+                ).fetchall()
+                for row in rows:
+                    self._unlink(row["name"])
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        return len(rows)
+
+    def refcount(self, name: str) -> int:
+        with contextlib.closing(self._connect()) as db:
+            row = db.execute(
+                "SELECT refcount FROM blobs WHERE name = ?", (name,)
+            ).fetchone()
+        return row["refcount"] if row is not None else 0
+
+    @contextlib.asynccontextmanager
+    async def lifespan(self):
+        """Reflex lifespan task sweeping unreferenced blobs periodically."""
+
+        async def sweep_periodically() -> None:
+            while True:
+                try:
+                    swept = await asyncio.to_thread(self.sweep)
+                    if swept:
+                        print(f"Swept {swept} unreferenced blobs")
+                except Exception as e:
+                    print("Blob sweep failed:", e)
+                await asyncio.sleep(BLOB_SWEEP_INTERVAL)
+
+        task = asyncio.create_task(sweep_periodically())
+        try:
+            yield
+        finally:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+
+blob_store = BlobStore()
@@ -0,0 +1,312 @@
+import json
+import re
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+
+# Standard BM25 parameters: term frequency saturation and length
+# normalisation.
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Terms are stored in a fixed-width array, so longer tokens (hashes,
+# encoded blobs) are cut to this length rather than widening every entry.
+MAX_TERM_CHARS = 32
+
+# The arrays an index is made of, each saved as ``<name>.npy``.
+_ARRAYS = ("terms", "offsets", "doc_ids", "term_freqs", "doc_lengths")
+
+_STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from has have how i if in "
+    "is it its me my of on or our so than that the their then there these "
+    "this to was we what when where which who why will with you your".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    return [
+        t[:MAX_TERM_CHARS]
+        for t in _TOKEN_RE.findall(text.lower())
+        if t not in _STOPWORDS
+    ]
+
+
+def _save_array(directory: Path, name: str, array: np.ndarray) -> None:
+    np.save(directory / f"{name}.npy", array, allow_pickle=False)
+
+
+def _load_array(directory: Path, name: str) -> np.ndarray:
+    return np.load(directory / f"{name}.npy", mmap_mode="r", allow_pickle=False)
+
+
+def create_array(directory: Path, name: str, dtype, size: int) -> np.memmap:
+    """A new ``<name>.npy`` file of ``size`` items, mapped for writing."""
+
+    return np.lib.format.open_memmap(
+        directory / f"{name}.npy", mode="w+", dtype=dtype, shape=(size,)
+    )
+
+
+def idf_weights(doc_freqs: np.ndarray, n_docs: int) -> np.ndarray:
+    return np.log1p((n_docs - doc_freqs + 0.5) / (doc_freqs + 0.5)).astype(np.float32)
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed set of passages, scored with NumPy.
+
+    Postings are stored term-major in flat arrays (CSR layout):
+    ``offsets[t]:offsets[t + 1]`` slices ``doc_ids``/``term_freqs`` for
+    term ``t``, with doc ids ascending. Terms are kept sorted in a
+    fixed-width byte array, so a term's id is found by binary search. A
+    query gathers the slices of its terms and scores every matching
+    passage in one vectorised pass.
+
+    On disk every array is a plain ``.npy`` file, and :meth:`load` maps
+    them read-only instead of reading them: opening an index costs the
+    same whatever its size, only the pages a query touches are read, and
+    all workers share them through the OS page cache.
+
+    An index can be one segment of a larger collection (see
+    :func:`search_segments`); term weights are therefore not stored but
+    computed per query from document frequencies, which add up across
+    segments.
+    """
+
+    def __init__(
+        self,
+        terms: np.ndarray,
+        offsets: np.ndarray,
+        doc_ids: np.ndarray,
+        term_freqs: np.ndarray,
+        doc_lengths: np.ndarray,
+        avg_length: float,
+    ):
+        self.terms = terms
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.term_freqs = term_freqs
+        self.doc_lengths = doc_lengths
+        self.avg_length = avg_length
+
+    @classmethod
+    def build(cls, documents: list[list[str]]) -> "BM25Index":
+        """Index tokenised passages; passage ids are their list positions."""
+
+        term_ids: dict[str, int] = {}
+        rows, cols, freqs = [], [], []
+        for doc_id, tokens in enumerate(documents):
+            for term, freq in Counter(tokens).items():
+                rows.append(term_ids.setdefault(term, len(term_ids)))
+                cols.append(doc_id)
+                freqs.append(freq)
+        # Renumber terms in sorted order so they can be binary searched.
+        terms = np.array([t.encode("ascii") for t in term_ids], dtype="S")
+        by_term = np.argsort(terms, kind="stable")
+        rank = np.empty(len(terms), dtype=np.int64)
+        rank[by_term] = np.arange(len(terms))
+        term_of = rank[np.asarray(rows, dtype=np.int64)]
+        # A stable sort keeps doc ids ascending within each term.
+        order = np.argsort(term_of, kind="stable")
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_of, minlength=len(terms)), out=offsets[1:])
+
+        doc_lengths = np.asarray([len(d) for d in documents], dtype=np.float32)
+        return cls(
+            terms=terms[by_term],
+            offsets=offsets,
+            doc_ids=np.asarray(cols, dtype=np.int32)[order],
+            term_freqs=np.asarray(freqs, dtype=np.float32)[order],
+            doc_lengths=doc_lengths,
+            avg_length=float(doc_lengths.mean()) if len(documents) else 0.0,
+        )
+
+    @staticmethod
+    def merge(directory: Path, indexes: list["BM25Index"]) -> None:
+        """Save the index of several indexes' passages, in order, to ``directory``.
+
+        The result is what :meth:`build` would give over all the passages,
+        but postings are copied from the (mapped) inputs one index at a
+        time straight into mapped output files, so besides the merged
+        vocabulary only one input's postings are ever in memory.
+        """
+
+        directory.mkdir(parents=True, exist_ok=True)
+        terms = np.unique(np.concatenate([index.terms for index in indexes]))
+        # Where each input's terms land in the merged vocabulary.
+        term_maps = [np.searchsorted(terms, index.terms) for index in indexes]
+        counts = np.zeros(len(terms), dtype=np.int64)
+        for index, term_map in zip(indexes, term_maps):
+            counts[term_map] += np.diff(index.offsets)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+
+        n_docs = sum(len(index) for index in indexes)
+        doc_ids = create_array(directory, "doc_ids", np.int32, int(offsets[-1]))
+        term_freqs = create_array(directory, "term_freqs", np.float32, int(offsets[-1]))
+        doc_lengths = create_array(directory, "doc_lengths", np.float32, n_docs)
+        # Next free posting of each merged term. Inputs are copied in
+        # order, so doc ids stay ascending within every term.
+        cursor = offsets[:-1].copy()
+        doc_base = 0
+        for index, term_map in zip(indexes, term_maps):
+            freqs = np.diff(index.offsets)
+            term_of = np.repeat(np.arange(len(freqs)), freqs)
+            positions = (
+                cursor[term_map][term_of]
+                + np.arange(len(term_of))
+                - index.offsets[:-1][term_of]
+            )
+            doc_ids[positions] = index.doc_ids + doc_base
+            term_freqs[positions] = index.term_freqs
+            doc_lengths[doc_base : doc_base + len(index)] = index.doc_lengths
+            cursor[term_map] += freqs
+            doc_base += len(index)
+        for array in (doc_ids, term_freqs, doc_lengths):
+            array.flush()
+
+        _save_array(directory, "terms", terms)
+        _save_array(directory, "offsets", offsets)
+        avg_length = (
+            sum(index.avg_length * len(index) for index in indexes) / n_docs
+            if n_docs
+            else 0.0
+        )
+        with (directory / "bm25.json").open("w", encoding="utf-8") as f:
+            json.dump({"avg_length": avg_length}, f)
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def _term_id(self, term: str) -> int | None:
+        key = term.encode("ascii")
+        i = int(np.searchsorted(self.terms, key))
+        if i < len(self.terms) and self.terms[i] == key:
+            return i
+        return None
+
+    def _query_terms(self, tokens: list[str]) -> list[int]:
+        term_ids = (self._term_id(t) for t in dict.fromkeys(tokens))
+        return [t for t in term_ids if t is not None]
+
+    def doc_freqs(self, terms: list[str]) -> np.ndarray:
+        """Number of passages containing each of ``terms``."""
+
+        freqs = np.zeros(len(terms), dtype=np.float32)
+        for i, term in enumerate(terms):
+            t = self._term_id(term)
+            if t is not None:
+                freqs[i] = self.offsets[t + 1] - self.offsets[t]
+        return freqs
+
+    def scores(
+        self,
+        tokens: list[str],
+        idf: np.ndarray | None = None,
+        avg_length: float | None = None,
+    ) -> np.ndarray:
+        """BM25 score of every passage for a tokenised query.
+
+        ``idf`` (one weight per distinct token, in order) and
+        ``avg_length`` default to this index's own statistics; pass the
+        collection-wide ones when the index is a segment.
+        """
+
+        terms = list(dict.fromkeys(tokens))
+        if idf is None:
+            idf = idf_weights(self.doc_freqs(terms), len(self))
+        if avg_length is None:
+            avg_length = self.avg_length
+        found = [(self._term_id(t), w) for t, w in zip(terms, idf)]
+        found = [(t, w) for t, w in found if t is not None]
+        if not found or not len(self):
+            return np.zeros(len(self), dtype=np.float32)
+        slices = [np.arange(self.offsets[t], self.offsets[t + 1]) for t, _w in found]
+        positions = np.concatenate(slices)
+        docs = self.doc_ids[positions]
+        tf = self.term_freqs[positions]
+        weights = np.repeat(
+            np.asarray([w for _t, w in found], dtype=np.float32),
+            [len(s) for s in slices],
+        )
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[docs] / avg_length)
+        contributions = weights * tf * (BM25_K1 + 1) / (tf + norm)
+        return np.bincount(docs, weights=contributions, minlength=len(self))
+
+    def search(
+        self,
+        tokens: list[str],
+        k: int,
+        idf: np.ndarray | None = None,
+        avg_length: float | None = None,
+    ) -> list[tuple[int, float]]:
+        """The ``k`` best passages with a positive score, best first."""
+
+        scores = self.scores(tokens, idf, avg_length)
+        k = min(k, int(np.count_nonzero(scores)))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(i), float(scores[i])) for i in top]
+
+    def coverage(self, tokens: list[str], doc_id: int) -> float:
+        """Fraction of the distinct query terms that occur in a passage."""
+
+        distinct = list(dict.fromkeys(tokens))
+        if not distinct:
+            return 0.0
+        hits = 0
+        for t in self._query_terms(distinct):
+            docs = self.doc_ids[self.offsets[t] : self.offsets[t + 1]]
+            i = np.searchsorted(docs, doc_id)
+            hits += bool(i < len(docs) and docs[i] == doc_id)
+        return hits / len(distinct)
+
+    def save(self, directory: Path) -> None:
+        directory.mkdir(parents=True, exist_ok=True)
+        for name in _ARRAYS:
+            _save_array(directory, name, getattr(self, name))
+        with (directory / "bm25.json").open("w", encoding="utf-8") as f:
+            json.dump({"avg_length": self.avg_length}, f)
+
+    @classmethod
+    def load(cls, directory: Path) -> "BM25Index":
+        """Map a saved index without reading its arrays into memory."""
+
+        with (directory / "bm25.json").open("r", encoding="utf-8") as f:
+            meta = json.load(f)
+        return cls(
+            **{name: _load_array(directory, name) for name in _ARRAYS},
+            avg_length=meta["avg_length"],
+        )
+
+
+def search_segments(
+    segments: list[BM25Index], tokens: list[str], k: int
+) -> list[tuple[int, int, float]]:
+    """Search several indexes as one collection.
+
+    Returns ``(segment, doc_id, score)`` for the ``k`` best passages
+    overall. Scores use collection-wide document frequencies and passage
+    length, so they match what a single index over all the passages
+    would give.
+    """
+
+    terms = list(dict.fromkeys(tokens))
+    n_docs = sum(len(segment) for segment in segments)
+    if not terms or not n_docs:
+        return []
+    doc_freqs = sum(segment.doc_freqs(terms) for segment in segments)
+    idf = idf_weights(doc_freqs, n_docs)
+    avg_length = sum(s.avg_length * len(s) for s in segments) / n_docs
+    hits = [
+        (i, doc_id, score)
+        for i, segment in enumerate(segments)
+        for doc_id, score in segment.search(terms, k, idf, avg_length)
+    ]
+    hits.sort(key=lambda hit: -hit[2])
+    return hits[:k]
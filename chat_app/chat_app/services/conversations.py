@@ -0,0 +1,233 @@
+import asyncio
+import contextlib
+import os
+import threading
+import time
+
+from chat_app.services import storage
+
+
+# Messages loaded per history page: when a conversation is opened, and
+# each time older messages are requested.
+CHAT_HISTORY_PAGE_SIZE = int(os.environ.get("CHAT_HISTORY_PAGE_SIZE", "50"))
+
+# How often (seconds) queued message writes are committed, as one
+# transaction per batch.
+CONVERSATION_FLUSH_INTERVAL = float(
+    os.environ.get("CONVERSATION_FLUSH_INTERVAL", "0.5")
+)
+
+
+class ConversationStore:
+    """Chat history persisted in SQLite, keyed by session and assistant.
+
+    Each message is stored under ``(session, knowledge_base_id, seq)``,
+    where ``seq`` orders the messages of a conversation. Writes are only
+    queued by :meth:`record` and :meth:`clear`, which never block, and
+    are committed in batches off the event loop by the :meth:`lifespan`
+    task. Reads page backwards from the newest message, so opening a
+    long conversation costs one page regardless of its length. Pending
+    writes are flushed before a read, so a session always sees its own
+    messages.
+    """
+
+    def __init__(
+        self,
+        db_name: str = "conversations.db",
+        flush_interval: float = CONVERSATION_FLUSH_INTERVAL,
+    ):
+        self.db_name = db_name
+        self.flush_interval = flush_interval
+        self._pending: list[tuple] = []
+        self._pending_lock = threading.Lock()
+        # Serialises flushes so batches are committed in order.
+        self._flush_lock = asyncio.Lock()
+        self._initialised = False
+        self.batches = 0
+        self.written = 0
+
+    def _connect(self):
+        db = storage.connect(self.db_name)
+        if not self._initialised:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                " session TEXT NOT NULL,"
+                " knowledge_base_id TEXT NOT NULL,"
+                " seq INTEGER NOT NULL,"
+                " text TEXT NOT NULL,"
+                " is_ai INTEGER NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " PRIMARY KEY (session, knowledge_base_id, seq)"
+                ") WITHOUT ROWID"
+            )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                " session TEXT PRIMARY KEY,"
+                " knowledge_base_id TEXT NOT NULL,"
+                " updated_at REAL NOT NULL)"
+            )
+            self._initialised = True
+        return db
+
+    def _enqueue(self, op: tuple) -> None:
+        with self._pending_lock:
+            self._pending.append(op)
+
+    def record(
+        self, session: str, knowledge_base_id: str | None, message: dict
+    ) -> None:
+        """Queue a message (new or updated) for writing."""
+
+        self._enqueue(
+            (
+                "put",
+                session,
+                knowledge_base_id or "",
+                message["seq"],
+                message["text"],
+                int(message["is_ai"]),
+                time.time(),
+            )
+        )
+
+    def clear(self, session: str, knowledge_base_id: str | None) -> None:
+        """Queue the deletion of a conversation."""
+
+        self._enqueue(("clear", session, knowledge_base_id or ""))
+
+    def _write(self, ops: list[tuple]) -> None:
+        db = self._connect()
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                self._apply(db, ops)
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        finally:
+            db.close()
+
+    @staticmethod
+    def _apply(db, ops: list[tuple]) -> None:
+        for op in ops:
+            if op[0] == "put":
+                _kind, session, kb, seq, text, is_ai, now = op
+                db.execute(
+                    "INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?, ?, ?)",
+                    (session, kb, seq, text, is_ai, now),
+                )
+                db.execute(
+                    "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)",
+                    (session, kb, now),
+                )
+            else:
+                _kind, session, kb = op
+                db.execute(
+                    "DELETE FROM messages WHERE session = ? AND knowledge_base_id = ?",
+                    (session, kb),
+                )
+
+    async def flush(self) -> None:
+        """Commit every queued write."""
+
+        async with self._flush_lock:
+            with self._pending_lock:
+                ops, self._pending = self._pending, []
+            if not ops:
+                return
+            try:
+                await asyncio.to_thread(self._write, ops)
+            except BaseException:
+                # Put them back in front of anything queued meanwhile.
+                with self._pending_lock:
+                    self._pending[:0] = ops
+                raise
+            self.batches += 1
+            self.written += len(ops)
+
+    def _read_page(
+        self, session: str, kb: str, before: int | None, limit: int
+    ) -> tuple[list[dict], bool]:
+        db = self._connect()
+        try:
+            rows = db.execute(
+                "SELECT seq, text, is_ai FROM messages"
+                " WHERE session = ? AND knowledge_base_id = ? AND seq < ?"
+                " ORDER BY seq DESC LIMIT ?",
+                (session, kb, before if before is not None else 2**62, limit + 1),
+            ).fetchall()
+        finally:
+            db.close()
+        messages = [
+            {"text": row["text"], "is_ai": bool(row["is_ai"]), "seq": row["seq"]}
+            for row in reversed(rows[:limit])
+        ]
+        return messages, len(rows) > limit
+
+    async def page(
+        self,
+        session: str,
+        knowledge_base_id: str | None,
+        before: int | None = None,
+        limit: int = CHAT_HISTORY_PAGE_SIZE,
+    ) -> tuple[list[dict], bool]:
+        """Up to ``limit`` messages preceding ``before`` (default: the end).
+
+        Returns the messages oldest first, and whether there are older
+        ones still.
+        """
+
+        await self.flush()
+        return await asyncio.to_thread(
+            self._read_page, session, knowledge_base_id or "", before, limit
+        )
+
+    def _read_last_assistant(self, session: str) -> str | None:
+        db = self._connect()
+        try:
+            row = db.execute(
+                "SELECT knowledge_base_id FROM sessions WHERE session = ?",
+                (session,),
+            ).fetchone()
+        finally:
+            db.close()
+        if row is None:
+            return None
+        return row["knowledge_base_id"] or None
+
+    async def last_assistant(self, session: str) -> str | None:
+        """The knowledge base the session last chatted with, if any."""
+
+        await self.flush()
+        return await asyncio.to_thread(self._read_last_assistant, session)
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "batches": self.batches,
+            "written": self.written,
+        }
+
+    @contextlib.asynccontextmanager
+    async def lifespan(self):
+        """Reflex lifespan task committing queued writes in the background."""
+
+        async def flush_periodically() -> None:
+            while True:
+                await asyncio.sleep(self.flush_interval)
+                try:
+                    await self.flush()
+                except Exception as e:
+                    print("Conversation flush failed:", e)
+
+        task = asyncio.create_task(flush_periodically())
+        try:
+            yield
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            await self.flush()
+
+
+conversations = ConversationStore()
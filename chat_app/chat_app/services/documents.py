@@ -0,0 +1,140 @@
+import io
+import json
+import os
+import zipfile
+from pathlib import PurePath
+from typing import BinaryIO, Iterable, Iterator
+from xml.etree import ElementTree
+
+
+# Upper bound on the size of one retrievable passage, in words. Paragraphs
+# are packed together up to this size; longer paragraphs are split.
+CHUNK_MAX_WORDS = int(os.environ.get("LOCAL_ENGINE_CHUNK_WORDS", "150"))
+
+_WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+# Keys that mark a JSON object as a question/answer pair.
+_QUESTION_KEYS = ("question", "q", "title", "prompt")
+_ANSWER_KEYS = ("answer", "a", "response", "text", "content")
+
+
+class UnsupportedDocumentError(ValueError):
+    """Raised for documents the local engine cannot extract text from."""
+
+
+def _docx_paragraphs(source: BinaryIO) -> Iterator[str]:
+    try:
+        archive = zipfile.ZipFile(source)
+        xml = archive.open("word/document.xml")
+    except (zipfile.BadZipFile, KeyError) as e:
+        raise UnsupportedDocumentError(f"Not a valid DOCX file: {e}") from e
+    with archive, xml:
+        # Parse incrementally and drop each paragraph once read, so a long
+        # document is never held as one tree. Table cells are paragraphs
+        # too, so this also picks up tabular FAQs.
+        for _event, element in ElementTree.iterparse(xml):
+            if element.tag != f"{_WORD_NS}p":
+                continue
+            text = "".join(node.text or "" for node in element.iter(f"{_WORD_NS}t"))
+            element.clear()
+            if text.strip():
+                yield text.strip()
+
+
+def _text_paragraphs(lines: Iterable[str]) -> Iterator[str]:
+    words: list[str] = []
+    for line in lines:
+        if line.strip():
+            words.extend(line.split())
+            # A file without blank lines is one long paragraph; hand it
+            # on in passage-sized pieces instead of collecting it whole.
+            while len(words) >= CHUNK_MAX_WORDS:
+                yield " ".join(words[:CHUNK_MAX_WORDS])
+                words = words[CHUNK_MAX_WORDS:]
+        elif words:
+            yield " ".join(words)
+            words = []
+    if words:
+        yield " ".join(words)
+
+
+def _flatten_json(value, prefix: str = "") -> Iterator[str]:
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from _flatten_json(item, f"{prefix}{key}: ")
+    elif isinstance(value, list):
+        for item in value:
+            yield from _flatten_json(item, prefix)
+    elif value is not None and str(value).strip():
+        yield f"{prefix}{value}"
+
+
+def _json_paragraphs(data) -> Iterator[str]:
+    """One paragraph per record, with Q/A pairs kept together."""
+
+    records = data if isinstance(data, list) else [data]
+    for record in records:
+        if isinstance(record, dict):
+            lowered = {str(k).lower(): v for k, v in record.items()}
+            question = next((lowered[k] for k in _QUESTION_KEYS if k in lowered), None)
+            answer = next((lowered[k] for k in _ANSWER_KEYS if k in lowered), None)
+            if isinstance(question, str) and isinstance(answer, str):
+                yield f"{question.strip()}\n{answer.strip()}"
+                continue
+        text = "\n".join(_flatten_json(record))
+        if text:
+            yield text
+
+
+def iter_paragraphs(file_name: str, source: BinaryIO) -> Iterator[str]:
+    """Plain-text paragraphs of a DOCX, JSON or text document, as read.
+
+    ``source`` must be seekable (DOCX files are zip archives). Text and
+    DOCX documents are parsed as a stream; JSON is parsed whole, since a
+    record is only complete once its closing brace is read.
+    """
+
+    suffix = PurePath(file_name).suffix.lower()
+    if suffix == ".docx":
+        yield from _docx_paragraphs(source)
+        return
+    text = io.TextIOWrapper(source, encoding="utf-8-sig")
+    try:
+        if suffix == ".json":
+            try:
+                yield from _json_paragraphs(json.load(text))
+            except json.JSONDecodeError as e:
+                raise UnsupportedDocumentError(
+                    f"Invalid JSON in {file_name}: {e}"
+                ) from e
+        else:
+            yield from _text_paragraphs(text)
+    except UnicodeDecodeError as e:
+        raise UnsupportedDocumentError(
+            f"{file_name} is neither DOCX nor UTF-8 text"
+        ) from e
+    finally:
+        # Leave ``source`` open for the caller.
+        text.detach()
+
+
+def chunk_paragraphs(
+    paragraphs: Iterable[str], max_words: int = CHUNK_MAX_WORDS
+) -> Iterator[str]:
+    """Pack consecutive paragraphs into passages of at most ``max_words``."""
+
+    current: list[str] = []
+    size = 0
+    for paragraph in paragraphs:
+        words = paragraph.split()
+        if size and size + len(words) > max_words:
+            yield "\n".join(current)
+            current, size = [], 0
+        if len(words) > max_words:
+            for start in range(0, len(words), max_words):
+                yield " ".join(words[start : start + max_words])
+            continue
+        current.append(paragraph)
+        size += len(words)
+    if current:
+        yield "\n".join(current)
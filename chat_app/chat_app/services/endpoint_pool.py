@@ -0,0 +1,177 @@
+import asyncio
+import contextlib
+import hashlib
+import os
+import time
+from typing import AsyncIterator, Callable
+
+import httpx
+
+
+# Consecutive failed requests or probes after which a replica is ejected.
+EJECT_AFTER_FAILURES = int(os.environ.get("LLAMA_FAQ_EJECT_AFTER_FAILURES", "3"))
+
+# How long an ejected replica is skipped before it gets another chance
+# (sooner if a health probe succeeds).
+EJECT_SECONDS = float(os.environ.get("LLAMA_FAQ_EJECT_SECONDS", "30"))
+
+# Health probes: a GET on this path (relative to each replica's base URL)
+# every PROBE_INTERVAL seconds. Any non-5xx answer counts as alive, so a
+# backend without a dedicated health route still probes fine. An empty
+# path disables probing; ejection then relies on request failures alone.
+HEALTH_PATH = os.environ.get("LLAMA_FAQ_HEALTH_PATH", "/health")
+PROBE_INTERVAL = float(os.environ.get("LLAMA_FAQ_PROBE_INTERVAL", "5"))
+PROBE_TIMEOUT = float(os.environ.get("LLAMA_FAQ_PROBE_TIMEOUT", "2"))
+
+# With knowledge base affinity, a replica keeps a knowledge base's queries
+# (and its warm caches) unless it has this many more requests in flight
+# than the least loaded replica.
+AFFINITY_SLACK = int(os.environ.get("LLAMA_FAQ_AFFINITY_SLACK", "8"))
+
+
+def is_replica_failure(error: BaseException) -> bool:
+    """Whether an error says something about the replica's health.
+
+    Transport errors and 5xx responses do; 4xx responses are the
+    request's fault.
+    """
+
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500
+    return isinstance(error, httpx.TransportError)
+
+
+class Endpoint:
+    """One backend replica and its load/health bookkeeping."""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self.outstanding = 0
+        self.failures = 0
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.errors = 0
+
+    @property
+    def available(self) -> bool:
+        return self.ejected_until <= time.monotonic()
+
+    def _affinity_score(self, key: str) -> bytes:
+        return hashlib.blake2b(f"{key}|{self.base_url}".encode(), digest_size=8).digest()
+
+
+class EndpointPool:
+    """Client-side load balancer over backend replicas.
+
+    Requests go to the available replica with the fewest requests in
+    flight. With ``affinity`` enabled, a request carrying an affinity key
+    (the knowledge base id) prefers the replica chosen for that key by
+    rendezvous hashing, so each knowledge base sticks to one replica while
+    the set of replicas is stable. Replicas are ejected after repeated
+    failures and re-admitted by a successful health probe or once the
+    ejection period ends. If every replica is ejected, requests are still
+    spread across all of them rather than failing outright.
+    """
+
+    def __init__(self, base_urls: list[str], affinity: bool = False):
+        if not base_urls:
+            raise ValueError("At least one backend URL is required")
+        self.endpoints = [Endpoint(url) for url in base_urls]
+        self.affinity = affinity
+
+    def pick(self, affinity_key: str | None = None, exclude=()) -> Endpoint:
+        """Choose the replica for the next request."""
+
+        candidates = [e for e in self.endpoints if e not in exclude] or self.endpoints
+        candidates = [e for e in candidates if e.available] or candidates
+        least_loaded = min(candidates, key=lambda e: e.outstanding)
+        if self.affinity and affinity_key:
+            preferred = max(candidates, key=lambda e: e._affinity_score(affinity_key))
+            if preferred.outstanding <= least_loaded.outstanding + AFFINITY_SLACK:
+                return preferred
+        return least_loaded
+
+    def record_success(self, endpoint: Endpoint) -> None:
+        endpoint.failures = 0
+        endpoint.ejected_until = 0.0
+
+    def record_failure(self, endpoint: Endpoint) -> None:
+        endpoint.errors += 1
+        endpoint.failures += 1
+        if endpoint.failures >= EJECT_AFTER_FAILURES:
+            endpoint.ejected_until = time.monotonic() + EJECT_SECONDS
+
+    @contextlib.asynccontextmanager
+    async def acquire(
+        self, affinity_key: str | None = None, exclude=()
+    ) -> AsyncIterator[Endpoint]:
+        """Pick a replica and account for the request made against it.
+
+        The replica's in-flight count covers the whole ``async with``
+        block (e.g. a full streamed response), and its outcome feeds the
+        replica's health.
+        """
+
+        endpoint = self.pick(affinity_key, exclude)
+        endpoint.outstanding += 1
+        endpoint.requests += 1
+        try:
+            yield endpoint
+        except BaseException as e:
+            if is_replica_failure(e):
+                self.record_failure(endpoint)
+            raise
+        else:
+            self.record_success(endpoint)
+        finally:
+            endpoint.outstanding -= 1
+
+    async def _probe(
+        self, endpoint: Endpoint, get_client: Callable[[str], httpx.AsyncClient]
+    ) -> None:
+        try:
+            response = await get_client(endpoint.base_url).get(
+                HEALTH_PATH, timeout=PROBE_TIMEOUT
+            )
+        except httpx.TransportError:
+            self.record_failure(endpoint)
+            return
+        if response.status_code >= 500:
+            self.record_failure(endpoint)
+        else:
+            self.record_success(endpoint)
+
+    async def _probe_forever(
+        self, get_client: Callable[[str], httpx.AsyncClient]
+    ) -> None:
+        while True:
+            await asyncio.gather(*(self._probe(e, get_client) for e in self.endpoints))
+            await asyncio.sleep(PROBE_INTERVAL)
+
+    @contextlib.asynccontextmanager
+    async def probing(self, get_client: Callable[[str], httpx.AsyncClient]):
+        """Run periodic health probes for the duration of the block."""
+
+        if not HEALTH_PATH or len(self.endpoints) < 2:
+            # A single replica has nowhere to fail over to.
+            yield
+            return
+        task = asyncio.create_task(self._probe_forever(get_client))
+        try:
+            yield
+        finally:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+    def stats(self) -> list[dict]:
+        return [
+            {
+                "base_url": e.base_url,
+                "available": e.available,
+                "outstanding": e.outstanding,
+                "requests": e.requests,
+                "errors": e.errors,
+            }
+            for e in self.endpoints
+        ]
@@ -0,0 +1,106 @@
+import asyncio
+import contextlib
+import os
+import time
+from typing import Callable
+
+
+# A generation whose client has been disconnected for this long (seconds)
+# is cancelled. The grace period lets page reloads and flaky networks
+# reconnect without losing the answer.
+GENERATION_DISCONNECT_GRACE = float(
+    os.environ.get("GENERATION_DISCONNECT_GRACE", "15")
+)
+
+# How often the reaper looks for generations of disconnected clients.
+GENERATION_REAP_INTERVAL = float(os.environ.get("GENERATION_REAP_INTERVAL", "2"))
+
+
+class GenerationTracker:
+    """The in-flight reply generation of each client session.
+
+    ``generate_response`` registers its task under the session's client
+    token and generation id. Starting a new conversation cancels it, which
+    also aborts the backend HTTP request it is waiting on, and the
+    :meth:`lifespan` reaper cancels generations whose client went away.
+    """
+
+    def __init__(self):
+        self._tasks: dict[str, tuple[int, asyncio.Task]] = {}
+        self._disconnected_since: dict[str, float] = {}
+        self.cancelled = 0
+
+    def start(self, token: str, generation: int) -> None:
+        """Register the current task as ``token``'s running generation.
+
+        Any older generation still running for the session is cancelled.
+        """
+
+        task = asyncio.current_task()
+        assert task is not None
+        previous = self._tasks.get(token)
+        if previous is not None and previous[1] is not task:
+            self._cancel(previous[1])
+        self._tasks[token] = (generation, task)
+
+    def finish(self, token: str, generation: int) -> None:
+        current = self._tasks.get(token)
+        if current is not None and current[0] == generation:
+            del self._tasks[token]
+            self._disconnected_since.pop(token, None)
+
+    def cancel(self, token: str) -> bool:
+        """Cancel ``token``'s running generation, if any."""
+
+        current = self._tasks.pop(token, None)
+        self._disconnected_since.pop(token, None)
+        if current is None:
+            return False
+        self._cancel(current[1])
+        return True
+
+    def _cancel(self, task: asyncio.Task) -> None:
+        if not task.done() and task is not asyncio.current_task():
+            task.cancel()
+            self.cancelled += 1
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self._tasks), "cancelled": self.cancelled}
+
+    async def _reap(self, is_connected: Callable[[str], bool]) -> None:
+        while True:
+            await asyncio.sleep(GENERATION_REAP_INTERVAL)
+            now = time.monotonic()
+            for token in list(self._tasks):
+                if is_connected(token):
+                    self._disconnected_since.pop(token, None)
+                    continue
+                since = self._disconnected_since.setdefault(token, now)
+                if now - since >= GENERATION_DISCONNECT_GRACE:
+                    self.cancel(token)
+
+    @contextlib.asynccontextmanager
+    async def lifespan(self, rx_app):
+        """Reflex lifespan task cancelling generations of gone clients.
+
+        Register it with the ``rx.App`` bound explicitly
+        (``register_lifespan_task(generations.lifespan, rx_app=app)``):
+        depending on the Reflex version, a parameter named ``app`` is
+        filled with the Starlette app, which has no event namespace.
+        """
+
+        def is_connected(token: str) -> bool:
+            namespace = getattr(rx_app, "event_namespace", None)
+            # Without a websocket namespace there is nothing to watch.
+            return namespace is None or token in namespace.token_to_sid
+
+        task = asyncio.create_task(self._reap(is_connected))
+        try:
+            yield
+        finally:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+
+generations = GenerationTracker()
@@ -0,0 +1,157 @@
+import argparse
+import functools
+import hashlib
+import json
+import os
+from pathlib import Path
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; images are then served as uploaded.
+    Image = None
+
+
+# Widths (CSS pixels x DPR) of the generated thumbnails. Cards are at most
+# 28rem (448px) wide, so these cover 1x and 2x displays.
+THUMBNAIL_WIDTHS = tuple(
+    int(w) for w in os.environ.get("THUMBNAIL_WIDTHS", "320,448,640,896").split(",")
+)
+
+# `sizes` attribute matching the card layout (`w-full max-w-md`).
+THUMBNAIL_SIZES = "(min-width: 28rem) 28rem, 100vw"
+
+# Encoder quality for the generated thumbnails.
+THUMBNAIL_QUALITY = int(os.environ.get("THUMBNAIL_QUALITY", "75"))
+
+# Thumbnails of the static assets live in `assets/thumbs/`, described by a
+# manifest written by the batch script (`python -m chat_app.services.images`).
+ASSETS_DIR = Path("assets")
+ASSET_THUMBS_DIR = ASSETS_DIR / "thumbs"
+ASSET_MANIFEST = ASSET_THUMBS_DIR / "manifest.json"
+
+# Template fields holding the `srcset` of each generated format.
+SRCSET_FIELDS = {"avif": "image_avif_srcset", "webp": "image_webp_srcset"}
+
+
+def _formats() -> list[str]:
+    """Thumbnail formats this Pillow build can encode, best first."""
+
+    if Image is None:
+        return []
+    Image.init()
+    return [fmt for fmt in SRCSET_FIELDS if fmt.upper() in Image.SAVE]
+
+
+def _file_hash(path: Path) -> str:
+    hasher = hashlib.sha256()
+    with path.open("rb") as f:
+        while chunk := f.read(64 * 1024):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def optimise_image(source: Path, out_dir: Path, url_prefix: str) -> dict[str, str]:
+    """Write resized AVIF/WebP thumbnails of ``source`` into ``out_dir``.
+
+    File names carry a hash of the source content, so they never collide
+    and can be cached forever. Returns the template fields
+    (``image_avif_srcset`` / ``image_webp_srcset``) pointing at them under
+    ``url_prefix``; empty if Pillow is unavailable or the file is not an
+    image. Blocking: call from a worker thread.
+    """
+
+    formats = _formats()
+    if not formats:
+        return {}
+    digest = _file_hash(source)[:16]
+    try:
+        with Image.open(source) as image:
+            image = ImageOps.exif_transpose(image)
+            image.load()
+    except (OSError, Image.DecompressionBombError):
+        return {}
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+
+    # Never upscale; an image narrower than the smallest width gets one
+    # thumbnail at its own size.
+    widths = [w for w in THUMBNAIL_WIDTHS if w < image.width] or [image.width]
+    out_dir.mkdir(parents=True, exist_ok=True)
+    fields = {}
+    for fmt in formats:
+        candidates = []
+        for width in widths:
+            name = f"{source.stem}-{digest}-{width}.{fmt}"
+            path = out_dir / name
+            if not path.exists():
+                height = max(1, round(image.height * width / image.width))
+                resized = image.resize((width, height), Image.Resampling.LANCZOS)
+                tmp_path = path.with_name(f".{name}.part")
+                resized.save(tmp_path, format=fmt.upper(), quality=THUMBNAIL_QUALITY)
+                os.replace(tmp_path, path)
+            candidates.append(f"{url_prefix.rstrip('/')}/{name} {width}w")
+        fields[SRCSET_FIELDS[fmt]] = ", ".join(candidates)
+    return fields
+
+
+@functools.lru_cache(maxsize=1)
+def _asset_manifest(mtime_ns: int) -> dict[str, dict[str, str]]:
+    try:
+        with ASSET_MANIFEST.open("r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def with_image_variants(entry: dict) -> dict:
+    """A template with the `srcset`s of its static asset image filled in.
+
+    Entries that already carry thumbnails (uploaded images) are returned
+    unchanged, as are images without a batch-generated thumbnail.
+    """
+
+    if any(field in entry for field in SRCSET_FIELDS.values()):
+        return entry
+    try:
+        mtime_ns = ASSET_MANIFEST.stat().st_mtime_ns
+    except OSError:
+        return entry
+    variants = _asset_manifest(mtime_ns).get(entry.get("image_src", ""))
+    return {**entry, **variants} if variants else entry
+
+
+def optimise_assets(assets_dir: Path = ASSETS_DIR) -> dict[str, dict[str, str]]:
+    """Generate thumbnails for every PNG/JPEG in ``assets_dir``.
+
+    Writes them, and a manifest keyed by each image's public path
+    (e.g. ``/ref1.png``), to ``assets_dir/thumbs``.
+    """
+
+    thumbs_dir = assets_dir / "thumbs"
+    manifest = {}
+    for source in sorted(assets_dir.iterdir()):
+        if source.suffix.lower() not in (".png", ".jpg", ".jpeg"):
+            continue
+        fields = optimise_image(source, thumbs_dir, "/thumbs")
+        if fields:
+            manifest[f"/{source.name}"] = fields
+    thumbs_dir.mkdir(parents=True, exist_ok=True)
+    with (thumbs_dir / "manifest.json").open("w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Generate AVIF/WebP card thumbnails for the static assets."
+    )
+    parser.add_argument("assets_dir", nargs="?", type=Path, default=ASSETS_DIR)
+    args = parser.parse_args()
+    if not _formats():
+        parser.exit(1, "Pillow with WebP or AVIF support is required.\n")
+    manifest = optimise_assets(args.assets_dir)
+    print(f"Optimised {len(manifest)} images into {args.assets_dir / 'thumbs'}")
+
+
+if __name__ == "__main__":
+    main()
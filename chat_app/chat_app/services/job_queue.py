@@ -0,0 +1,221 @@
+import asyncio
+import contextlib
+import json
+import os
+import random
+import time
+import uuid
+from typing import Awaitable, Callable
+
+from chat_app.services import storage
+
+
+# Number of concurrent job workers per Reflex worker process.
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+
+# Attempts before a job is marked failed for good.
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "5"))
+
+# Retry backoff: base * 2**(attempt - 1), capped, with +/-50% jitter.
+JOB_BACKOFF_BASE = float(os.environ.get("JOB_BACKOFF_BASE", "2"))
+JOB_BACKOFF_MAX = float(os.environ.get("JOB_BACKOFF_MAX", "120"))
+
+# A running job whose worker has not reported progress for this long is
+# assumed dead (e.g. the process restarted) and is picked up again.
+JOB_LEASE_SECONDS = float(os.environ.get("JOB_LEASE_SECONDS", "300"))
+
+# How often idle workers look for jobs enqueued by other processes.
+JOB_POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL", "1"))
+
+ProgressFn = Callable[[dict], Awaitable[None]]
+JobHandler = Callable[[dict, ProgressFn], Awaitable[dict]]
+
+
+class JobQueue:
+    """Persistent SQLite-backed job queue with a local worker pool.
+
+    Jobs survive restarts, are claimed atomically (so several Reflex
+    workers can share one database) and are retried with exponential
+    backoff. Handlers receive the job dict and a ``report`` callback that
+    persists progress, which callers can poll with :meth:`get`.
+    """
+
+    def __init__(self, db_name: str = "jobs.db", workers: int = JOB_WORKERS):
+        self.db_name = db_name
+        self.workers = workers
+        self._handlers: dict[str, JobHandler] = {}
+        self._wakeup: asyncio.Event | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._initialised = False
+
+    def _connect(self):
+        db = storage.connect(self.db_name)
+        if not self._initialised:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY,"
+                " kind TEXT NOT NULL,"
+                " status TEXT NOT NULL,"
+                " payload TEXT NOT NULL,"
+                " progress TEXT NOT NULL DEFAULT '{}',"
+                " result TEXT,"
+                " error TEXT,"
+                " attempts INTEGER NOT NULL DEFAULT 0,"
+                " max_attempts INTEGER NOT NULL,"
+                " next_run_at REAL NOT NULL,"
+                " lease_expires_at REAL NOT NULL DEFAULT 0,"
+                " created_at REAL NOT NULL,"
+                " updated_at REAL NOT NULL)"
+            )
+            db.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_due ON jobs (status, next_run_at)"
+            )
+            self._initialised = True
+        return db
+
+    @staticmethod
+    def _row_to_job(row) -> dict:
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["progress"] = json.loads(job["progress"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def register(self, kind: str, handler: JobHandler) -> None:
+        """Register the coroutine that runs jobs of ``kind``."""
+
+        self._handlers[kind] = handler
+
+    def _insert(self, kind: str, payload: dict, max_attempts: int) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with contextlib.closing(self._connect()) as db:
+            db.execute(
+                "INSERT INTO jobs (id, kind, status, payload, max_attempts,"
+                " next_run_at, created_at, updated_at)"
+                " VALUES (?, ?, 'queued', ?, ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(payload), max_attempts, now, now, now),
+            )
+        return job_id
+
+    async def enqueue(
+        self, kind: str, payload: dict, max_attempts: int = JOB_MAX_ATTEMPTS
+    ) -> str:
+        """Persist a new job and return its id."""
+
+        job_id = await asyncio.to_thread(self._insert, kind, payload, max_attempts)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job_id
+
+    def _get(self, job_id: str) -> dict | None:
+        with contextlib.closing(self._connect()) as db:
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row is not None else None
+
+    async def get(self, job_id: str) -> dict | None:
+        """Current state of a job, including its latest progress report."""
+
+        return await asyncio.to_thread(self._get, job_id)
+
+    def _claim_next(self) -> dict | None:
+        now = time.time()
+        with contextlib.closing(self._connect()) as db:
+            # A single UPDATE ... RETURNING is atomic, so two workers can
+            # never claim the same job.
+            row = db.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1,"
+                " lease_expires_at = ?, updated_at = ?"
+                " WHERE id = ("
+                "  SELECT id FROM jobs"
+                "  WHERE (status = 'queued' AND next_run_at <= ?)"
+                "   OR (status = 'running' AND lease_expires_at <= ?)"
+                "  ORDER BY created_at LIMIT 1)"
+                " RETURNING *",
+                (now + JOB_LEASE_SECONDS, now, now, now),
+            ).fetchone()
+        return self._row_to_job(row) if row is not None else None
+
+    def _update(self, job_id: str, **fields) -> None:
+        fields["updated_at"] = time.time()
+        for key in ("progress", "result"):
+            if key in fields:
+                fields[key] = json.dumps(fields[key])
+        assignments = ", ".join(f"{key} = ?" for key in fields)
+        with contextlib.closing(self._connect()) as db:
+            db.execute(
+                f"UPDATE jobs SET {assignments} WHERE id = ?",
+                (*fields.values(), job_id),
+            )
+
+    async def _run(self, job: dict) -> None:
+        async def report(progress: dict) -> None:
+            job["progress"] = progress
+            await asyncio.to_thread(
+                self._update,
+                job["id"],
+                progress=progress,
+                lease_expires_at=time.time() + JOB_LEASE_SECONDS,
+            )
+
+        handler = self._handlers.get(job["kind"])
+        try:
+            if handler is None:
+                raise LookupError(f"No handler registered for {job['kind']!r} jobs")
+            result = await handler(job, report)
+        except asyncio.CancelledError:
+            # Shutting down: let another worker resume the job right away.
+            await asyncio.to_thread(
+                self._update, job["id"], status="queued", next_run_at=0
+            )
+            raise
+        except Exception as e:
+            if job["attempts"] >= job["max_attempts"] or handler is None:
+                await asyncio.to_thread(
+                    self._update, job["id"], status="failed", error=str(e)
+                )
+                return
+            delay = min(
+                JOB_BACKOFF_BASE * 2 ** (job["attempts"] - 1), JOB_BACKOFF_MAX
+            )
+            delay *= random.uniform(0.5, 1.5)
+            await asyncio.to_thread(
+                self._update,
+                job["id"],
+                status="queued",
+                error=str(e),
+                next_run_at=time.time() + delay,
+            )
+            return
+
+        await asyncio.to_thread(
+            self._update, job["id"], status="done", result=result, error=None
+        )
+
+    async def _worker(self) -> None:
+        assert self._wakeup is not None
+        while True:
+            job = await asyncio.to_thread(self._claim_next)
+            if job is None:
+                self._wakeup.clear()
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._wakeup.wait(), JOB_POLL_INTERVAL)
+                continue
+            await self._run(job)
+
+    @contextlib.asynccontextmanager
+    async def lifespan(self):
+        """Reflex lifespan task running the worker pool."""
+
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        try:
+            yield
+        finally:
+            for task in self._tasks:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+            self._tasks = []
+
+
+job_queue = JobQueue()
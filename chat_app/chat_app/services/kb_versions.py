@@ -0,0 +1,93 @@
+import asyncio
+import contextlib
+import os
+import time
+
+from chat_app.services import storage
+
+
+# How long (seconds) a worker trusts the knowledge base versions it read
+# before reading them again. Bounds how long another worker may keep
+# serving cached answers after a knowledge base changed.
+KB_VERSION_POLL_INTERVAL = float(os.environ.get("KB_VERSION_POLL_INTERVAL", "1"))
+
+
+class KnowledgeBaseVersions:
+    """Content version of each knowledge base, shared by all workers.
+
+    Every ingest into a knowledge base bumps its version in a SQLite
+    table. Cached answers are stored with the version they were computed
+    for and a lookup under another version misses, so content changed by
+    one worker invalidates the caches of every worker. Versions read are
+    kept for ``poll_interval`` seconds, so cache hits seldom touch the
+    disk.
+    """
+
+    def __init__(
+        self,
+        db_name: str = "kb_versions.db",
+        poll_interval: float = KB_VERSION_POLL_INTERVAL,
+    ):
+        self.db_name = db_name
+        self.poll_interval = poll_interval
+        # knowledge base id -> (version, monotonic time to re-read it)
+        self._versions: dict[str, tuple[int, float]] = {}
+        self._initialised = False
+
+    def _connect(self):
+        db = storage.connect(self.db_name)
+        if not self._initialised:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS kb_versions ("
+                " knowledge_base_id TEXT PRIMARY KEY,"
+                " version INTEGER NOT NULL)"
+            )
+            self._initialised = True
+        return db
+
+    def _read(self, knowledge_base_id: str) -> int:
+        with contextlib.closing(self._connect()) as db:
+            row = db.execute(
+                "SELECT version FROM kb_versions WHERE knowledge_base_id = ?",
+                (knowledge_base_id,),
+            ).fetchone()
+        return row["version"] if row is not None else 0
+
+    def _increment(self, knowledge_base_id: str) -> int:
+        with contextlib.closing(self._connect()) as db:
+            row = db.execute(
+                "INSERT INTO kb_versions (knowledge_base_id, version) VALUES (?, 1)"
+                " ON CONFLICT (knowledge_base_id) DO UPDATE"
+                " SET version = version + 1 RETURNING version",
+                (knowledge_base_id,),
+            ).fetchone()
+        return row["version"]
+
+    def _remember(self, knowledge_base_id: str, version: int) -> int:
+        # Versions only grow: a slow read must not undo a newer bump.
+        known = self._versions.get(knowledge_base_id)
+        if known is not None:
+            version = max(version, known[0])
+        self._versions[knowledge_base_id] = (
+            version,
+            time.monotonic() + self.poll_interval,
+        )
+        return version
+
+    async def get(self, knowledge_base_id: str) -> int:
+        """Current content version of a knowledge base (0 if never bumped)."""
+
+        known = self._versions.get(knowledge_base_id)
+        if known is not None and known[1] > time.monotonic():
+            return known[0]
+        version = await asyncio.to_thread(self._read, knowledge_base_id)
+        return self._remember(knowledge_base_id, version)
+
+    async def bump(self, knowledge_base_id: str) -> int:
+        """Record that a knowledge base's content changed; returns the new version."""
+
+        version = await asyncio.to_thread(self._increment, knowledge_base_id)
+        return self._remember(knowledge_base_id, version)
+
+
+kb_versions = KnowledgeBaseVersions()
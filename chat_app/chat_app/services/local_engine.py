@@ -0,0 +1,505 @@
+import asyncio
+import hashlib
+import itertools
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import uuid
+from pathlib import Path
+from typing import AsyncIterable, BinaryIO, Callable, Iterable, Iterator
+
+import numpy as np
+
+from chat_app.services import storage
+from chat_app.services.bm25 import BM25Index, create_array, search_segments, tokenize
+from chat_app.services.documents import chunk_paragraphs, iter_paragraphs
+from chat_app.services.uploads import (
+    MAX_UPLOAD_BYTES,
+    UPLOAD_CHUNK_SIZE,
+    UploadTooLargeError,
+)
+
+
+# Passages returned as the answer to a query.
+LOCAL_ENGINE_TOP_K = int(os.environ.get("LOCAL_ENGINE_TOP_K", "3"))
+
+# Passages indexed per batch. Each batch is published as a new segment of
+# the knowledge base as soon as it is built, so memory use while indexing
+# is bounded by the batch rather than the document.
+LOCAL_ENGINE_BATCH_PASSAGES = int(
+    os.environ.get("LOCAL_ENGINE_BATCH_PASSAGES", "500")
+)
+
+# Segments a knowledge base may have before the smaller ones are merged;
+# every query searches each segment.
+LOCAL_ENGINE_MAX_SEGMENTS = int(os.environ.get("LOCAL_ENGINE_MAX_SEGMENTS", "8"))
+
+# Documents are spooled before indexing (DOCX archives need random
+# access): in memory up to this size, in a temporary file beyond it.
+LOCAL_ENGINE_SPOOL_BYTES = int(
+    os.environ.get("LOCAL_ENGINE_SPOOL_BYTES", str(1024 * 1024))
+)
+
+NO_ANSWER = "I could not find anything about that in this assistant's documents."
+
+_KB_ID_RE = re.compile(r"[A-Za-z0-9_-]+")
+
+
+def spool_file() -> BinaryIO:
+    """Temporary file to hold a document on its way into the index."""
+
+    return tempfile.SpooledTemporaryFile(LOCAL_ENGINE_SPOOL_BYTES)
+
+
+def _file_digest(source: BinaryIO) -> str:
+    hasher = hashlib.sha256()
+    source.seek(0)
+    while chunk := source.read(UPLOAD_CHUNK_SIZE):
+        hasher.update(chunk)
+    source.seek(0)
+    return hasher.hexdigest()
+
+
+def _batched(items: Iterable[str], size: int) -> Iterator[list[str]]:
+    iterator = iter(items)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+class PassageStore:
+    """The passages of one knowledge base segment, memory-mapped.
+
+    Passage texts are concatenated into one UTF-8 byte array sliced by
+    ``offsets``; ``document_ids`` points each passage at its file name in
+    ``documents``. Like the BM25 arrays these are ``.npy`` files mapped
+    read-only, so only the passages actually returned are read.
+    """
+
+    def __init__(
+        self,
+        text: np.ndarray,
+        offsets: np.ndarray,
+        document_ids: np.ndarray,
+        documents: list[str],
+    ):
+        self.text = text
+        self.offsets = offsets
+        self.document_ids = document_ids
+        self.documents = documents
+
+    def __len__(self) -> int:
+        return len(self.document_ids)
+
+    def __getitem__(self, i: int) -> dict:
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return {
+            "text": self.text[start:end].tobytes().decode("utf-8"),
+            "document": self.documents[self.document_ids[i]],
+        }
+
+    def __iter__(self) -> Iterator[dict]:
+        return (self[i] for i in range(len(self)))
+
+    @staticmethod
+    def save(directory: Path, passages: list[dict]) -> None:
+        documents = list(dict.fromkeys(p["document"] for p in passages))
+        document_ids = {name: i for i, name in enumerate(documents)}
+        encoded = [p["text"].encode("utf-8") for p in passages]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        np.save(
+            directory / "passage_text.npy",
+            np.frombuffer(b"".join(encoded), dtype=np.uint8),
+        )
+        np.save(directory / "passage_offsets.npy", offsets)
+        np.save(
+            directory / "passage_documents.npy",
+            np.asarray([document_ids[p["document"]] for p in passages], dtype=np.int32),
+        )
+        with (directory / "documents.json").open("w", encoding="utf-8") as f:
+            json.dump(documents, f)
+
+    @staticmethod
+    def merge(directory: Path, stores: list["PassageStore"]) -> None:
+        """Save the passages of several stores, in order, to ``directory``.
+
+        Copied one store at a time into mapped output files, like
+        :meth:`BM25Index.merge`.
+        """
+
+        documents = list(
+            dict.fromkeys(name for store in stores for name in store.documents)
+        )
+        document_ids = {name: i for i, name in enumerate(documents)}
+        n_passages = sum(len(store) for store in stores)
+        text = create_array(
+            directory, "passage_text", np.uint8, sum(len(s.text) for s in stores)
+        )
+        offsets = create_array(
+            directory, "passage_offsets", np.int64, n_passages + 1
+        )
+        passage_documents = create_array(
+            directory, "passage_documents", np.int32, n_passages
+        )
+        offsets[0] = 0
+        text_base = passage_base = 0
+        for store in stores:
+            n = len(store)
+            text[text_base : text_base + len(store.text)] = store.text
+            offsets[passage_base + 1 : passage_base + n + 1] = (
+                store.offsets[1:] + text_base
+            )
+            remap = np.asarray(
+                [document_ids[name] for name in store.documents], dtype=np.int32
+            )
+            passage_documents[passage_base : passage_base + n] = remap[
+                store.document_ids
+            ]
+            text_base += len(store.text)
+            passage_base += n
+        for array in (text, offsets, passage_documents):
+            array.flush()
+        with (directory / "documents.json").open("w", encoding="utf-8") as f:
+            json.dump(documents, f)
+
+    @classmethod
+    def load(cls, directory: Path) -> "PassageStore":
+        with (directory / "documents.json").open("r", encoding="utf-8") as f:
+            documents = json.load(f)
+        return cls(
+            text=np.load(directory / "passage_text.npy", mmap_mode="r"),
+            offsets=np.load(directory / "passage_offsets.npy", mmap_mode="r"),
+            document_ids=np.load(directory / "passage_documents.npy", mmap_mode="r"),
+            documents=documents,
+        )
+
+
+class LocalEngine:
+    """In-process stand-in for the llama-faq ingest/query service.
+
+    Documents are split into passages and indexed with BM25; a query is
+    answered with the best matching passages verbatim (extractive, no
+    LLM). Each knowledge base is persisted in its own directory under
+    ``root`` as a list of immutable segments, each a memory-mapped BM25
+    index plus its passages. ``CURRENT`` holds the manifest (segment ids
+    and per-document indexing progress) and is replaced atomically, so
+    readers never see a half-written update. Adding documents appends
+    segments; once there are more than ``LOCAL_ENGINE_MAX_SEGMENTS`` the
+    smaller ones are merged.
+
+    Because segments are never modified it is safe to memory-map them: a
+    worker opens a knowledge base without reading it, and RSS does not
+    grow with the number of assistants. Opened segments are cached per
+    worker; a changed manifest opens only the new ones.
+    """
+
+    def __init__(self, dir_name: str = "local_kb"):
+        self.dir_name = dir_name
+        self._segments: dict[str, dict[str, tuple[BM25Index, PassageStore]]] = {}
+        self._locks: dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    @property
+    def root(self) -> Path:
+        return storage.DATA_DIR / self.dir_name
+
+    def _kb_dir(self, knowledge_base_id: str) -> Path:
+        if not _KB_ID_RE.fullmatch(knowledge_base_id):
+            raise ValueError(f"Invalid knowledge base id: {knowledge_base_id!r}")
+        return self.root / knowledge_base_id
+
+    def _lock(self, knowledge_base_id: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(knowledge_base_id, threading.Lock())
+
+    def _manifest(self, knowledge_base_id: str) -> dict | None:
+        try:
+            raw = (self._kb_dir(knowledge_base_id) / "CURRENT").read_text().strip()
+        except FileNotFoundError:
+            return None
+        if not raw.startswith("{"):
+            # Written before segments existed: the name of a single one.
+            return {"segments": [raw], "documents": {}}
+        return json.loads(raw)
+
+    def _open_segment(
+        self, knowledge_base_id: str, segment_id: str
+    ) -> tuple[BM25Index, PassageStore]:
+        segment_dir = self._kb_dir(knowledge_base_id) / segment_id
+        return BM25Index.load(segment_dir), PassageStore.load(segment_dir)
+
+    def _load(
+        self, knowledge_base_id: str
+    ) -> list[tuple[BM25Index, PassageStore]] | None:
+        for _attempt in range(3):
+            manifest = self._manifest(knowledge_base_id)
+            if manifest is None:
+                return None
+            opened = self._segments.get(knowledge_base_id, {})
+            try:
+                segments = {
+                    segment_id: opened.get(segment_id)
+                    or self._open_segment(knowledge_base_id, segment_id)
+                    for segment_id in manifest["segments"]
+                }
+            except FileNotFoundError:
+                # Merged away by another worker while we were opening it.
+                continue
+            # Replacing the whole mapping also drops merged segments.
+            self._segments[knowledge_base_id] = segments
+            return list(segments.values())
+        raise RuntimeError(f"Knowledge base {knowledge_base_id} keeps changing")
+
+    def exists(self, knowledge_base_id: str) -> bool:
+        return self._manifest(knowledge_base_id) is not None
+
+    def preload(self, knowledge_base_id: str) -> bool:
+        """Open a knowledge base and have the OS read its files ahead.
+
+        Returns False if the knowledge base does not exist locally.
+        """
+
+        if self._load(knowledge_base_id) is None:
+            return False
+        if not hasattr(os, "posix_fadvise"):
+            return True
+        kb_dir = self._kb_dir(knowledge_base_id)
+        for segment_id in self._segments.get(knowledge_base_id, {}):
+            try:
+                paths = list((kb_dir / segment_id).iterdir())
+            except FileNotFoundError:
+                continue
+            for path in paths:
+                try:
+                    fd = os.open(path, os.O_RDONLY)
+                except FileNotFoundError:
+                    continue
+                try:
+                    os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+                finally:
+                    os.close(fd)
+        return True
+
+    def _write_segment(
+        self, knowledge_base_id: str, write: Callable[[Path], None]
+    ) -> str:
+        """Have ``write`` fill a new, not yet published segment directory."""
+
+        segment_id = uuid.uuid4().hex
+        segment_dir = self._kb_dir(knowledge_base_id) / segment_id
+        try:
+            segment_dir.mkdir(parents=True)
+            write(segment_dir)
+        except BaseException:
+            shutil.rmtree(segment_dir, ignore_errors=True)
+            raise
+        return segment_id
+
+    def _index_passages(self, knowledge_base_id: str, passages: list[dict]) -> str:
+        """Index a batch of passages into a new, not yet published segment."""
+
+        def write(segment_dir: Path) -> None:
+            BM25Index.build([tokenize(p["text"]) for p in passages]).save(segment_dir)
+            PassageStore.save(segment_dir, passages)
+
+        return self._write_segment(knowledge_base_id, write)
+
+    def _merge(self, knowledge_base_id: str, manifest: dict) -> list[str]:
+        """Merge the smaller half of the segments into one.
+
+        The merged segment is written from the mapped inputs one segment
+        at a time, without re-tokenising or loading their passages.
+        Updates ``manifest`` and returns the ids of the merged segments,
+        which may be deleted once it is published.
+        """
+
+        opened = {
+            segment_id: self._open_segment(knowledge_base_id, segment_id)
+            for segment_id in manifest["segments"]
+        }
+        merged = sorted(opened, key=lambda s: len(opened[s][1]))[
+            : len(opened) // 2 + 1
+        ]
+
+        def write(segment_dir: Path) -> None:
+            BM25Index.merge(segment_dir, [opened[s][0] for s in merged])
+            PassageStore.merge(segment_dir, [opened[s][1] for s in merged])
+
+        segment_id = self._write_segment(knowledge_base_id, write)
+        manifest["segments"] = [
+            s for s in manifest["segments"] if s not in merged
+        ] + [segment_id]
+        return merged
+
+    def _commit(
+        self,
+        knowledge_base_id: str,
+        digest: str,
+        file_name: str,
+        segment_id: str | None = None,
+        passages: int = 0,
+        complete: bool = False,
+    ) -> None:
+        """Publish a new segment and the document's indexing progress.
+
+        If publishing fails the segment is deleted, so it is re-indexed
+        when the document is added again.
+        """
+
+        kb_dir = self._kb_dir(knowledge_base_id)
+        unpublished = [segment_id] if segment_id is not None else []
+        merged = []
+        with self._lock(knowledge_base_id):
+            try:
+                manifest = self._manifest(knowledge_base_id) or {
+                    "segments": [],
+                    "documents": {},
+                }
+                progress = manifest["documents"].setdefault(
+                    digest, {"name": file_name, "passages": 0, "complete": False}
+                )
+                progress["passages"] += passages
+                progress["complete"] = complete
+                manifest["segments"].extend(unpublished)
+                if len(manifest["segments"]) > LOCAL_ENGINE_MAX_SEGMENTS:
+                    merged = self._merge(knowledge_base_id, manifest)
+                    unpublished.append(manifest["segments"][-1])
+
+                kb_dir.mkdir(parents=True, exist_ok=True)
+                tmp_path = kb_dir / f".CURRENT.{uuid.uuid4().hex}.part"
+                tmp_path.write_text(json.dumps(manifest))
+                os.replace(tmp_path, kb_dir / "CURRENT")
+            except BaseException:
+                for unpublished_id in unpublished:
+                    shutil.rmtree(kb_dir / unpublished_id, ignore_errors=True)
+                raise
+        for merged_id in merged:
+            shutil.rmtree(kb_dir / merged_id, ignore_errors=True)
+
+    def add_document(
+        self,
+        file_name: str,
+        source: BinaryIO,
+        knowledge_base_id: str | None = None,
+    ) -> dict:
+        """Index a document, creating a knowledge base unless one is given.
+
+        Blocking. ``source`` is read as a stream: paragraphs are parsed,
+        packed into passages, tokenised and indexed in batches, and each
+        batch is published as a new segment as soon as it is built, so
+        the existing index is appended to rather than rebuilt. Progress
+        is recorded against the document's SHA-256: adding a document
+        that failed part-way resumes after the passages already indexed,
+        and adding one that is already indexed does nothing.
+
+        Returns the same payload shape as the remote ingest endpoint:
+        ``knowledge_base_id``, ``message`` and ``documents``, the number of
+        documents this call added (1, also when it finds the document
+        already indexed, so a retried ingest still counts it once).
+        Callers adding several documents sum the counts.
+        """
+
+        knowledge_base_id = knowledge_base_id or str(uuid.uuid4())
+        digest = _file_digest(source)
+        manifest = self._manifest(knowledge_base_id) or {"documents": {}}
+        progress = manifest["documents"].get(digest, {"passages": 0})
+        if progress.get("complete"):
+            message = f"{file_name} is already indexed"
+        else:
+            passages = itertools.islice(
+                chunk_paragraphs(iter_paragraphs(file_name, source)),
+                progress["passages"],
+                None,
+            )
+            indexed = 0
+            for batch in _batched(passages, LOCAL_ENGINE_BATCH_PASSAGES):
+                segment_id = self._index_passages(
+                    knowledge_base_id,
+                    [{"text": text, "document": file_name} for text in batch],
+                )
+                self._commit(
+                    knowledge_base_id, digest, file_name, segment_id, len(batch)
+                )
+                indexed += len(batch)
+            self._commit(knowledge_base_id, digest, file_name, complete=True)
+            message = f"Indexed {indexed} passages from {file_name} locally"
+
+        return {
+            "knowledge_base_id": knowledge_base_id,
+            "message": message,
+            "documents": 1,
+        }
+
+    def search(
+        self, knowledge_base_id: str, query_text: str, k: int = LOCAL_ENGINE_TOP_K
+    ) -> list[dict]:
+        """Best passages for a query, each with its ``score`` and ``coverage``."""
+
+        segments = self._load(knowledge_base_id)
+        if segments is None:
+            raise LookupError(
+                f"Knowledge base {knowledge_base_id} is not available locally"
+            )
+        tokens = tokenize(query_text)
+        hits = search_segments([index for index, _ in segments], tokens, k)
+        return [
+            {
+                **segments[segment][1][doc_id],
+                "score": score,
+                "coverage": segments[segment][0].coverage(tokens, doc_id),
+            }
+            for segment, doc_id, score in hits
+        ]
+
+    def answer(self, knowledge_base_id: str, query_text: str) -> str:
+        """Extractive answer: the top passages, best first."""
+
+        hits = self.search(knowledge_base_id, query_text)
+        if not hits:
+            return NO_ANSWER
+        return "\n\n".join(hit["text"] for hit in hits)
+
+    def confident_answer(
+        self, knowledge_base_id: str, query_text: str, min_coverage: float
+    ) -> str | None:
+        """The top passage if it clearly answers the query, else None.
+
+        Used as a fast path in front of the remote backend: the best
+        passage must contain at least ``min_coverage`` of the query's
+        terms, and single-term queries are too vague to qualify.
+        """
+
+        if len(set(tokenize(query_text))) < 2 or not self.exists(knowledge_base_id):
+            return None
+        hits = self.search(knowledge_base_id, query_text, k=1)
+        if hits and hits[0]["coverage"] >= min_coverage:
+            return hits[0]["text"]
+        return None
+
+    async def ingest(
+        self,
+        file_name: str,
+        chunks: AsyncIterable[bytes],
+        knowledge_base_id: str | None = None,
+    ) -> dict:
+        """Async counterpart of :meth:`add_document` for streamed uploads."""
+
+        with spool_file() as spool:
+            size = 0
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise UploadTooLargeError(f"{file_name} is too large to index")
+                await asyncio.to_thread(spool.write, chunk)
+            return await asyncio.to_thread(
+                self.add_document, file_name, spool, knowledge_base_id
+            )
+
+    async def query(self, knowledge_base_id: str, query_text: str) -> str:
+        return await asyncio.to_thread(self.answer, knowledge_base_id, query_text)
+
+
+local_engine = LocalEngine()
@@ -0,0 +1,131 @@
+import collections
+import random
+import time
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a backend that is known to be failing."""
+
+
+class CircuitBreaker:
+    """Fail fast while a dependency is down.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    calls are refused for ``reset_timeout`` seconds. It then half-opens:
+    one trial call is let through, and its outcome closes the circuit
+    again or re-opens it for another period.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._trial_in_flight = False
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.reset_timeout:
+            return "open"
+        return "half-open"
+
+    def allow(self) -> None:
+        """Raise CircuitOpenError unless a call may go ahead now."""
+
+        state = self.state
+        if state == "closed":
+            return
+        if state == "half-open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return
+        self.rejected += 1
+        raise CircuitOpenError(
+            "The assistant backend is temporarily unavailable; please try "
+            "again in a moment."
+        )
+
+    def abandon(self) -> None:
+        """The call was given up before it had an outcome (e.g. cancelled)."""
+
+        self._trial_in_flight = False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "rejected": self.rejected,
+        }
+
+
+class RetryBudget:
+    """Caps retries to a fraction of recent traffic.
+
+    Every request deposits ``ratio`` tokens (up to ``max_tokens``) and
+    every retry spends one, so during an outage retries add at most
+    ``ratio`` extra load instead of multiplying it.
+    """
+
+    def __init__(self, ratio: float, max_tokens: float):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        # Start full so a quiet worker can still retry its first failures.
+        self.tokens = max_tokens
+        self.retries = 0
+        self.exhausted = 0
+
+    def record_request(self) -> None:
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        if self.tokens < 1:
+            self.exhausted += 1
+            return False
+        self.tokens -= 1
+        self.retries += 1
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "tokens": round(self.tokens, 2),
+            "retries": self.retries,
+            "exhausted": self.exhausted,
+        }
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Full-jitter exponential backoff for the ``attempt``-th retry (1-based)."""
+
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+class LatencyTracker:
+    """Recent latencies of a call, for percentile-based deadlines."""
+
+    def __init__(self, window: int = 256):
+        self._samples: collections.deque[float] = collections.deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, q: float) -> float | None:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
@@ -0,0 +1,263 @@
+import os
+import re
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from chat_app.services.answer_cache import answer_cache
+
+
+# Width of the hashed n-gram feature space. Collisions only blur scores
+# slightly; a power of two keeps the modulo cheap.
+SEMANTIC_CACHE_DIM = int(os.environ.get("SEMANTIC_CACHE_DIM", "4096"))
+
+# Cosine similarity above which a past query counts as a paraphrase,
+# subject to the checks in `SemanticCache`. Extra words in a paraphrase
+# ("what is covered under the fleet policy") pull the score well below 1.
+SEMANTIC_CACHE_THRESHOLD = float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", "0.45"))
+
+# Maximum remembered queries per knowledge base; the oldest are dropped.
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.environ.get("SEMANTIC_CACHE_MAX_ENTRIES", "512"))
+
+NGRAM_SIZES = (3, 4)
+
+_INITIAL_ROWS = 16
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Words that carry no meaning of their own in a question; they are left
+# out of the vectors so they do not inflate the similarity of unrelated
+# questions.
+_STOPWORDS = frozenset(
+    "a an the is are was were be been being am do does did by of to please "
+    "i me my we us our you your it its this that these those there".split()
+)
+
+# Words that change what is asked while barely changing the characters:
+# two questions only match if they use exactly the same ones, so "what
+# does fleet not cover" or "when does fleet cover" are never answered as
+# "what does fleet cover".
+_GUARD_WORDS = frozenset(
+    "not no never none nor without except cannot "
+    "what when where who whom whose why how which".split()
+)
+
+# Suffixes folded by `_stem`, with their replacement; the first match wins.
+_SUFFIXES = (("ies", "y"), ("ing", ""), ("ed", ""), ("s", ""))
+
+
+def _stem(token: str) -> str:
+    """Fold common inflections ("covers", "covered", "covering" -> "cover")."""
+
+    for suffix, replacement in _SUFFIXES:
+        if (
+            token.endswith(suffix)
+            and len(token) - len(suffix) >= 3
+            and not token.endswith("ss")
+        ):
+            return token[: -len(suffix)] + replacement
+    return token
+
+
+def analyse_query(query: str) -> tuple[list[str], frozenset[str]]:
+    """Split a question into its stemmed content words and its guard words.
+
+    Contractions are expanded first ("doesn't" -> "does not"); stop words
+    and stray letters ("what's") are dropped.
+    """
+
+    text = query.lower().replace("n't", " not")
+    content, guards = [], set()
+    for token in _TOKEN_RE.findall(text):
+        if token in _GUARD_WORDS:
+            guards.add(token)
+        elif token not in _STOPWORDS and (len(token) > 1 or token.isdigit()):
+            content.append(_stem(token))
+    return content, frozenset(guards)
+
+
+class _KnowledgeBaseIndex:
+    """Query vectors and answers remembered for one knowledge base."""
+
+    def __init__(self, dim: int, version: int):
+        # Content version of the knowledge base the answers were given for.
+        self.version = version
+        # Raw n-gram counts per row. TF-IDF weighting depends on document
+        # frequencies across all rows, so the weighted matrix is derived
+        # lazily and cached until the next insert.
+        self.counts = np.zeros((_INITIAL_ROWS, dim), dtype=np.float32)
+        self.doc_freq = np.zeros(dim, dtype=np.float32)
+        self.expires_at = np.zeros(_INITIAL_ROWS, dtype=np.float64)
+        self.answers: list[str] = []
+        self.terms: list[frozenset[str]] = []
+        self.guards: list[frozenset[str]] = []
+        self.size = 0
+        self.next_row = 0
+        self.idf: np.ndarray | None = None
+        self.weighted: np.ndarray | None = None
+
+    def grow(self, max_rows: int) -> None:
+        rows = min(len(self.counts) * 2, max_rows)
+        grown = np.zeros((rows, self.counts.shape[1]), dtype=np.float32)
+        grown[: self.size] = self.counts[: self.size]
+        self.counts = grown
+        expires_at = np.zeros(rows, dtype=np.float64)
+        expires_at[: self.size] = self.expires_at[: self.size]
+        self.expires_at = expires_at
+
+
+class SemanticCache:
+    """Approximate answer cache matching paraphrased questions.
+
+    Queries are embedded locally as hashed character n-gram TF-IDF
+    vectors of their content words, one NumPy matrix per knowledge base.
+    A lookup scores the new query against every remembered query with one
+    matrix-vector product and takes the best unexpired one above
+    ``threshold`` that also passes two checks the score cannot make:
+
+    - both questions use the same negation and question words;
+    - the content words of one are all among those of the other, so
+      "what does fleet cost" never matches "what does fleet cover",
+      however close the characters.
+
+    Entries expire after ``ttl`` seconds, like those of the exact cache,
+    and are only served under the knowledge base version they were
+    stored for: the first answer stored under a newer version starts a
+    fresh index.
+    """
+
+    def __init__(
+        self,
+        dim: int = SEMANTIC_CACHE_DIM,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES,
+        ttl: float = answer_cache.ttl,
+    ):
+        self.dim = dim
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._indexes: dict[str, _KnowledgeBaseIndex] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def _counts(self, content: list[str]) -> np.ndarray:
+        text = f" {' '.join(content)} "
+        buckets = [
+            zlib.crc32(text[i : i + n].encode("utf-8")) % self.dim
+            for n in NGRAM_SIZES
+            for i in range(len(text) - n + 1)
+        ]
+        return np.bincount(buckets, minlength=self.dim).astype(np.float32)
+
+    @staticmethod
+    def _weigh(counts: np.ndarray, idf: np.ndarray) -> np.ndarray:
+        # Sublinear term frequency times IDF, L2-normalised per row.
+        weighted = np.log1p(counts) * idf
+        norms = np.linalg.norm(weighted, axis=-1, keepdims=True)
+        return weighted / np.maximum(norms, 1e-12)
+
+    def get(
+        self, knowledge_base_id: str, query: str, version: int = 0
+    ) -> str | None:
+        """Return the answer to the most similar past query, if close enough."""
+
+        content, guards = analyse_query(query)
+        terms = frozenset(content)
+        with self._lock:
+            index = self._indexes.get(knowledge_base_id)
+            if (
+                index is None
+                or index.version != version
+                or index.size == 0
+                or not content
+            ):
+                self.misses += 1
+                return None
+
+            if index.weighted is None:
+                index.idf = np.log((1 + index.size) / (1 + index.doc_freq)) + 1.0
+                index.weighted = self._weigh(index.counts[: index.size], index.idf)
+            scores = index.weighted @ self._weigh(self._counts(content), index.idf)
+            scores[index.expires_at[: index.size] <= time.time()] = -1.0
+
+            for row in np.argsort(-scores):
+                if scores[row] < self.threshold:
+                    break
+                if index.guards[row] == guards and (
+                    index.terms[row] <= terms or terms <= index.terms[row]
+                ):
+                    self.hits += 1
+                    return index.answers[row]
+            self.misses += 1
+            return None
+
+    def set(
+        self, knowledge_base_id: str, query: str, answer: str, version: int = 0
+    ) -> None:
+        """Remember a query/answer pair, overwriting the oldest when full.
+
+        ``version`` is the knowledge base's version read before the answer
+        was fetched; answers for an older version than the index's are
+        dropped.
+        """
+
+        content, guards = analyse_query(query)
+        if not content:
+            # Nothing but stop words: too vague to match anything else.
+            return
+        counts = self._counts(content)
+        expires_at = time.time() + self.ttl if self.ttl > 0 else np.inf
+        with self._lock:
+            index = self._indexes.get(knowledge_base_id)
+            if index is not None and version < index.version:
+                return
+            if index is None or version > index.version:
+                index = _KnowledgeBaseIndex(self.dim, version)
+                self._indexes[knowledge_base_id] = index
+
+            row = index.next_row
+            if index.size == self.max_entries:
+                # Full: overwrite the oldest row in ring-buffer order.
+                index.doc_freq -= index.counts[row] > 0
+                index.answers[row] = answer
+                index.terms[row] = frozenset(content)
+                index.guards[row] = guards
+            else:
+                if index.size == len(index.counts):
+                    index.grow(self.max_entries)
+                index.size += 1
+                index.answers.append(answer)
+                index.terms.append(frozenset(content))
+                index.guards.append(guards)
+            index.counts[row] = counts
+            index.expires_at[row] = expires_at
+            index.doc_freq += counts > 0
+            index.next_row = (row + 1) % self.max_entries
+            index.weighted = None
+
+    def invalidate(self, knowledge_base_id: str) -> None:
+        """Forget every query remembered for a knowledge base."""
+
+        with self._lock:
+            self._indexes.pop(knowledge_base_id, None)
+
+    def stats(self) -> dict:
+        """Hit/miss counters used to tune the similarity threshold."""
+
+        lookups = self.hits + self.misses
+        return {
+            "knowledge_bases": len(self._indexes),
+            "entries": sum(i.size for i in self._indexes.values()),
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+semantic_cache = SemanticCache()
@@ -0,0 +1,25 @@
+import os
+import sqlite3
+from pathlib import Path
+
+
+# Root directory for the app's local persistent data (SQLite databases,
+# spooled uploads, ...). Relative paths resolve against the directory the
+# Reflex app is started from.
+DATA_DIR = Path(os.environ.get("CHAT_APP_DATA_DIR", ".data"))
+
+
+def connect(name: str) -> sqlite3.Connection:
+    """Open a SQLite database under ``DATA_DIR`` in WAL mode.
+
+    WAL lets readers proceed while a writer commits, which matters when
+    several Reflex workers share the same file. Connections are cheap; open
+    one per operation (or per thread) rather than sharing across threads.
+    """
+
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    db = sqlite3.connect(DATA_DIR / name, timeout=30, isolation_level=None)
+    db.row_factory = sqlite3.Row
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    return db
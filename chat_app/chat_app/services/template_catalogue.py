@@ -0,0 +1,185 @@
+import asyncio
+import contextlib
+import os
+
+from chat_app.services.assistant_registry import assistant_registry
+from chat_app.services.template_index import TemplateIndex
+
+
+# How often (seconds) each worker checks the registry files for changes
+# made by other workers.
+CATALOGUE_POLL_INTERVAL = float(os.environ.get("CATALOGUE_POLL_INTERVAL", "0.25"))
+
+
+class TemplateCatalogue:
+    """Process-wide, versioned view of the assistant templates.
+
+    One copy of the catalogue is shared by every session on the worker.
+    Each change bumps ``version``; sessions keep only the version they
+    last rendered and re-read the shared snapshot when it moves, instead
+    of each carrying (and serialising) a private copy of the list.
+
+    Writes made by other worker processes are picked up by watching the
+    registry's database and WAL files: the parsed catalogue is cached
+    against their (mtime, size) and only re-read when they change.
+
+    A :class:`TemplateIndex` is kept in step with the entries so the
+    dashboard can search and paginate without scanning every template.
+    """
+
+    def __init__(self):
+        self._entries: dict[str, dict] = {}
+        self._snapshot: list[dict] | None = None
+        self._positions: dict[str, int] = {}
+        self._index = TemplateIndex()
+        self._loaded = False
+        self._fingerprint: tuple | None = None
+        self._changed = asyncio.Event()
+        self.version = 0
+
+    @staticmethod
+    def _registry_fingerprint() -> tuple:
+        path = assistant_registry.path
+        fingerprint = []
+        for file in (path, path.with_name(f"{path.name}-wal")):
+            try:
+                stat = file.stat()
+            except FileNotFoundError:
+                fingerprint.append(None)
+            else:
+                fingerprint.append((stat.st_mtime_ns, stat.st_size))
+        return tuple(fingerprint)
+
+    def _ensure_loaded(self) -> None:
+        # Fallback for use outside the app (scripts, tests): the lifespan
+        # loads the catalogue off the event loop before serving requests.
+        if not self._loaded:
+            self._fingerprint = self._registry_fingerprint()
+            self.reload(assistant_registry.list_assistants())
+
+    def reload(self, entries: list[dict]) -> int:
+        """Replace the whole catalogue, e.g. from the registry.
+
+        The version only moves if the content actually changed.
+        """
+
+        new_entries = {entry["id"]: entry for entry in entries}
+        if self._loaded and new_entries == self._entries:
+            return self.version
+        # Only re-index what changed.
+        for assistant_id in self._entries.keys() - new_entries.keys():
+            self._index.remove(assistant_id)
+        for assistant_id, entry in new_entries.items():
+            if self._entries.get(assistant_id) != entry:
+                self._index.add(entry)
+        self._entries = new_entries
+        self._loaded = True
+        return self._bump()
+
+    async def refresh(self) -> int:
+        """Re-read the registry if its files changed since the last read."""
+
+        fingerprint = self._registry_fingerprint()
+        if self._loaded and fingerprint == self._fingerprint:
+            return self.version
+        # Take the fingerprint before reading, so a write racing with the
+        # read is caught by the next check.
+        self._fingerprint = fingerprint
+        entries = await asyncio.to_thread(assistant_registry.list_assistants)
+        return self.reload(entries)
+
+    def _bump(self) -> int:
+        self.version += 1
+        self._snapshot = None
+        # Wake every waiter, then arm a fresh event for the next change.
+        self._changed.set()
+        self._changed = asyncio.Event()
+        return self.version
+
+    def snapshot(self) -> list[dict]:
+        """All templates in creation order; shared, do not mutate."""
+
+        self._ensure_loaded()
+        if self._snapshot is None:
+            self._snapshot = list(self._entries.values())
+            self._positions = {
+                entry["id"]: i for i, entry in enumerate(self._snapshot)
+            }
+        return self._snapshot
+
+    def search(
+        self, query: str = "", offset: int = 0, limit: int | None = None
+    ) -> tuple[int, list[dict]]:
+        """One page of templates matching ``query``, in creation order.
+
+        Returns ``(total_matches, page)``. An empty query matches all.
+        """
+
+        snapshot = self.snapshot()
+        ids = self._index.search(query)
+        if ids is None:
+            matches = snapshot
+        else:
+            matches = [snapshot[i] for i in sorted(self._positions[a] for a in ids)]
+        end = None if limit is None else offset + limit
+        return len(matches), matches[offset:end]
+
+    def get(self, assistant_id: str) -> dict | None:
+        self._ensure_loaded()
+        return self._entries.get(assistant_id)
+
+    def upsert(self, entry: dict) -> int:
+        """Add or replace one template and return the new version."""
+
+        self._ensure_loaded()
+        self._entries[entry["id"]] = entry
+        self._index.add(entry)
+        return self._bump()
+
+    def remove(self, assistant_id: str) -> int:
+        """Drop one template and return the new version."""
+
+        self._ensure_loaded()
+        if self._entries.pop(assistant_id, None) is not None:
+            self._index.remove(assistant_id)
+            return self._bump()
+        return self.version
+
+    async def wait_for_change(self, version: int, timeout: float) -> int:
+        """Wait until the catalogue moves past ``version`` (or time out).
+
+        Returns the current version either way.
+        """
+
+        if self.version == version:
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._changed.wait(), timeout)
+        return self.version
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(CATALOGUE_POLL_INTERVAL)
+            try:
+                await self.refresh()
+            except Exception as e:
+                print("Template catalogue refresh failed:", e)
+
+    @contextlib.asynccontextmanager
+    async def lifespan(self):
+        """Reflex lifespan task following registry changes from other workers.
+
+        The first load happens here, in a worker thread, so no request
+        handler has to read the registry on the event loop.
+        """
+
+        await self.refresh()
+        task = asyncio.create_task(self._watch())
+        try:
+            yield
+        finally:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+
+template_catalogue = TemplateCatalogue()
@@ -0,0 +1,84 @@
+import bisect
+import re
+
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Template fields that are searchable from the dashboard.
+SEARCH_FIELDS = ("title", "description", "source_file", "source_files")
+
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+def _entry_tokens(entry: dict) -> set[str]:
+    tokens: set[str] = set()
+    for field in SEARCH_FIELDS:
+        value = entry.get(field)
+        if isinstance(value, list):
+            value = " ".join(str(v) for v in value)
+        if value:
+            tokens.update(tokenize(str(value)))
+    return tokens
+
+
+class TemplateIndex:
+    """In-memory inverted index over assistant templates.
+
+    Maps each token of a template's title, description and source file
+    names to the ids containing it. Entries are added or replaced one at a
+    time, so the index is maintained incrementally rather than rebuilt.
+    Query terms match as prefixes (so search-as-you-type works) via a
+    sorted vocabulary, and all terms must match.
+    """
+
+    def __init__(self):
+        self._postings: dict[str, set[str]] = {}
+        self._vocabulary: list[str] = []
+        self._tokens_by_id: dict[str, set[str]] = {}
+
+    def add(self, entry: dict) -> None:
+        """Index a template, replacing any previous version of it."""
+
+        assistant_id = entry["id"]
+        tokens = _entry_tokens(entry)
+        old_tokens = self._tokens_by_id.get(assistant_id, set())
+        for token in old_tokens - tokens:
+            self._unlink(token, assistant_id)
+        for token in tokens - old_tokens:
+            ids = self._postings.get(token)
+            if ids is None:
+                ids = self._postings[token] = set()
+                bisect.insort(self._vocabulary, token)
+            ids.add(assistant_id)
+        self._tokens_by_id[assistant_id] = tokens
+
+    def remove(self, assistant_id: str) -> None:
+        for token in self._tokens_by_id.pop(assistant_id, set()):
+            self._unlink(token, assistant_id)
+
+    def _unlink(self, token: str, assistant_id: str) -> None:
+        ids = self._postings[token]
+        ids.discard(assistant_id)
+        if not ids:
+            del self._postings[token]
+            del self._vocabulary[bisect.bisect_left(self._vocabulary, token)]
+
+    def _prefix_matches(self, term: str) -> set[str]:
+        ids: set[str] = set()
+        i = bisect.bisect_left(self._vocabulary, term)
+        while i < len(self._vocabulary) and self._vocabulary[i].startswith(term):
+            ids |= self._postings[self._vocabulary[i]]
+            i += 1
+        return ids
+
+    def search(self, query: str) -> set[str] | None:
+        """Ids matching every term of ``query``; None for an empty query."""
+
+        terms = tokenize(query)
+        if not terms:
+            return None
+        # Narrowest term first keeps the intersections small.
+        matches = sorted((self._prefix_matches(t) for t in terms), key=len)
+        return set.intersection(*matches)
@@ -0,0 +1,104 @@
+import asyncio
+import hashlib
+import os
+from pathlib import Path
+from typing import AsyncIterator
+
+import reflex as rx
+
+
+# Uploads are moved through the app in chunks of this size, so memory per
+# upload stays constant regardless of the file size.
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+# Largest accepted upload (bytes), enforced while streaming.
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", str(5 * 1024 * 1024)))
+
+
+class UploadTooLargeError(ValueError):
+    """Raised as soon as an upload grows past the configured limit."""
+
+
+def upload_filename(upload: rx.UploadFile, default: str) -> str:
+    """Best-effort original file name of a Reflex upload."""
+
+    return str(getattr(upload, "name", None) or getattr(upload, "filename", default))
+
+
+async def iter_upload(
+    upload: rx.UploadFile,
+    max_bytes: int = MAX_UPLOAD_BYTES,
+    chunk_size: int = UPLOAD_CHUNK_SIZE,
+) -> AsyncIterator[bytes]:
+    """Yield an upload's content in fixed-size chunks.
+
+    Raises UploadTooLargeError once more than ``max_bytes`` have been
+    read, without ever buffering the whole file.
+    """
+
+    total = 0
+    while chunk := await upload.read(chunk_size):
+        total += len(chunk)
+        if total > max_bytes:
+            raise UploadTooLargeError(
+                f"{upload_filename(upload, 'upload')} exceeds the "
+                f"{max_bytes / (1024 * 1024):g} MB upload limit"
+            )
+        yield chunk
+
+
+async def save_upload(
+    upload: rx.UploadFile,
+    path: Path,
+    max_bytes: int = MAX_UPLOAD_BYTES,
+    hasher: "hashlib._Hash | None" = None,
+) -> int:
+    """Stream an upload to ``path`` and return the number of bytes written.
+
+    The file is written to a temporary sibling and renamed into place, so
+    an oversized or interrupted upload never leaves a partial file behind.
+    Disk writes run in a worker thread to keep the event loop responsive.
+    If ``hasher`` is given it is fed every chunk on the way through.
+    """
+
+    tmp_path = path.with_name(f".{path.name}.part")
+    f = await asyncio.to_thread(tmp_path.open, "wb")
+    written = 0
+    try:
+        async for chunk in iter_upload(upload, max_bytes):
+            if hasher is not None:
+                hasher.update(chunk)
+            await asyncio.to_thread(f.write, chunk)
+            written += len(chunk)
+    except BaseException:
+        await asyncio.to_thread(f.close)
+        tmp_path.unlink(missing_ok=True)
+        raise
+    await asyncio.to_thread(f.close)
+    await asyncio.to_thread(os.replace, tmp_path, path)
+    return written
+
+
+async def iter_file(
+    path: Path, chunk_size: int = UPLOAD_CHUNK_SIZE
+) -> AsyncIterator[bytes]:
+    """Yield a file from disk in fixed-size chunks, reading off the loop."""
+
+    f = await asyncio.to_thread(path.open, "rb")
+    try:
+        while chunk := await asyncio.to_thread(f.read, chunk_size):
+            yield chunk
+    finally:
+        await asyncio.to_thread(f.close)
+
+
+def combined_content_hash(hashes: list[str]) -> str:
+    """Order-independent content hash of a set of files.
+
+    A single file's hash is returned unchanged, so single-document
+    knowledge bases are keyed by the plain SHA-256 of the document.
+    """
+
+    if len(hashes) == 1:
+        return hashes[0]
+    return hashlib.sha256("\n".join(sorted(hashes)).encode("ascii")).hexdigest()
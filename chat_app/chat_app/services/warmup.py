@@ -0,0 +1,83 @@
+import asyncio
+import os
+import time
+
+from chat_app.services import backend_client
+
+
+# How long (seconds) a knowledge base counts as warm after a warm-up was
+# sent for it; selections and hovers within that window send nothing.
+WARMUP_TTL = float(os.environ.get("WARMUP_TTL", "120"))
+
+# How long (seconds) to wait after a failed warm-up before trying that
+# knowledge base again.
+WARMUP_FAILURE_TTL = float(os.environ.get("WARMUP_FAILURE_TTL", "30"))
+
+# Also warm an assistant's knowledge base when its card is hovered, not
+# only when it is selected. Off by default: hovers are frequent and most
+# do not lead to a question.
+WARMUP_ON_HOVER = os.environ.get("WARMUP_ON_HOVER", "0").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+
+class Warmer:
+    """Fire-and-forget knowledge base warm-ups, deduplicated per KB.
+
+    A warm-up is started at most once per ``ttl`` seconds for a knowledge
+    base (per worker), whether the previous one is still running or not.
+    Failures are only logged, and the knowledge base is tried again after
+    ``failure_ttl`` seconds: a cold knowledge base is slower, not broken.
+    """
+
+    def __init__(
+        self, ttl: float = WARMUP_TTL, failure_ttl: float = WARMUP_FAILURE_TTL
+    ):
+        self.ttl = ttl
+        self.failure_ttl = failure_ttl
+        # When each knowledge base may be warmed again (monotonic time).
+        self._warm_until: dict[str, float] = {}
+        # Strong references, so running warm-ups are not garbage collected.
+        self._tasks: set[asyncio.Task] = set()
+        self.sent = 0
+        self.deduplicated = 0
+        self.failed = 0
+
+    def warm(self, knowledge_base_id: str) -> bool:
+        """Start warming a knowledge base unless it was warmed recently.
+
+        Must be called on the event loop; returns immediately. Returns
+        whether a warm-up was started.
+        """
+
+        now = time.monotonic()
+        if now < self._warm_until.get(knowledge_base_id, 0.0):
+            self.deduplicated += 1
+            return False
+        self._warm_until[knowledge_base_id] = now + self.ttl
+        self.sent += 1
+        task = asyncio.create_task(self._run(knowledge_base_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    async def _run(self, knowledge_base_id: str) -> None:
+        try:
+            await backend_client.warm(knowledge_base_id)
+        except Exception as e:
+            self.failed += 1
+            self._warm_until[knowledge_base_id] = time.monotonic() + self.failure_ttl
+            print(f"Warm-up of knowledge base {knowledge_base_id} failed:", e)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._tasks),
+            "sent": self.sent,
+            "deduplicated": self.deduplicated,
+            "failed": self.failed,
+        }
+
+
+warmer = Warmer()
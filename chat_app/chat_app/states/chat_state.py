@@ -1,14 +1,47 @@
 import asyncio
 import os
+import time
 from typing import List, TypedDict
 
 import reflex as rx
-import requests
+
+from chat_app.services import backend_client
+from chat_app.services.admission import AdmissionRejected, admission
+from chat_app.services.answer_cache import answer_cache, normalise_query
+from chat_app.services.conversations import CHAT_HISTORY_PAGE_SIZE, conversations
+from chat_app.services.generations import generations
+from chat_app.services.kb_versions import kb_versions
+from chat_app.services.resilience import CircuitOpenError
+from chat_app.services.semantic_cache import semantic_cache
+from chat_app.services.single_flight import query_flights
+from chat_app.services.warmup import warmer
+
+# Minimum interval (seconds) between state pushes while a reply streams
+# in. Tokens arriving in between are merged into a single delta so the
+# websocket is not flooded with one update per token.
+STREAM_FLUSH_INTERVAL = float(os.environ.get("CHAT_STREAM_FLUSH_INTERVAL", "0.05"))
+
+# Send all follow-ups typed while a reply was being generated as one
+# combined question (one backend call), rather than one at a time. Off by
+# default, since combined questions are answered (and cached) as one.
+BATCH_FOLLOW_UPS = os.environ.get("CHAT_BATCH_FOLLOW_UPS", "0").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+# Messages kept in a session's state. The conversation is persisted, so
+# once it grows past this the oldest messages are dropped from memory.
+# It also bounds how far back "Load earlier messages" goes: loading stops
+# once this many messages are shown.
+CHAT_HISTORY_MAX_MESSAGES = int(os.environ.get("CHAT_HISTORY_MAX_MESSAGES", "200"))
 
 
 class Message(TypedDict):
     text: str
     is_ai: bool
+    # Position in the conversation, as stored by `conversations`.
+    seq: int
 
 
 class ChatState(rx.State):
@@ -18,37 +51,245 @@ class ChatState(rx.State):
     # The currently-selected assistant's knowledge base ID, set when
     # the user clicks a preset card on the dashboard.
     knowledge_base_id: str | None = None
+    # Bumped whenever the conversation is reset, so a reply generated for
+    # an earlier conversation is recognised as stale and dropped.
+    _generation: int = 0
+    # Place of this session's query in the admission queue while it waits
+    # for a backend slot; 0 when not queued.
+    queue_position: int = 0
+    # Follow-up messages typed while a reply is still being generated;
+    # they are sent as soon as it finishes.
+    pending_messages: list[str] = []
+    # Whether the stored conversation has messages before the first one
+    # in `messages` that can still be loaded (see
+    # `CHAT_HISTORY_MAX_MESSAGES`).
+    has_older_messages: bool = False
+    # `seq` of the next message added to the conversation.
+    _next_seq: int = 0
+    # Set once the conversation has been loaded from the store, so page
+    # loads after that keep the in-memory state.
+    _history_loaded: bool = False
+
+    def _cancel_generation(self):
+        """Abandon the reply being generated for the current conversation."""
+
+        self._generation += 1
+        generations.cancel(self.router.session.client_token)
+
+    async def _load_conversation(self):
+        """Replace `messages` with the latest page of the stored conversation."""
+
+        messages, has_older = await conversations.page(
+            self.router.session.client_token,
+            self.knowledge_base_id,
+            limit=min(CHAT_HISTORY_PAGE_SIZE, CHAT_HISTORY_MAX_MESSAGES),
+        )
+        self.messages = messages
+        self.has_older_messages = has_older
+        self._next_seq = messages[-1]["seq"] + 1 if messages else 0
+        self._history_loaded = True
 
     @rx.event
     def clear_messages(self):
-        """Clears all chat messages and resets typing status."""
+        """Clears all chat messages and resets typing status.
+
+        The stored conversation with the current assistant is deleted too.
+        """
+        self._cancel_generation()
+        conversations.clear(self.router.session.client_token, self.knowledge_base_id)
         self.typing = False
+        self.queue_position = 0
+        self.pending_messages = []
         self.messages = []
+        self.has_older_messages = False
+        self._next_seq = 0
 
     @rx.event
-    def select_assistant(self, knowledge_base_id: str | None):
+    async def select_assistant(self, knowledge_base_id: str | None):
         """Select the active assistant/knowledge base.
 
-        Called when a preset card is clicked. This also clears any
-        existing conversation so the new chat starts fresh.
+        Called when a preset card is clicked. Any reply still being
+        generated is abandoned and the session's previous conversation
+        with this assistant, if any, is resumed. The knowledge base is
+        also warmed so it is loaded by the time the first question is
+        asked.
         """
 
+        self._cancel_generation()
         self.knowledge_base_id = knowledge_base_id
         self.typing = False
-        self.messages = []
+        self.queue_position = 0
+        self.pending_messages = []
+        await self._load_conversation()
+        if knowledge_base_id:
+            return ChatState.warm_up(knowledge_base_id)
 
     @rx.event
-    def send_message(self, form_data: dict):
-        """Adds a user message and triggers AI response generation."""
-        if self.typing:
+    async def load_history(self):
+        """Restore the session's last conversation on opening the chat page.
+
+        Only needed when the state is fresh (first visit, or the worker
+        was restarted); otherwise the in-memory conversation is kept.
+        """
+
+        if self._history_loaded:
             return
+        if self.knowledge_base_id is None:
+            self.knowledge_base_id = await conversations.last_assistant(
+                self.router.session.client_token
+            )
+        await self._load_conversation()
+
+    @rx.event
+    async def load_older(self):
+        """Prepend the page of messages before the first one shown.
+
+        At most ``CHAT_HISTORY_MAX_MESSAGES`` are shown in all; once that
+        many are, no earlier pages are offered.
+        """
+
+        room = CHAT_HISTORY_MAX_MESSAGES - len(self.messages)
+        if not self.has_older_messages or not self.messages or room <= 0:
+            self.has_older_messages = False
+            return
+        older, has_older = await conversations.page(
+            self.router.session.client_token,
+            self.knowledge_base_id,
+            before=self.messages[0]["seq"],
+            limit=min(CHAT_HISTORY_PAGE_SIZE, room),
+        )
+        self.messages = older + self.messages
+        self.has_older_messages = (
+            has_older and len(self.messages) < CHAT_HISTORY_MAX_MESSAGES
+        )
+
+    @rx.event
+    async def warm_up(self, knowledge_base_id: str | None):
+        """Start loading an assistant's knowledge base in the background."""
+
+        if knowledge_base_id:
+            warmer.warm(knowledge_base_id)
+
+    def _start_next_message(self) -> bool:
+        """Move pending user input into the conversation for answering.
+
+        Returns whether there was anything to send; if not, the chat
+        stops typing. The user message is persisted straight away, the
+        reply once it is complete.
+        """
+
+        if not self.pending_messages:
+            self.typing = False
+            return False
+        count = len(self.pending_messages) if BATCH_FOLLOW_UPS else 1
+        batch = self.pending_messages[:count]
+        self.pending_messages = self.pending_messages[count:]
+        question = {
+            "text": "\n\n".join(batch),
+            "is_ai": False,
+            "seq": self._next_seq,
+        }
+        self.messages.append(question)
+        self.messages.append({"text": "", "is_ai": True, "seq": self._next_seq + 1})
+        self._next_seq += 2
+        conversations.record(
+            self.router.session.client_token, self.knowledge_base_id, question
+        )
+        if len(self.messages) > CHAT_HISTORY_MAX_MESSAGES:
+            # Full: the dropped messages stay in the store, but are not
+            # offered for loading again.
+            self.messages = self.messages[-CHAT_HISTORY_MAX_MESSAGES:]
+            self.has_older_messages = False
+        self.typing = True
+        return True
+
+    def _abandon_reply(self):
+        """Stop typing after a generation was cancelled mid-reply.
+
+        An empty reply bubble is removed; a partly streamed one is kept
+        and persisted as it is. Follow-ups queued behind it are dropped,
+        since nobody was there to read their answers.
+        """
+
+        if self.messages and self.messages[-1]["is_ai"]:
+            if self.messages[-1]["text"]:
+                self._set_reply(self.messages[-1]["text"])
+            else:
+                self.messages.pop()
+        self.pending_messages = []
+        self.queue_position = 0
+        self.typing = False
+
+    def _set_reply(self, reply: str):
+        """Write the final reply into the last message and persist it."""
+
+        if not self.messages:
+            return
+        self.messages[-1]["text"] = reply
+        conversations.record(
+            self.router.session.client_token,
+            self.knowledge_base_id,
+            self.messages[-1],
+        )
+
+    @rx.event
+    def send_message(self, form_data: dict):
+        """Adds a user message and triggers AI response generation.
+
+        While a reply is still being generated the message is queued and
+        sent by the running generation once the reply is finished.
+        """
         message = form_data["message"].strip()
-        if message:
-            self.messages.append({"text": message, "is_ai": False})
-            self.messages.append({"text": "", "is_ai": True})
-            self.typing = True
+        if not message:
+            return
+        self.pending_messages.append(message)
+        if not self.typing and self._start_next_message():
             yield ChatState.generate_response
 
+    async def _fetch_reply(
+        self, kb_id: str, query_text: str, generation: int, token: str
+    ) -> str:
+        """Ask the backend for an answer, streaming it into the last message.
+
+        The call first waits for an admission slot, showing the session's
+        place in the queue meanwhile. Must be called from a background
+        event outside ``async with self``.
+        """
+
+        queued = False
+
+        async def show_position(position: int) -> None:
+            nonlocal queued
+            queued = True
+            async with self:
+                if self._generation == generation:
+                    self.queue_position = position
+
+        async with admission.slot(kb_id, token, show_position):
+            if queued:
+                async with self:
+                    if self._generation == generation:
+                        self.queue_position = 0
+
+            # The shared async client keeps the event loop free for other
+            # sessions while we wait.
+            if not backend_client.STREAMING_ENABLED:
+                return await backend_client.query(kb_id, query_text)
+
+            chunks: list[str] = []
+            # Start at zero so the first chunk is flushed immediately and
+            # replaces the typing indicator.
+            last_flush = 0.0
+            async for chunk in backend_client.stream_query(kb_id, query_text):
+                chunks.append(chunk)
+                now = time.monotonic()
+                if now - last_flush >= STREAM_FLUSH_INTERVAL:
+                    async with self:
+                        if self.messages and self._generation == generation:
+                            self.messages[-1]["text"] = "".join(chunks)
+                    last_flush = now
+            return "".join(chunks)
+
     @rx.event(background=True)
     async def generate_response(self):
         """Generates a response by calling the backend chat API.
@@ -56,16 +297,53 @@ class ChatState(rx.State):
         The backend is expected to accept a JSON payload with the
         conversation history and return a JSON object containing a
         "reply" field with the assistant's response.
+
+        The task is registered with `generations`, so a new chat, an
+        assistant switch or the client disconnecting cancels it together
+        with its backend request. Follow-ups queued meanwhile are answered
+        by the same task, one after the other.
         """
 
-        # Snapshot messages and selected knowledge base at the start to
-        # avoid race conditions.
         async with self:
-            messages_to_send = list(self.messages)
-            kb_id = self.knowledge_base_id
-            if not messages_to_send:
+            if not self.messages:
                 self.typing = False
                 return
+            generation = self._generation
+            token = self.router.session.client_token
+            generations.start(token, generation)
+
+        try:
+            while True:
+                # Snapshot messages and selected knowledge base at the
+                # start to avoid race conditions.
+                async with self:
+                    messages_to_send = list(self.messages)
+                    kb_id = self.knowledge_base_id
+                if not await self._generate_reply(
+                    messages_to_send, kb_id, generation, token
+                ):
+                    break
+        except asyncio.CancelledError:
+            # Cancelled by a new conversation (which has already reset
+            # the chat) or by the client disconnecting, in which case the
+            # chat must not be left typing when it reconnects.
+            async with self:
+                if self._generation == generation:
+                    self._abandon_reply()
+        finally:
+            generations.finish(token, generation)
+
+    async def _generate_reply(
+        self,
+        messages_to_send: list[Message],
+        kb_id: str | None,
+        generation: int,
+        token: str,
+    ) -> bool:
+        """Answer the latest user message and write the reply into the chat.
+
+        Returns whether a queued follow-up was started and needs answering.
+        """
 
         # Take the most recent user message as the query.
         query_text = ""
@@ -78,35 +356,44 @@ class ChatState(rx.State):
         if not kb_id:
             reply = "No assistant selected. Please go to the dashboard and choose one of the assistant templates first."
             async with self:
-                if self.messages:
-                    self.messages[-1]["text"] = reply
-                self.typing = False
-            return
-
-        payload = {
-            "knowledge_base_id": kb_id,
-            "query": query_text,
-        }
+                if self._generation != generation:
+                    return False
+                self._set_reply(reply)
+                return self._start_next_message()
 
-        try:
-            # Call the backend chat endpoint with the selected
-            # knowledge base and the user's query.
-            response = requests.post(
-                "http://localhost:9000/llama-faq/query",
-                json=payload,
-                timeout=60,
-            )
-            response.raise_for_status()
-            data = response.json()
+        # Repeated questions, and close paraphrases of them, are answered
+        # from the caches without a backend round-trip.
+        # A semantic hit is not copied into the exact cache: that would
+        # restart its expiry and keep a stale answer alive.
+        # Both are keyed on the knowledge base's content version, read
+        # before fetching, so an ingest on any worker retires old answers.
+        kb_version = await kb_versions.get(kb_id)
+        reply = await answer_cache.get(kb_id, query_text, kb_version)
+        if reply is None:
+            reply = semantic_cache.get(kb_id, query_text, kb_version)
+        if reply is None:
+            try:
+                # Identical questions already in flight share one backend
+                # call; only the first session streams the partial answer.
+                reply = await query_flights.do(
+                    (kb_id, kb_version, normalise_query(query_text)),
+                    lambda: self._fetch_reply(kb_id, query_text, generation, token),
+                )
+                print("Received reply from chat API:", reply)
+                if reply:
+                    await answer_cache.set(kb_id, query_text, reply, kb_version)
+                    semantic_cache.set(kb_id, query_text, reply, kb_version)
+            except (CircuitOpenError, AdmissionRejected) as e:
+                # The backend is down or overloaded; say so without waiting.
+                reply = str(e)
+            except Exception as e:
+                reply = f"Error contacting chat API: {e!s}"
 
-            # Backend contract: { "response": "..." }
-            reply = data.get("response", "")
-            print("Received reply from chat API:", reply)
-        except Exception as e:
-            reply = f"Error contacting chat API: {e!s}"
-
-        # Write the reply into the last assistant message.
+        # Write the reply into the last assistant message, unless the
+        # conversation was reset in the meantime.
         async with self:
-            if self.messages:
-                self.messages[-1]["text"] = reply
-            self.typing = False
+            if self._generation != generation:
+                return False
+            self._set_reply(reply)
+            self.queue_position = 0
+            return self._start_next_message()
@@ -1,59 +1,69 @@
 import asyncio
-import json
+import hashlib
+import os
+import shutil
+import sqlite3
+import time
+import uuid
 from pathlib import Path
 
 import reflex as rx
-import requests
 
-
-TEMPLATES_JSON_PATH = (
-    Path(__file__).resolve().parent.parent / "assets" / "assistant_templates.json"
+from chat_app.services import backend_client, storage
+from chat_app.services.answer_cache import answer_cache
+from chat_app.services.assistant_registry import assistant_registry
+from chat_app.services.blob_store import (
+    DERIVED_DIR,
+    UnsupportedBlobTypeError,
+    blob_store,
+)
+from chat_app.services.images import optimise_image, with_image_variants
+from chat_app.services.job_queue import ProgressFn, job_queue
+from chat_app.services.kb_versions import kb_versions
+from chat_app.services.semantic_cache import semantic_cache
+from chat_app.services.template_catalogue import template_catalogue
+from chat_app.services.uploads import (
+    UploadTooLargeError,
+    combined_content_hash,
+    iter_file,
+    save_upload,
+    upload_filename,
 )
-
-INGEST_URL = "http://localhost:9000/llama-faq/ingest"
-
-
-def _load_templates_from_file() -> list[dict]:
-    """Load assistant templates from the JSON file.
-
-    Used to initialise in-memory state; tolerant of missing/invalid files.
-    """
-
-    try:
-        if TEMPLATES_JSON_PATH.exists():
-            with TEMPLATES_JSON_PATH.open("r", encoding="utf-8") as f:
-                data = json.load(f)
-                return data if isinstance(data, list) else []
-        return []
-    except (OSError, json.JSONDecodeError):
-        return []
 
 
-def _append_assistant_template(
+async def _append_assistant_template(
     name: str,
     description: str,
     image_src: str | None = None,
+    image_variants: dict[str, str] | None = None,
     knowledge_base_id: str | None = None,
     source_file: str | None = None,
+    source_files: list[str] | None = None,
+    content_hash: str | None = None,
     kb_message: str | None = None,
     kb_documents: int | None = None,
+    assistant_id: str | None = None,
+    status: str | None = None,
 ) -> dict | None:
-    """Append a new assistant definition to the templates JSON file.
+    """Add a new assistant definition to the assistant registry.
 
     Returns the new entry dict on success so callers can also update
     in-memory state used by the UI. If persisting fails, returns None.
     """
 
-    templates = _load_templates_from_file()
-
     # Determine image source for persistence:
-    # - If an explicit image_src is provided, normalise values coming from
-    #   the upload handler so that we do not persist the `/_upload` prefix
-    #   into the templates JSON. Instead we store "/<filename>.png" which
-    #   matches the convention used by the built-in templates.
+    # - Images from the upload handler live in the content-addressed blob
+    #   store; their hashed URL is persisted as-is (and never changes
+    #   meaning, so it can be cached forever).
+    # - Legacy `/_upload` values are normalised so that we do not persist
+    #   the prefix into the registry. Instead we store "/<filename>.png"
+    #   which matches the convention used by the built-in templates.
     # - Otherwise, fall back to a slug-based filename.
+    image_blob = blob_store.name_from_url(image_src) if image_src else None
     if image_src is not None and image_src != "":
-        if image_src.startswith("/_upload/"):
+        if image_blob is not None:
+            effective_image_src = image_src
+        elif image_src.startswith("/_upload/"):
             # Keep only the file name and point to the root path, e.g.
             # "/_upload/instanda_logo1.png" -> "/instanda_logo1.png".
             effective_image_src = f"/{Path(image_src).name}"
@@ -65,37 +75,286 @@ def _append_assistant_template(
         effective_image_src = f"/{slug}.png"
 
     new_entry: dict = {
+        "id": assistant_id or uuid.uuid4().hex,
         "image_src": effective_image_src,
         "title": name,
         "description": description,
         "tag_color": "purple-500",
     }
+    # Resized AVIF/WebP `srcset`s generated from an uploaded image.
+    if image_variants:
+        new_entry.update(image_variants)
 
     # Include knowledge base metadata if available
     if knowledge_base_id is not None:
         new_entry["knowledge_base_id"] = knowledge_base_id
     if source_file is not None:
         new_entry["source_file"] = source_file
+    if source_files is not None and len(source_files) > 1:
+        new_entry["source_files"] = source_files
+    if content_hash is not None:
+        new_entry["content_hash"] = content_hash
     if kb_message is not None:
         new_entry["kb_message"] = kb_message
     if kb_documents is not None:
         new_entry["kb_documents"] = kb_documents
-
-    templates.append(new_entry)
+    # "building" while the knowledge base ingest job runs, then "ready"
+    # (or "failed"). Entries without a status are ready.
+    if status is not None:
+        new_entry["status"] = status
+
+    def persist() -> dict:
+        # Reference the image first, so a blob that is gone fails loudly
+        # (LookupError) before an entry pointing at it is written.
+        if image_blob is not None:
+            blob_store.retain(image_blob)
+        try:
+            return assistant_registry.insert(new_entry)
+        except BaseException:
+            if image_blob is not None:
+                blob_store.release(image_blob)
+            raise
 
     try:
-        TEMPLATES_JSON_PATH.parent.mkdir(parents=True, exist_ok=True)
-        with TEMPLATES_JSON_PATH.open("w", encoding="utf-8") as f:
-            json.dump(templates, f, indent=2)
-    except OSError:
+        entry = await asyncio.to_thread(persist)
+    except sqlite3.Error:
         # If saving fails, we silently ignore for now.
         # The UI flow should still complete.
         return None
 
-    return new_entry
+    template_catalogue.upsert(entry)
+    return entry
+
+
+async def _update_assistant_template(assistant_id: str, **fields) -> dict | None:
+    """Update fields of a persisted assistant definition by its id.
+
+    Returns the updated entry, or None if it is missing or saving fails.
+    Replacing the image moves the blob reference to the new one.
+    """
+
+    def persist() -> dict | None:
+        old = assistant_registry.get(assistant_id) if "image_src" in fields else None
+        entry = assistant_registry.update(assistant_id, **fields)
+        if entry is not None and old is not None:
+            _swap_image_blob(old.get("image_src"), entry.get("image_src"))
+        return entry
+
+    try:
+        entry = await asyncio.to_thread(persist)
+    except sqlite3.Error:
+        return None
+
+    if entry is not None:
+        template_catalogue.upsert(entry)
+    return entry
+
+
+async def _delete_assistant_template(assistant_id: str) -> dict | None:
+    """Remove an assistant definition, releasing its image.
+
+    Returns the removed entry, or None if it is missing or deleting fails.
+    """
+
+    def persist() -> dict | None:
+        entry = assistant_registry.delete(assistant_id)
+        if entry is not None:
+            _swap_image_blob(entry.get("image_src"), None)
+        return entry
+
+    try:
+        entry = await asyncio.to_thread(persist)
+    except sqlite3.Error:
+        return None
+
+    if entry is not None:
+        template_catalogue.remove(assistant_id)
+    return entry
 
 
-INITIAL_TEMPLATES: list[dict] = _load_templates_from_file()
+def _swap_image_blob(old_src: str | None, new_src: str | None) -> None:
+    """Move a template's blob reference from ``old_src`` to ``new_src``.
+
+    Runs SQLite transactions; call it from a worker thread.
+    """
+
+    if old_src == new_src:
+        return
+    new_blob = blob_store.name_from_url(new_src) if new_src else None
+    if new_blob is not None:
+        blob_store.retain(new_blob)
+    old_blob = blob_store.name_from_url(old_src) if old_src else None
+    if old_blob is not None:
+        blob_store.release(old_blob)
+
+
+# How many knowledge base documents are uploaded to the backend at once.
+INGEST_CONCURRENCY = int(os.environ.get("INGEST_CONCURRENCY", "4"))
+
+# Uploaded knowledge base files wait here until their ingest job has run.
+INGEST_SPOOL_DIR = storage.DATA_DIR / "ingest_spool"
+
+# How often the Assistant Studio refreshes a running ingest job's status.
+INGEST_POLL_INTERVAL = 0.5
+
+# How long a dashboard keeps listening for catalogue changes after it was
+# loaded. Background tasks outlive disconnected clients, so the watcher
+# must not run forever; reloading the page starts a new one.
+CATALOGUE_WATCH_SECONDS = 600
+
+# Assistant cards shown per dashboard page.
+DASHBOARD_PAGE_SIZE = int(os.environ.get("DASHBOARD_PAGE_SIZE", "12"))
+
+
+async def _run_ingest_job(job: dict, report: ProgressFn) -> dict:
+    """Ingest a new assistant's spooled files into one knowledge base.
+
+    The first file creates the knowledge base and the rest are appended to
+    it in parallel (at most ``INGEST_CONCURRENCY`` at a time). Progress is
+    persisted after every file, so a retried job skips files that are
+    already ingested and reuses the knowledge base it created.
+
+    A backend that answers an append with a different knowledge base
+    cannot combine files: retrying would only create more orphaned
+    knowledge bases, so the remaining files are failed for good and the
+    assistant is built from what made it in.
+    """
+
+    payload = job["payload"]
+    assistant_id = payload["assistant_id"]
+    progress = job["progress"] or {
+        "knowledge_base_id": None,
+        "kb_documents": None,
+        "kb_message": None,
+        # Set once an append came back in another knowledge base.
+        "combine_unsupported": False,
+        "files": [
+            {"name": f["name"], "status": "pending", "error": ""}
+            for f in payload["files"]
+        ],
+    }
+    files = progress["files"]
+    final_attempt = job["attempts"] >= job["max_attempts"]
+    semaphore = asyncio.Semaphore(INGEST_CONCURRENCY)
+
+    def fail_for_good(entry: dict) -> None:
+        entry["status"] = "failed"
+        entry["permanent"] = True
+        entry["error"] = (
+            f"{entry['name']} was not added: the backend cannot combine"
+            " several files into one knowledge base"
+        )
+
+    async def ingest_one(index: int) -> None:
+        entry = files[index]
+        expected_id = progress["knowledge_base_id"]
+        async with semaphore:
+            if progress.get("combine_unsupported"):
+                fail_for_good(entry)
+                await report(progress)
+                return
+            entry["status"] = "ingesting"
+            await report(progress)
+            try:
+                data = await backend_client.ingest(
+                    entry["name"],
+                    iter_file(Path(payload["files"][index]["path"])),
+                    expected_id,
+                )
+            except Exception:
+                data = None
+
+        # A file only counts if it landed in this assistant's knowledge
+        # base: one that came back without an id, or with another one,
+        # was not appended to it.
+        returned_id = data.get("knowledge_base_id") if data else None
+        if returned_id and expected_id and returned_id != expected_id:
+            progress["combine_unsupported"] = True
+            fail_for_good(entry)
+            await report(progress)
+            return
+        if not returned_id:
+            entry["status"] = "failed"
+            entry["error"] = f"{entry['name']} could not be ingested"
+            await report(progress)
+            return
+
+        # Answers cached for this knowledge base, by any worker, are stale
+        # once its content changed.
+        await kb_versions.bump(returned_id)
+        await answer_cache.invalidate(returned_id)
+        semantic_cache.invalidate(returned_id)
+
+        progress["knowledge_base_id"] = returned_id
+        progress["kb_message"] = data.get("message")
+        if data.get("documents") is not None:
+            progress["kb_documents"] = (progress["kb_documents"] or 0) + data[
+                "documents"
+            ]
+        entry["status"] = "done"
+        entry["error"] = ""
+        await report(progress)
+
+    try:
+        # Create the knowledge base from the first file that ingests
+        # successfully; the remaining files are appended to it.
+        pending = [
+            i
+            for i, f in enumerate(files)
+            if f["status"] != "done" and not f.get("permanent")
+        ]
+        while pending and progress["knowledge_base_id"] is None:
+            await ingest_one(pending.pop(0))
+        if progress["knowledge_base_id"] is None:
+            raise RuntimeError("No document could be ingested")
+        await asyncio.gather(*(ingest_one(i) for i in pending))
+
+        failed = [
+            f for f in files if f["status"] == "failed" and not f.get("permanent")
+        ]
+        if failed and not final_attempt:
+            # Retry just the failed files; finished ones are skipped.
+            raise RuntimeError(f"{len(failed)} document(s) could not be ingested")
+    except Exception:
+        if final_attempt:
+            await _update_assistant_template(assistant_id, status="failed")
+            shutil.rmtree(INGEST_SPOOL_DIR / assistant_id, ignore_errors=True)
+        raise
+
+    knowledge_base_id = progress["knowledge_base_id"]
+    ingested = [f["name"] for f in files if f["status"] == "done"]
+    ingested_hashes = [
+        spooled["sha256"]
+        for spooled, f in zip(payload["files"], files)
+        if f["status"] == "done"
+    ]
+    kb_message = progress["kb_message"]
+    if len(ingested) > 1:
+        kb_message = f"Successfully ingested {len(ingested)} documents"
+
+    fields = {
+        "status": "ready",
+        "knowledge_base_id": knowledge_base_id,
+        "source_file": ingested[0],
+        # Key the knowledge base by what actually made it in, so a later
+        # upload of the full set is not mistaken for a duplicate.
+        "content_hash": combined_content_hash(ingested_hashes),
+        "kb_message": kb_message,
+    }
+    if len(ingested) > 1:
+        fields["source_files"] = ingested
+    if progress["kb_documents"] is not None:
+        fields["kb_documents"] = progress["kb_documents"]
+    entry = await _update_assistant_template(assistant_id, **fields)
+
+    shutil.rmtree(INGEST_SPOOL_DIR / assistant_id, ignore_errors=True)
+    return {
+        "template": entry or {"id": assistant_id, **fields},
+        "errors": [f["error"] for f in files if f["status"] == "failed"],
+    }
+
+
+job_queue.register("ingest", _run_ingest_job)
 
 
 class LayoutState(rx.State):
@@ -110,6 +369,7 @@ class LayoutState(rx.State):
     assistant_name: str = ""
     assistant_description: str = ""
     assistant_image_src: str = ""
+    assistant_image_variants: dict[str, str] = {}
 
     # Status flags for Assistant creation flow.
     creating_assistant: bool = False
@@ -122,11 +382,106 @@ class LayoutState(rx.State):
     # Files uploaded for the assistant's knowledge base (filenames only for UI).
     uploaded_files: list[str] = []
 
-    # In-memory cache of assistant templates shown on the dashboard.
-    # This is initialised from the JSON file on startup and updated when
-    # new assistants are created so the UI reflects changes without
-    # requiring a server restart.
-    assistant_templates: list[dict] = INITIAL_TEMPLATES
+    # Per-file ingest status while a knowledge base is being built:
+    # {"name": ..., "status": "pending" | "ingesting" | "done" | "failed"}.
+    ingest_progress: list[dict[str, str]] = []
+
+    # Id of the background job building the current assistant's knowledge base.
+    ingest_job_id: str = ""
+
+    # Version of the shared template catalogue this session last rendered.
+    # The templates themselves live once per worker in
+    # `template_catalogue`, not in every session's state.
+    catalogue_version: int = 0
+
+    # Whether a `watch_catalogue` task is already running for this session.
+    _watching_catalogue: bool = False
+
+    # Dashboard search box contents and the (zero-based) page being shown.
+    dashboard_query: str = ""
+    dashboard_page: int = 0
+
+    @rx.var
+    def dashboard_total(self) -> int:
+        """Number of assistants matching the dashboard search."""
+
+        _ = self.catalogue_version
+        total, _page = template_catalogue.search(self.dashboard_query, 0, 0)
+        return total
+
+    @rx.var
+    def dashboard_page_count(self) -> int:
+        return max(1, -(-self.dashboard_total // DASHBOARD_PAGE_SIZE))
+
+    @rx.var
+    def dashboard_page_number(self) -> int:
+        """One-based page shown, clamped if the result set shrank."""
+
+        return min(self.dashboard_page, self.dashboard_page_count - 1) + 1
+
+    @rx.var
+    def assistant_templates(self) -> list[dict]:
+        """The page of assistant templates shown on the dashboard.
+
+        Recomputed from the shared catalogue's search index only when
+        `catalogue_version`, the search or the page moves, so a session
+        only ever serialises one page of cards.
+        """
+
+        _ = self.catalogue_version
+        _total, templates = template_catalogue.search(
+            self.dashboard_query,
+            (self.dashboard_page_number - 1) * DASHBOARD_PAGE_SIZE,
+            DASHBOARD_PAGE_SIZE,
+        )
+        return [with_image_variants(entry) for entry in templates]
+
+    @rx.event
+    def set_dashboard_query(self, value: str):
+        """Filter the dashboard, starting again from the first page."""
+
+        self.dashboard_query = value
+        self.dashboard_page = 0
+
+    @rx.event
+    def next_dashboard_page(self):
+        self.dashboard_page = min(
+            self.dashboard_page_number, self.dashboard_page_count - 1
+        )
+
+    @rx.event
+    def prev_dashboard_page(self):
+        self.dashboard_page = max(self.dashboard_page_number - 2, 0)
+
+    @rx.event(background=True)
+    async def watch_catalogue(self):
+        """Refresh the dashboard when assistants are added or updated.
+
+        Started by the dashboard's on_load; wakes on catalogue changes
+        made by any session on this worker.
+        """
+
+        # Load the catalogue off the event loop if nothing has yet.
+        await template_catalogue.refresh()
+        async with self:
+            if self._watching_catalogue:
+                return
+            self._watching_catalogue = True
+            version = self.catalogue_version = template_catalogue.version
+
+        try:
+            deadline = time.monotonic() + CATALOGUE_WATCH_SECONDS
+            while (remaining := deadline - time.monotonic()) > 0:
+                new_version = await template_catalogue.wait_for_change(
+                    version, remaining
+                )
+                if new_version != version:
+                    version = new_version
+                    async with self:
+                        self.catalogue_version = version
+        finally:
+            async with self:
+                self._watching_catalogue = False
 
     @rx.event
     def set_assistant_name(self, value: str):
@@ -147,26 +502,36 @@ class LayoutState(rx.State):
         if not files:
             return
 
-        first = files[0]
-        # Save the image file to the upload dir and record its URL.
-        upload_dir = rx.get_upload_dir()
-        upload_dir.mkdir(parents=True, exist_ok=True)
-
-        file_name = getattr(first, "name", None) or getattr(
-            first, "filename", "assistant_image"
-        )
-        file_bytes = await first.read()
-
-        file_path = upload_dir / file_name
         try:
-            with file_path.open("wb") as f:
-                f.write(file_bytes)
-        except OSError:
+            # Stream into the content-addressed store in chunks; oversized
+            # images are rejected before they are fully read. The session
+            # holds the blob until it is used by an assistant or replaced.
+            name = await blob_store.put(
+                files[0], holder=self.router.session.client_token
+            )
+        except (OSError, UploadTooLargeError, UnsupportedBlobTypeError) as e:
+            # Tell the user why their image did not appear, the same way
+            # submit_assistant reports a rejected document.
+            self.assistant_dialog_open = True
+            self.assistant_dialog_message = f"Image upload failed: {e!s}."
             return
 
-        # Store a plain string URL path for the uploaded image.
-        # Uploaded files are served from the `/_upload` mount point.
-        self.assistant_image_src = f"/_upload/{file_path.name}"
+        # An earlier upload this one replaces is deleted, unless an
+        # assistant was created with it or another session holds it.
+        if blob_store.name_from_url(self.assistant_image_src) != name:
+            await self._drop_image_hold()
+
+        # Store the blob's hashed URL; it is served with immutable
+        # caching headers.
+        self.assistant_image_src = blob_store.url_for(name)
+
+        # Cards show resized AVIF/WebP thumbnails rather than the original.
+        self.assistant_image_variants = await asyncio.to_thread(
+            optimise_image,
+            blob_store.path_for(name),
+            blob_store.root / DERIVED_DIR,
+            blob_store.url_for(DERIVED_DIR),
+        )
 
     @rx.event
     def set_page(self, page: str):
@@ -177,16 +542,28 @@ class LayoutState(rx.State):
             self.creating_assistant = False
             self.assistant_created = False
 
+    async def _drop_image_hold(self) -> None:
+        """Let go of this session's uploaded image, deleting it if unused."""
+
+        name = blob_store.name_from_url(self.assistant_image_src)
+        if name is not None:
+            await asyncio.to_thread(
+                blob_store.discard, name, self.router.session.client_token
+            )
+
     @rx.event
-    def open_assistant_upload(self):
+    async def open_assistant_upload(self):
         # Show the form panel and reset any previous status
+        await self._drop_image_hold()
         self.show_assistant_upload = True
         self.creating_assistant = False
         self.assistant_created = False
         self.assistant_dialog_open = False
         self.assistant_dialog_message = ""
         self.uploaded_files = []
+        self.ingest_progress = []
         self.assistant_image_src = ""
+        self.assistant_image_variants = {}
 
     @rx.event
     def set_uploaded_files(self, files: list[rx.UploadFile] | None):
@@ -206,7 +583,13 @@ class LayoutState(rx.State):
 
     @rx.event
     async def submit_assistant(self, files: list[rx.UploadFile]):
-        """Create an assistant and ingest the uploaded knowledge base file."""
+        """Create an assistant and queue ingestion of its knowledge base files.
+
+        The uploads are only spooled to local disk here; the backend ingest
+        runs in the background job queue, so this handler returns quickly.
+        The assistant appears on the dashboard straight away in a
+        "building" state and is flipped to "ready" by the job.
+        """
 
         self.creating_assistant = True
         self.assistant_created = False
@@ -215,66 +598,170 @@ class LayoutState(rx.State):
         self.assistant_dialog_open = True
         self.assistant_dialog_message = "Assistant creation in progress..."
 
-        knowledge_base_id: str | None = None
-        kb_message: str | None = None
-        kb_documents: int | None = None
-        source_file: str | None = None
-
-        # Call external ingest API with the uploaded file, if provided
-        if files:
-            first = files[0]
-            try:
-                file_name = getattr(first, "name", None) or getattr(
-                    first, "filename", "uploaded_file"
-                )
-                file_bytes = await first.read()
-                source_file = str(file_name)
-
-                response = requests.post(
-                    INGEST_URL,
-                    headers={"accept": "application/json"},
-                    files={"file": (source_file, file_bytes)},
-                    timeout=60,
+        assistant_id = uuid.uuid4().hex
+        spool_dir = INGEST_SPOOL_DIR / assistant_id
+        spooled: list[dict] = []
+        try:
+            for upload in files:
+                name = upload_filename(upload, "uploaded_file")
+                path = spool_dir / f"{len(spooled)}_{Path(name).name}"
+                path.parent.mkdir(parents=True, exist_ok=True)
+                hasher = hashlib.sha256()
+                await save_upload(upload, path, hasher=hasher)
+                spooled.append(
+                    {"name": name, "path": str(path), "sha256": hasher.hexdigest()}
                 )
-                response.raise_for_status()
-                data = response.json()
+        except (OSError, UploadTooLargeError) as e:
+            shutil.rmtree(spool_dir, ignore_errors=True)
+            self.creating_assistant = False
+            self.assistant_created = False
+            self.assistant_dialog_message = f"Assistant creation failed: {e!s}."
+            return
 
-                knowledge_base_id = data.get("knowledge_base_id")
-                kb_message = data.get("message")
-                kb_documents = data.get("documents")
-            except Exception:
-                # If ingest fails, mark as failed and show a generic message.
-                self.creating_assistant = False
-                self.assistant_created = False
-                self.assistant_dialog_message = (
-                    "Assistant creation failed while ingesting knowledge base."
-                )
-                return
+        content_hash = (
+            combined_content_hash([f["sha256"] for f in spooled]) if spooled else None
+        )
 
-        # Persist the new assistant definition into the JSON file including KB metadata
-        new_entry = _append_assistant_template(
+        # Identical content has been ingested before: reuse its knowledge
+        # base instead of ingesting and embedding it all over again.
+        existing = (
+            await asyncio.to_thread(assistant_registry.find_ingested, content_hash)
+            if content_hash
+            else None
+        )
+        if existing is not None:
+            shutil.rmtree(spool_dir, ignore_errors=True)
+            names = [f["name"] for f in spooled]
+            source_title = existing.get("title") or "an existing assistant"
+            await _append_assistant_template(
+                self.assistant_name,
+                self.assistant_description,
+                image_src=self.assistant_image_src or None,
+                image_variants=self.assistant_image_variants,
+                knowledge_base_id=existing["knowledge_base_id"],
+                source_file=names[0],
+                source_files=names,
+                content_hash=content_hash,
+                kb_message=f"Reused knowledge base of {source_title}",
+                kb_documents=existing.get("kb_documents"),
+                assistant_id=assistant_id,
+            )
+            self.catalogue_version = template_catalogue.version
+            self.show_assistant_upload = False
+            self.creating_assistant = False
+            self.assistant_created = True
+            self.assistant_dialog_message = (
+                "Assistant created successfully! Its documents were already "
+                "ingested, so the existing knowledge base is reused."
+            )
+            return
+
+        # Persist the new assistant definition in the registry; its
+        # knowledge base metadata is filled in when the ingest job finishes.
+        await _append_assistant_template(
             self.assistant_name,
             self.assistant_description,
             image_src=self.assistant_image_src or None,
-            knowledge_base_id=knowledge_base_id,
-            source_file=source_file,
-            kb_message=kb_message,
-            kb_documents=kb_documents,
+            image_variants=self.assistant_image_variants,
+            content_hash=content_hash,
+            assistant_id=assistant_id,
+            status="building" if spooled else None,
         )
 
-        # If persistence succeeded, also update the in-memory list so that
-        # the dashboard sees the new assistant immediately without a
-        # Reflex server restart.
-        if new_entry is not None:
-            self.assistant_templates.append(new_entry)
+        # Persisting also publishes the entry to the shared catalogue, so
+        # the dashboard sees the new assistant immediately.
+        self.catalogue_version = template_catalogue.version
 
-        # Mark as created and update dialog
-        self.creating_assistant = False
-        self.assistant_created = True
-        self.assistant_dialog_message = "Assistant created successfully!"
-        # Hide the form once the assistant is successfully created
+        # Hide the form once the assistant has been submitted
         self.show_assistant_upload = False
 
+        if not spooled:
+            self.creating_assistant = False
+            self.assistant_created = True
+            self.assistant_dialog_message = "Assistant created successfully!"
+            return
+
+        self.ingest_job_id = await job_queue.enqueue(
+            "ingest", {"assistant_id": assistant_id, "files": spooled}
+        )
+        self.ingest_progress = [
+            {"name": f["name"], "status": "pending"} for f in spooled
+        ]
+        self.assistant_dialog_message = f"0/{len(spooled)} documents ingested..."
+        return LayoutState.poll_ingest_job
+
+    @rx.event(background=True)
+    async def poll_ingest_job(self):
+        """Mirror the background ingest job's progress into this session."""
+
+        async with self:
+            job_id = self.ingest_job_id
+
+        while job_id:
+            job = await job_queue.get(job_id)
+            if job is None:
+                return
+
+            files = job["progress"].get("files") or []
+            failed_entry = (
+                await asyncio.to_thread(
+                    assistant_registry.get, job["payload"]["assistant_id"]
+                )
+                if job["status"] == "failed"
+                else None
+            )
+            async with self:
+                if self.ingest_job_id != job_id:
+                    return
+                if files:
+                    self.ingest_progress = [
+                        {"name": f["name"], "status": f["status"]} for f in files
+                    ]
+                done = sum(1 for f in self.ingest_progress if f["status"] == "done")
+                self.assistant_dialog_message = (
+                    f"{done}/{len(self.ingest_progress)} documents ingested..."
+                )
+
+                if job["status"] == "done":
+                    entry = job["result"]["template"]
+                    if template_catalogue.get(entry["id"]) != entry:
+                        # The job ran on another worker process.
+                        template_catalogue.upsert(entry)
+                    self.catalogue_version = template_catalogue.version
+                    errors = job["result"]["errors"]
+                    self.creating_assistant = False
+                    self.assistant_created = True
+                    if errors:
+                        self.assistant_dialog_message = (
+                            f"Assistant created with {done}/{len(files)} "
+                            "documents. " + "; ".join(errors) + "."
+                        )
+                    else:
+                        self.assistant_dialog_message = "Assistant created successfully!"
+                    self.ingest_job_id = ""
+                    return
+
+                if job["status"] == "failed":
+                    entry = failed_entry
+                    if entry is not None and template_catalogue.get(entry["id"]) != entry:
+                        template_catalogue.upsert(entry)
+                    self.catalogue_version = template_catalogue.version
+                    self.creating_assistant = False
+                    self.assistant_created = False
+                    self.assistant_dialog_message = (
+                        "Assistant creation failed while ingesting knowledge base."
+                    )
+                    self.ingest_job_id = ""
+                    return
+
+                if job["status"] == "queued" and job["attempts"] > 0:
+                    self.assistant_dialog_message += (
+                        f" Retrying (attempt {job['attempts'] + 1}"
+                        f" of {job['max_attempts']})..."
+                    )
+
+            await asyncio.sleep(INGEST_POLL_INTERVAL)
+
     @rx.event
     def close_assistant_dialog(self):
         """Close the assistant creation alert dialog."""
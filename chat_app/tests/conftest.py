@@ -0,0 +1,29 @@
+import pytest
+
+from chat_app.services import storage
+from chat_app.services.assistant_registry import assistant_registry
+from chat_app.services.blob_store import blob_store
+from chat_app.services.conversations import conversations
+from chat_app.services.job_queue import job_queue
+from chat_app.services.kb_versions import kb_versions
+from chat_app.services.template_catalogue import template_catalogue
+
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path, monkeypatch):
+    """Keep every test's SQLite files and indexes in its own directory."""
+
+    monkeypatch.setattr(storage, "DATA_DIR", tmp_path)
+    # The shared stores create their tables on first use; have them do so
+    # again in this test's directory.
+    for store in (
+        assistant_registry,
+        blob_store,
+        conversations,
+        job_queue,
+        kb_versions,
+    ):
+        monkeypatch.setattr(store, "_initialised", False)
+    monkeypatch.setattr(kb_versions, "_versions", {})
+    monkeypatch.setattr(template_catalogue, "_loaded", False)
+    return tmp_path
@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+from chat_app.services.admission import AdmissionController, AdmissionRejected
+
+
+async def settle() -> None:
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+def test_queued_queries_are_admitted_round_robin_with_their_positions():
+    controller = AdmissionController(global_limit=1, per_kb_limit=1, max_queue=10)
+    order, positions = [], {}
+    finish = {}
+
+    async def query(knowledge_base_id: str, session: str, label: str):
+        async def on_position(position: int):
+            positions[label] = position
+
+        finish[label] = asyncio.Event()
+        async with controller.slot(knowledge_base_id, session, on_position):
+            order.append(label)
+            await finish[label].wait()
+
+    async def main():
+        await controller.acquire("fleet", "holder")
+        tasks = []
+        # Session 1 asks twice before anyone else gets a turn.
+        for kb, session, label in [
+            ("fleet", "s1", "fleet-s1-first"),
+            ("fleet", "s1", "fleet-s1-second"),
+            ("fleet", "s2", "fleet-s2"),
+            ("motor", "s3", "motor-s3"),
+        ]:
+            tasks.append(asyncio.create_task(query(kb, session, label)))
+            await settle()
+
+        controller.release("fleet")
+        await settle()
+        assert order == ["fleet-s1-first"]
+        # Everyone still queued heard where they now stand.
+        assert {k: v for k, v in positions.items() if k not in order} == {
+            "motor-s3": 1,
+            "fleet-s2": 2,
+            "fleet-s1-second": 3,
+        }
+
+        for _ in tasks:
+            finish[order[-1]].set()
+            await settle()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    assert order == ["fleet-s1-first", "motor-s3", "fleet-s2", "fleet-s1-second"]
+    assert controller.stats() == {"active": 0, "waiting": 0, "admitted": 5, "shed": 0}
+
+
+def test_queries_past_max_queue_are_shed():
+    controller = AdmissionController(global_limit=1, per_kb_limit=1, max_queue=2)
+
+    async def main():
+        await controller.acquire("fleet", "holder")
+        queued = [
+            asyncio.create_task(controller.acquire("fleet", f"s{i}")) for i in (1, 2)
+        ]
+        await settle()
+
+        with pytest.raises(AdmissionRejected):
+            await controller.acquire("motor", "s3")
+
+        for task in queued:
+            task.cancel()
+        await asyncio.gather(*queued, return_exceptions=True)
+        return controller.stats()
+
+    assert asyncio.run(main()) == {
+        "active": 1,
+        "waiting": 0,
+        "admitted": 1,
+        "shed": 1,
+    }
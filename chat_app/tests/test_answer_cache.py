@@ -0,0 +1,104 @@
+import asyncio
+import sqlite3
+import threading
+
+from chat_app.services.answer_cache import AnswerCache
+from chat_app.services.kb_versions import KnowledgeBaseVersions
+
+
+def test_answers_survive_a_restart_through_the_disk_tier(tmp_path):
+    path = tmp_path / "answers.db"
+
+    asyncio.run(AnswerCache(path=path).set("kb", "What is covered?", "Vehicles."))
+    restarted = AnswerCache(path=path)
+
+    assert asyncio.run(restarted.get("kb", "  what is COVERED ")) == "Vehicles."
+    assert restarted.stats()["disk_hits"] == 1
+
+
+def test_invalidated_answers_are_gone_from_both_tiers(tmp_path):
+    cache = AnswerCache(path=tmp_path / "answers.db")
+
+    async def scenario():
+        await cache.set("kb", "what is covered", "Vehicles.")
+        await cache.set("other", "what is covered", "Homes.")
+        await cache.invalidate("kb")
+        return await cache.get("kb", "what is covered"), await cache.get(
+            "other", "what is covered"
+        )
+
+    assert asyncio.run(scenario()) == (None, "Homes.")
+    restarted = AnswerCache(path=tmp_path / "answers.db")
+    assert asyncio.run(restarted.get("kb", "what is covered")) is None
+
+
+def test_disk_tier_is_used_off_the_event_loop(tmp_path, monkeypatch):
+    cache = AnswerCache(path=tmp_path / "answers.db")
+    threads = []
+    execute = cache._db_execute
+
+    def record_thread(sql, params):
+        threads.append(threading.current_thread())
+        return execute(sql, params)
+
+    monkeypatch.setattr(cache, "_db_execute", record_thread)
+
+    async def scenario():
+        await cache.set("kb", "what is covered", "Vehicles.")
+        await cache.get("kb", "what is not covered")
+        # Served from memory without touching the disk.
+        await cache.get("kb", "what is covered")
+
+    asyncio.run(scenario())
+    assert len(threads) == 2
+    assert threading.main_thread() not in threads
+
+
+def test_answers_from_another_kb_version_are_misses_in_both_tiers(tmp_path):
+    path = tmp_path / "answers.db"
+    cache = AnswerCache(path=path)
+
+    async def scenario():
+        await cache.set("kb", "what is covered", "Vehicles.", 1)
+        return await cache.get("kb", "what is covered", 1), await cache.get(
+            "kb", "what is covered", 2
+        )
+
+    assert asyncio.run(scenario()) == ("Vehicles.", None)
+    restarted = AnswerCache(path=path)
+    assert asyncio.run(restarted.get("kb", "what is covered", 2)) is None
+    assert asyncio.run(restarted.get("kb", "what is covered", 1)) == "Vehicles."
+
+
+def test_disk_tier_written_before_versions_is_migrated(tmp_path):
+    path = tmp_path / "answers.db"
+    with sqlite3.connect(path) as db:
+        db.execute(
+            "CREATE TABLE answers (knowledge_base_id TEXT NOT NULL,"
+            " query TEXT NOT NULL, answer TEXT NOT NULL, expires_at REAL NOT NULL,"
+            " PRIMARY KEY (knowledge_base_id, query))"
+        )
+        db.execute(
+            "INSERT INTO answers VALUES ('kb', 'what is covered', 'Old.', 1e18)"
+        )
+
+    cache = AnswerCache(path=path)
+
+    assert asyncio.run(cache.get("kb", "what is covered")) == "Old."
+    assert asyncio.run(cache.get("kb", "what is covered", 1)) is None
+
+
+def test_a_bump_on_one_worker_is_seen_by_the_others():
+    # Two instances over the same database stand in for two workers.
+    ingesting = KnowledgeBaseVersions()
+    serving = KnowledgeBaseVersions(poll_interval=0.05)
+
+    async def scenario():
+        before = await serving.get("kb")
+        await ingesting.bump("kb")
+        # Still trusting what it read a moment ago...
+        cached = await serving.get("kb")
+        await asyncio.sleep(0.1)
+        return before, cached, await serving.get("kb")
+
+    assert asyncio.run(scenario()) == (0, 0, 1)
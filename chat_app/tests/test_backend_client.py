@@ -0,0 +1,58 @@
+import asyncio
+
+import httpx
+
+from chat_app.services import backend_client
+from chat_app.services.endpoint_pool import Endpoint
+
+
+def stream(monkeypatch, body: str, content_type: str) -> list[str]:
+    def handler(request):
+        return httpx.Response(
+            200, headers={"content-type": content_type}, content=body.encode()
+        )
+
+    client = httpx.AsyncClient(
+        base_url="http://backend", transport=httpx.MockTransport(handler)
+    )
+    monkeypatch.setattr(backend_client, "get_client", lambda base_url: client)
+
+    async def main():
+        tokens = [
+            token
+            async for token in backend_client._stream_from(
+                Endpoint("http://backend"), "kb", "what is covered"
+            )
+        ]
+        await client.aclose()
+        return tokens
+
+    return asyncio.run(main())
+
+
+def test_multi_line_sse_events_are_one_token(monkeypatch):
+    body = (
+        ": keep-alive\n\n"
+        "event: token\ndata: Fleet cover:\ndata:  - vehicles\n\n"
+        'data: {"token": " and drivers."}\n\n'
+        "data: [DONE]\n\n"
+        "data: ignored\n\n"
+    )
+
+    tokens = stream(monkeypatch, body, "text/event-stream")
+
+    assert tokens == ["Fleet cover:\n - vehicles", " and drivers."]
+
+
+def test_sse_event_without_a_final_blank_line_is_not_lost(monkeypatch):
+    body = "data: Vehicles.\r\ndata: Drivers."
+
+    tokens = stream(monkeypatch, body, "text/event-stream")
+
+    assert tokens == ["Vehicles.\nDrivers."]
+
+
+def test_ndjson_lines_are_one_token_each(monkeypatch):
+    body = '{"token": "Fleet"}\n\n{"delta": " cover."}\n'
+
+    assert stream(monkeypatch, body, "application/x-ndjson") == ["Fleet", " cover."]
@@ -0,0 +1,205 @@
+import asyncio
+import io
+import types
+
+import pytest
+from starlette.testclient import TestClient
+
+from chat_app import api
+from chat_app.services.assistant_registry import AssistantRegistry
+from chat_app.services.blob_store import (
+    DERIVED_DIR,
+    BlobStore,
+    UnsupportedBlobTypeError,
+    blob_src,
+)
+from chat_app.services.uploads import MAX_UPLOAD_BYTES
+from chat_app.states import layout_state
+
+
+class FakeUpload:
+    def __init__(self, name: str, content: bytes):
+        self.name = name
+        self._file = io.BytesIO(content)
+
+    async def read(self, size: int = -1) -> bytes:
+        return self._file.read(size)
+
+
+def put(
+    store: BlobStore,
+    content: bytes,
+    name: str = "logo.png",
+    holder: str | None = None,
+) -> str:
+    return asyncio.run(store.put(FakeUpload(name, content), holder=holder))
+
+
+def derive(store: BlobStore, name: str) -> None:
+    (store.root / DERIVED_DIR).mkdir(exist_ok=True)
+    stem = name.split(".")[0]
+    (store.root / DERIVED_DIR / f"{stem}-abc-320.webp").write_bytes(b"thumb")
+
+
+def test_identical_uploads_share_one_blob():
+    store = BlobStore()
+
+    first = put(store, b"image", "a.png")
+    second = put(store, b"image", "b.png")
+
+    assert first == second
+    assert store.path_for(first).read_bytes() == b"image"
+    assert store.path_for("../escape") is None
+
+
+def test_non_image_uploads_are_rejected():
+    store = BlobStore()
+
+    with pytest.raises(UnsupportedBlobTypeError):
+        put(store, b"<script>alert(1)</script>", "x.html")
+    with pytest.raises(UnsupportedBlobTypeError):
+        put(store, b"<svg onload='alert(1)'/>", "x.svg")
+    assert not store.root.exists() or list(store.root.iterdir()) == []
+
+
+def test_blobs_are_served_with_their_image_type_and_nosniff(monkeypatch):
+    store = BlobStore()
+    monkeypatch.setattr(api, "blob_store", store)
+    name = put(store, b"image", "logo.PNG")
+    (store.root / "legacy.html").write_bytes(b"<html></html>")
+    client = TestClient(api.api)
+
+    response = client.get(store.url_for(name))
+    assert response.headers["content-type"] == "image/png"
+    assert response.headers["x-content-type-options"] == "nosniff"
+
+    response = client.get(store.url_for("legacy.html"))
+    assert response.headers["content-type"] == "application/octet-stream"
+    assert response.headers["x-content-type-options"] == "nosniff"
+
+
+def test_release_deletes_blob_and_derived_files_with_last_reference():
+    store = BlobStore()
+    name = put(store, b"image")
+    derive(store, name)
+    store.retain(name)
+    store.retain(name)
+
+    store.release(name)
+    assert store.path_for(name).exists()
+
+    store.release(name)
+    assert not store.path_for(name).exists()
+    assert list((store.root / DERIVED_DIR).iterdir()) == []
+
+
+def test_discard_keeps_referenced_blobs():
+    store = BlobStore()
+    used = put(store, b"used")
+    unused = put(store, b"unused")
+    store.retain(used)
+
+    assert not store.discard(used)
+    assert store.discard(unused)
+    assert store.path_for(used).exists()
+    assert not store.path_for(unused).exists()
+
+
+def test_pending_uploads_of_the_same_bytes_are_held_per_session():
+    store = BlobStore()
+    name = put(store, b"image", holder="session-a")
+    assert put(store, b"image", holder="session-b") == name
+
+    # Session A replaces its upload; session B is still about to use it.
+    assert not store.discard(name, "session-a")
+    assert store.path_for(name).exists()
+    store.retain(name)
+
+    # Session B's form is reset after creating its assistant.
+    assert not store.discard(name, "session-b")
+    store.release(name)
+    assert not store.path_for(name).exists()
+
+
+def test_retaining_a_missing_blob_fails():
+    store = BlobStore()
+    name = put(store, b"image")
+    assert store.discard(name)
+
+    with pytest.raises(LookupError):
+        store.retain(name)
+
+
+def test_sweep_expires_old_holds():
+    store = BlobStore()
+    name = put(store, b"image", holder="session-a")
+
+    assert store.sweep(grace=60) == 0
+    assert store.sweep(grace=-1) == 1
+    assert not store.path_for(name).exists()
+
+
+def test_sweep_only_deletes_old_unreferenced_blobs():
+    store = BlobStore()
+    used = put(store, b"used")
+    unused = put(store, b"unused")
+    store.retain(used)
+
+    assert store.sweep(grace=60) == 0
+    assert store.sweep(grace=-1) == 1
+    assert store.path_for(used).exists()
+    assert not store.path_for(unused).exists()
+
+
+def test_replacing_and_deleting_template_images_moves_references(monkeypatch):
+    store = BlobStore()
+    monkeypatch.setattr(layout_state, "blob_store", store)
+    monkeypatch.setattr(layout_state, "assistant_registry", AssistantRegistry())
+    first = put(store, b"first")
+    second = put(store, b"second")
+
+    entry = asyncio.run(
+        layout_state._append_assistant_template(
+            "Fleet", "Fleet cover", image_src=store.url_for(first)
+        )
+    )
+    assert store.refcount(first) == 1
+
+    asyncio.run(
+        layout_state._update_assistant_template(
+            entry["id"], image_src=store.url_for(second)
+        )
+    )
+    assert not store.path_for(first).exists()
+    assert store.refcount(second) == 1
+
+    asyncio.run(layout_state._delete_assistant_template(entry["id"]))
+    assert not store.path_for(second).exists()
+
+
+def test_blob_src_resolves_store_urls_against_the_backend():
+    js = str(blob_src("/_blobs/a-1-320.webp 320w, /_blobs/a-1-640.webp 640w"))
+
+    assert "getBackendURL(env.UPLOAD)" in js
+    assert r"/(^|, )\/_blobs\//g" in js
+
+
+def test_rejected_image_uploads_are_reported_to_the_user():
+    state = types.SimpleNamespace(
+        assistant_dialog_open=False,
+        assistant_dialog_message="",
+        assistant_image_src="",
+        router=types.SimpleNamespace(
+            session=types.SimpleNamespace(client_token="session")
+        ),
+    )
+    upload = layout_state.LayoutState.handle_image_upload.fn
+
+    too_big = FakeUpload("big.png", b"x" * (MAX_UPLOAD_BYTES + 1))
+    asyncio.run(upload(state, [too_big]))
+    assert state.assistant_dialog_open
+    assert "upload limit" in state.assistant_dialog_message
+
+    asyncio.run(upload(state, [FakeUpload("x.html", b"<html></html>")]))
+    assert state.assistant_dialog_message.startswith("Image upload failed: only")
+    assert state.assistant_image_src == ""
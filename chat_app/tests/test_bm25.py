@@ -0,0 +1,74 @@
+import io
+
+import numpy as np
+import pytest
+
+from chat_app.services import local_engine as local_engine_module
+from chat_app.services.bm25 import BM25Index, search_segments, tokenize
+from chat_app.services.local_engine import LocalEngine, PassageStore
+
+PASSAGES = [
+    "Fleet cover includes every vehicle on the schedule.",
+    "Named drivers must hold a full licence.",
+    "Claims are paid within thirty days.",
+    "Fleet claims need the vehicle registration.",
+    "Motor cover excludes racing and track days.",
+]
+
+
+def test_segments_search_like_one_index():
+    whole = BM25Index.build([tokenize(p) for p in PASSAGES])
+    parts = [
+        BM25Index.build([tokenize(p) for p in PASSAGES[:2]]),
+        BM25Index.build([tokenize(p) for p in PASSAGES[2:]]),
+    ]
+    query = tokenize("fleet vehicle claims")
+
+    expected = whole.search(query, k=3)
+    hits = search_segments(parts, query, k=3)
+
+    assert [(segment * 2 + doc, score) for segment, doc, score in hits] == [
+        (doc, score) for doc, score in expected
+    ]
+
+
+def test_merged_segments_equal_one_built_index(tmp_path):
+    parts = [PASSAGES[:2], PASSAGES[2:3], PASSAGES[3:]]
+    indexes, stores = [], []
+    for i, part in enumerate(parts):
+        directory = tmp_path / str(i)
+        passages = [{"text": text, "document": f"doc{i % 2}"} for text in part]
+        BM25Index.build([tokenize(p) for p in part]).save(directory)
+        PassageStore.save(directory, passages)
+        indexes.append(BM25Index.load(directory))
+        stores.append(PassageStore.load(directory))
+
+    BM25Index.merge(tmp_path / "merged", indexes)
+    PassageStore.merge(tmp_path / "merged", stores)
+
+    merged = BM25Index.load(tmp_path / "merged")
+    whole = BM25Index.build([tokenize(p) for p in PASSAGES])
+    for name in ("terms", "offsets", "doc_ids", "term_freqs", "doc_lengths"):
+        np.testing.assert_array_equal(getattr(merged, name), getattr(whole, name))
+    assert merged.avg_length == pytest.approx(whole.avg_length)
+    passages = PassageStore.load(tmp_path / "merged")
+    assert [p["text"] for p in passages] == PASSAGES
+    assert [p["document"] for p in passages] == ["doc0"] * 2 + ["doc1"] + ["doc0"] * 2
+
+
+def test_local_engine_merges_segments_and_keeps_answering(monkeypatch):
+    monkeypatch.setattr(local_engine_module, "LOCAL_ENGINE_MAX_SEGMENTS", 2)
+    engine = LocalEngine()
+    kb = None
+    for i, text in enumerate(PASSAGES):
+        added = engine.add_document(f"doc{i}.txt", io.BytesIO(text.encode()), kb)
+        kb = added["knowledge_base_id"]
+
+    manifest = engine._manifest(kb)
+    assert len(manifest["segments"]) <= 2
+    assert sorted(p.name for p in engine._kb_dir(kb).iterdir()) == sorted(
+        manifest["segments"] + ["CURRENT"]
+    )
+    hit = engine.search(kb, "racing track")[0]
+    assert hit["text"] == PASSAGES[4]
+    assert hit["document"] == "doc4.txt"
@@ -0,0 +1,71 @@
+import asyncio
+import types
+
+from chat_app.services.conversations import ConversationStore, conversations
+from chat_app.states import chat_state
+from chat_app.states.chat_state import ChatState
+
+
+def message(seq: int) -> dict:
+    return {"text": f"message {seq}", "is_ai": seq % 2 == 1, "seq": seq}
+
+
+def record(store: ConversationStore, count: int, kb: str = "kb") -> None:
+    for seq in range(count):
+        store.record("session", kb, message(seq))
+
+
+def test_conversation_is_read_back_a_page_at_a_time():
+    store = ConversationStore()
+    record(store, 5)
+
+    async def pages():
+        latest = await store.page("session", "kb", limit=2)
+        older = await store.page("session", "kb", before=3, limit=3)
+        return latest, older
+
+    (latest, has_older), (older, has_more) = asyncio.run(pages())
+    assert [m["seq"] for m in latest] == [3, 4] and has_older
+    assert [m["seq"] for m in older] == [0, 1, 2] and not has_more
+    assert latest[1] == message(4)
+    assert store.stats() == {"pending": 0, "batches": 1, "written": 5}
+
+
+def test_cleared_conversation_stays_cleared_and_remembers_the_assistant():
+    store = ConversationStore()
+    record(store, 2)
+    store.clear("session", "kb")
+
+    async def read():
+        return await store.page("session", "kb"), await store.last_assistant(
+            "session"
+        )
+
+    (messages, has_older), last = asyncio.run(read())
+    assert messages == [] and not has_older
+    assert last == "kb"
+
+
+def test_loading_earlier_messages_stops_at_the_history_cap(monkeypatch):
+    monkeypatch.setattr(chat_state, "CHAT_HISTORY_PAGE_SIZE", 4)
+    monkeypatch.setattr(chat_state, "CHAT_HISTORY_MAX_MESSAGES", 6)
+    record(conversations, 20)
+    chat = types.SimpleNamespace(
+        messages=[],
+        has_older_messages=False,
+        knowledge_base_id="kb",
+        router=types.SimpleNamespace(
+            session=types.SimpleNamespace(client_token="session")
+        ),
+    )
+
+    async def scroll_back():
+        await ChatState._load_conversation(chat)
+        assert [m["seq"] for m in chat.messages] == [16, 17, 18, 19]
+        assert chat.has_older_messages
+        await ChatState.load_older.fn(chat)
+        await ChatState.load_older.fn(chat)
+
+    asyncio.run(scroll_back())
+    assert [m["seq"] for m in chat.messages] == list(range(14, 20))
+    assert not chat.has_older_messages
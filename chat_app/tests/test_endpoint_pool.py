@@ -0,0 +1,86 @@
+import asyncio
+
+import httpx
+import pytest
+
+from chat_app.services import endpoint_pool
+from chat_app.services.endpoint_pool import EndpointPool
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(endpoint_pool.time, "monotonic", lambda: now[0])
+    return now
+
+
+def fail(pool: EndpointPool, times: int) -> None:
+    async def main():
+        for _ in range(times):
+            with pytest.raises(httpx.ConnectError):
+                async with pool.acquire():
+                    raise httpx.ConnectError("down")
+
+    asyncio.run(main())
+
+
+def test_failing_replica_is_ejected_until_the_period_ends(clock):
+    pool = EndpointPool(["http://a", "http://b"])
+    a, b = pool.endpoints
+
+    fail(pool, 1)
+    b.outstanding = 1  # Keep picking "a" while it fails.
+    fail(pool, endpoint_pool.EJECT_AFTER_FAILURES - 1)
+
+    assert not a.available
+    assert pool.pick() is b
+    clock[0] += endpoint_pool.EJECT_SECONDS
+    assert a.available
+    assert pool.pick() is a
+
+
+def test_client_errors_do_not_eject_a_replica():
+    pool = EndpointPool(["http://a", "http://b"])
+    response = httpx.Response(404, request=httpx.Request("GET", "http://a"))
+
+    async def main():
+        for _ in range(endpoint_pool.EJECT_AFTER_FAILURES):
+            with pytest.raises(httpx.HTTPStatusError):
+                async with pool.acquire() as endpoint:
+                    assert endpoint is pool.endpoints[0]
+                    response.raise_for_status()
+
+    asyncio.run(main())
+    assert pool.endpoints[0].available
+
+
+def test_successful_probe_readmits_an_ejected_replica(clock):
+    pool = EndpointPool(["http://a", "http://b"])
+    a, b = pool.endpoints
+    b.outstanding = 1
+    fail(pool, endpoint_pool.EJECT_AFTER_FAILURES)
+    assert not a.available
+
+    def handler(request):
+        return httpx.Response(200 if request.url.host == "a" else 503)
+
+    def get_client(base_url):
+        return httpx.AsyncClient(
+            base_url=base_url, transport=httpx.MockTransport(handler)
+        )
+
+    async def main():
+        for endpoint in pool.endpoints:
+            await pool._probe(endpoint, get_client)
+
+    asyncio.run(main())
+    assert a.available and a.failures == 0
+    assert b.failures == 1
+
+
+def test_every_replica_ejected_still_serves_requests(clock):
+    pool = EndpointPool(["http://a"])
+    fail(pool, endpoint_pool.EJECT_AFTER_FAILURES)
+
+    assert not pool.endpoints[0].available
+    assert pool.pick() is pool.endpoints[0]
@@ -0,0 +1,124 @@
+import asyncio
+import types
+
+from chat_app.services import generations as generations_module
+from chat_app.services.generations import GenerationTracker
+from chat_app.states.chat_state import ChatState
+
+
+class FakeNamespace:
+    def __init__(self, tokens):
+        self.token_to_sid = {token: f"sid-{token}" for token in tokens}
+
+
+def _fast_reaper(monkeypatch):
+    monkeypatch.setattr(generations_module, "GENERATION_REAP_INTERVAL", 0.01)
+    monkeypatch.setattr(generations_module, "GENERATION_DISCONNECT_GRACE", 0.03)
+
+
+async def _track(tracker, token, started):
+    tracker.start(token, 0)
+    started.set()
+    await asyncio.sleep(10)
+
+
+def test_reaper_cancels_generations_of_disconnected_clients(monkeypatch):
+    _fast_reaper(monkeypatch)
+    namespace = FakeNamespace(["gone", "here"])
+    rx_app = types.SimpleNamespace(event_namespace=namespace)
+    tracker = GenerationTracker()
+
+    async def scenario():
+        async with tracker.lifespan(rx_app):
+            started = [asyncio.Event(), asyncio.Event()]
+            gone = asyncio.create_task(_track(tracker, "gone", started[0]))
+            here = asyncio.create_task(_track(tracker, "here", started[1]))
+            await asyncio.gather(*(event.wait() for event in started))
+            del namespace.token_to_sid["gone"]
+            await asyncio.sleep(0.2)
+            assert gone.cancelled()
+            assert not here.done()
+            here.cancel()
+
+    asyncio.run(scenario())
+    assert tracker.cancelled == 1
+
+
+def test_reaper_spares_clients_that_reconnect_within_the_grace(monkeypatch):
+    _fast_reaper(monkeypatch)
+    monkeypatch.setattr(generations_module, "GENERATION_DISCONNECT_GRACE", 0.2)
+    namespace = FakeNamespace(["flaky"])
+    tracker = GenerationTracker()
+
+    async def scenario():
+        async with tracker.lifespan(types.SimpleNamespace(event_namespace=namespace)):
+            started = asyncio.Event()
+            task = asyncio.create_task(_track(tracker, "flaky", started))
+            await started.wait()
+            del namespace.token_to_sid["flaky"]
+            await asyncio.sleep(0.05)
+            namespace.token_to_sid["flaky"] = "new-sid"
+            await asyncio.sleep(0.3)
+            assert not task.done()
+            task.cancel()
+
+    asyncio.run(scenario())
+    assert tracker.cancelled == 0
+
+
+def test_reaper_survives_an_app_without_event_namespace(monkeypatch):
+    _fast_reaper(monkeypatch)
+    tracker = GenerationTracker()
+
+    async def scenario():
+        async with tracker.lifespan(object()):
+            started = asyncio.Event()
+            task = asyncio.create_task(_track(tracker, "token", started))
+            await started.wait()
+            await asyncio.sleep(0.1)
+            assert not task.done()
+            task.cancel()
+
+    asyncio.run(scenario())
+
+
+def _chat(messages, pending=()):
+    chat = types.SimpleNamespace(
+        messages=messages,
+        pending_messages=list(pending),
+        queue_position=3,
+        typing=True,
+        knowledge_base_id="kb",
+        router=types.SimpleNamespace(
+            session=types.SimpleNamespace(client_token="token")
+        ),
+    )
+    chat._set_reply = lambda reply: ChatState._set_reply(chat, reply)
+    return chat
+
+
+def test_abandoned_reply_unsticks_the_chat():
+    chat = _chat(
+        [
+            {"text": "question", "is_ai": False, "seq": 0},
+            {"text": "", "is_ai": True, "seq": 1},
+        ],
+        pending=["follow-up"],
+    )
+    ChatState._abandon_reply(chat)
+    assert chat.messages == [{"text": "question", "is_ai": False, "seq": 0}]
+    assert chat.pending_messages == []
+    assert not chat.typing
+    assert chat.queue_position == 0
+
+
+def test_abandoned_reply_keeps_partial_text():
+    chat = _chat(
+        [
+            {"text": "question", "is_ai": False, "seq": 0},
+            {"text": "Partial ans", "is_ai": True, "seq": 1},
+        ]
+    )
+    ChatState._abandon_reply(chat)
+    assert chat.messages[-1]["text"] == "Partial ans"
+    assert not chat.typing
@@ -0,0 +1,117 @@
+import asyncio
+import hashlib
+
+import pytest
+
+from chat_app.services import backend_client
+from chat_app.services.kb_versions import KnowledgeBaseVersions
+from chat_app.states import layout_state
+
+
+def spool(tmp_path, names: list[str]) -> list[dict]:
+    files = []
+    for name in names:
+        path = tmp_path / name
+        content = f"{name} covers vehicles, drivers and claims.\n".encode()
+        path.write_bytes(content)
+        files.append(
+            {
+                "name": name,
+                "path": str(path),
+                "sha256": hashlib.sha256(content).hexdigest(),
+            }
+        )
+    return files
+
+
+def ingest_job(tmp_path, names: list[str]) -> dict:
+    return {
+        "payload": {"assistant_id": "assistant", "files": spool(tmp_path, names)},
+        "progress": None,
+        "attempts": 1,
+        "max_attempts": 3,
+    }
+
+
+async def report(progress: dict) -> None:
+    pass
+
+
+@pytest.fixture
+def local_engine(monkeypatch):
+    monkeypatch.setattr(backend_client, "ENGINE", "local")
+    return backend_client.local_engine
+
+
+def test_local_ingest_counts_each_document_once(tmp_path, local_engine):
+    job = ingest_job(tmp_path, ["fleet.txt", "motor.txt", "home.txt"])
+
+    result = asyncio.run(layout_state._run_ingest_job(job, report))
+
+    assert result["template"]["kb_documents"] == 3
+    assert result["errors"] == []
+    # Every file that changed the knowledge base bumped its version, as
+    # seen by any other worker.
+    kb_id = result["template"]["knowledge_base_id"]
+    assert asyncio.run(KnowledgeBaseVersions().get(kb_id)) == 3
+
+
+def test_local_ingest_of_an_indexed_document_adds_it_once(tmp_path, local_engine):
+    [file] = spool(tmp_path, ["fleet.txt"])
+
+    with open(file["path"], "rb") as f:
+        first = local_engine.add_document("fleet.txt", f)
+    with open(file["path"], "rb") as f:
+        again = local_engine.add_document("fleet.txt", f, first["knowledge_base_id"])
+
+    assert first["documents"] == again["documents"] == 1
+    assert again["message"] == "fleet.txt is already indexed"
+
+
+def fake_backend(monkeypatch, returned_id) -> list:
+    calls = []
+
+    async def ingest(file_name, chunks, knowledge_base_id=None):
+        async for _chunk in chunks:
+            pass
+        calls.append((file_name, knowledge_base_id))
+        return {"knowledge_base_id": returned_id(file_name), "documents": 1}
+
+    monkeypatch.setattr(backend_client, "ingest", ingest)
+    return calls
+
+
+def test_backend_that_cannot_append_fails_the_rest_without_retrying(
+    tmp_path, monkeypatch
+):
+    # A backend ignoring the knowledge_base_id field makes a new one per file.
+    calls = fake_backend(monkeypatch, lambda name: f"kb-{name}")
+    monkeypatch.setattr(layout_state, "INGEST_CONCURRENCY", 1)
+    job = ingest_job(tmp_path, ["fleet.txt", "motor.txt", "home.txt"])
+    reported = []
+
+    async def record(progress: dict) -> None:
+        reported.append({f["name"]: f["status"] for f in progress["files"]})
+
+    result = asyncio.run(layout_state._run_ingest_job(job, record))
+
+    assert calls == [("fleet.txt", None), ("motor.txt", "kb-fleet.txt")]
+    assert result["template"]["knowledge_base_id"] == "kb-fleet.txt"
+    assert result["template"]["kb_documents"] == 1
+    assert len(result["errors"]) == 2
+    assert "cannot combine" in result["errors"][0]
+    assert reported[-1] == {
+        "fleet.txt": "done",
+        "motor.txt": "failed",
+        "home.txt": "failed",
+    }
+
+
+def test_appended_file_returned_without_a_knowledge_base_is_retried(
+    tmp_path, monkeypatch
+):
+    fake_backend(monkeypatch, lambda name: "kb-1" if name == "fleet.txt" else None)
+    job = ingest_job(tmp_path, ["fleet.txt", "motor.txt"])
+
+    with pytest.raises(RuntimeError, match="could not be ingested"):
+        asyncio.run(layout_state._run_ingest_job(job, report))
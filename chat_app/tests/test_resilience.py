@@ -0,0 +1,79 @@
+import pytest
+
+from chat_app.services import resilience
+from chat_app.services.resilience import CircuitBreaker, CircuitOpenError, RetryBudget
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(resilience.time, "monotonic", lambda: now[0])
+    return now
+
+
+def open_breaker(clock) -> CircuitBreaker:
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10)
+    breaker.allow()
+    breaker.record_failure()
+    breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+    clock[0] += 10
+    assert breaker.state == "half-open"
+    return breaker
+
+
+def test_half_open_breaker_lets_one_trial_through(clock):
+    breaker = open_breaker(clock)
+
+    breaker.allow()
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == "closed"
+    breaker.allow()
+    assert breaker.stats() == {"state": "closed", "failures": 0, "rejected": 2}
+
+
+def test_failed_trial_reopens_the_breaker(clock):
+    breaker = open_breaker(clock)
+
+    breaker.allow()
+    breaker.record_failure()
+
+    assert breaker.state == "open"
+    clock[0] += 10
+    breaker.allow()
+
+
+def test_abandoned_trial_frees_the_slot_for_another(clock):
+    breaker = open_breaker(clock)
+    breaker.allow()
+
+    breaker.abandon()
+
+    assert breaker.state == "half-open"
+    breaker.allow()
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+
+
+def test_retry_budget_is_refilled_by_requests_only():
+    budget = RetryBudget(ratio=0.5, max_tokens=2)
+
+    assert budget.try_spend()
+    assert budget.try_spend()
+    assert not budget.try_spend()
+
+    budget.record_request()
+    assert not budget.try_spend()
+    budget.record_request()
+    assert budget.try_spend()
+
+    for _ in range(10):
+        budget.record_request()
+    assert budget.tokens == 2
+    assert budget.stats() == {"tokens": 2, "retries": 3, "exhausted": 2}
@@ -0,0 +1,80 @@
+import time
+
+from chat_app.services.semantic_cache import SemanticCache, analyse_query
+
+ANSWER = "Fleet cover includes vehicles and named drivers."
+
+
+def cache_with_answer(**kwargs) -> SemanticCache:
+    cache = SemanticCache(**kwargs)
+    cache.set("kb", "what does fleet cover", ANSWER)
+    cache.set("kb", "how do I make a claim", "Call us.")
+    cache.set("kb", "what does motor insurance cost", "It depends.")
+    return cache
+
+
+def test_paraphrase_is_answered():
+    cache = cache_with_answer()
+
+    assert cache.get("kb", "what is covered under fleet policy") == ANSWER
+    assert cache.get("kb", "What's covered by the fleet?") == ANSWER
+
+
+def test_negated_question_is_not_answered():
+    cache = cache_with_answer()
+
+    assert cache.get("kb", "what does fleet not cover") is None
+    assert cache.get("kb", "What doesn't fleet cover?") is None
+
+
+def test_different_question_on_the_same_subject_is_not_answered():
+    cache = cache_with_answer()
+
+    assert cache.get("kb", "what does fleet cost") is None
+    assert cache.get("kb", "when does fleet cover") is None
+
+
+def test_guard_words_are_kept_apart_from_content_words():
+    assert analyse_query("What doesn't the fleet cover?") == (
+        ["fleet", "cover"],
+        frozenset({"what", "not"}),
+    )
+
+
+def test_answers_expire_with_the_ttl():
+    cache = cache_with_answer(ttl=0.05)
+    time.sleep(0.1)
+
+    assert cache.get("kb", "what does fleet cover") is None
+
+
+def test_answers_are_kept_per_knowledge_base():
+    cache = cache_with_answer()
+
+    assert cache.get("other", "what does fleet cover") is None
+    cache.invalidate("kb")
+    assert cache.get("kb", "what does fleet cover") is None
+
+
+def test_oldest_questions_are_dropped_when_full():
+    cache = SemanticCache(max_entries=2)
+    for topic in ("fleet", "motor", "home"):
+        cache.set("kb", f"what does {topic} cover", topic)
+
+    assert cache.get("kb", "what does fleet cover") is None
+    assert cache.get("kb", "what does home cover") == "home"
+
+
+def test_answers_are_only_served_for_their_kb_version():
+    cache = SemanticCache()
+    cache.set("kb", "what does fleet cover", ANSWER, 1)
+
+    assert cache.get("kb", "what does fleet cover", 1) == ANSWER
+    assert cache.get("kb", "what does fleet cover", 2) is None
+
+    # A slow request answered before the change does not come back...
+    cache.set("kb", "what does fleet cover", "New cover.", 2)
+    cache.set("kb", "what does fleet cover", ANSWER, 1)
+    assert cache.get("kb", "what does fleet cover", 2) == "New cover."
+    # ...and the newer version replaced the older entries.
+    assert cache.get("kb", "what does fleet cover", 1) is None
@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+from chat_app.services.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_result():
+    flights = SingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "Vehicles."
+
+    async def main():
+        return await asyncio.gather(*(flights.do("key", fetch) for _ in range(3)))
+
+    assert asyncio.run(main()) == ["Vehicles."] * 3
+    assert len(calls) == 1
+    assert flights.stats() == {"in_flight": 0, "leaders": 1, "collapsed": 2}
+
+
+def test_a_waiter_takes_over_when_the_leader_is_cancelled():
+    flights = SingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return f"answer {len(calls)}"
+
+    async def main():
+        leader = asyncio.create_task(flights.do("key", fetch))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(flights.do("key", fetch))
+        await asyncio.sleep(0)
+
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await waiter
+
+    assert asyncio.run(main()) == "answer 2"
+    assert len(calls) == 2
+    assert flights.stats() == {"in_flight": 0, "leaders": 2, "collapsed": 0}
+
+
+def test_a_cancelled_waiter_leaves_the_shared_call_running():
+    flights = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.01)
+        return "Vehicles."
+
+    async def main():
+        leader = asyncio.create_task(flights.do("key", fetch))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(flights.do("key", fetch))
+        await asyncio.sleep(0)
+
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        return await leader
+
+    assert asyncio.run(main()) == "Vehicles."
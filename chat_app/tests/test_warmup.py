@@ -0,0 +1,66 @@
+import asyncio
+
+import httpx
+
+from chat_app.services import backend_client
+from chat_app.services.warmup import Warmer
+
+
+def test_warm_ups_are_deduplicated_within_the_ttl(monkeypatch):
+    warmed = []
+
+    async def warm(knowledge_base_id):
+        warmed.append(knowledge_base_id)
+
+    monkeypatch.setattr(backend_client, "warm", warm)
+    warmer = Warmer(ttl=60)
+
+    async def main():
+        assert warmer.warm("kb")
+        assert not warmer.warm("kb")
+        assert warmer.warm("other")
+        await asyncio.gather(*warmer._tasks)
+
+    asyncio.run(main())
+    assert warmed == ["kb", "other"]
+    assert warmer.stats()["deduplicated"] == 1
+
+
+def test_failed_warm_up_is_not_retried_straight_away(monkeypatch):
+    async def warm(knowledge_base_id):
+        raise httpx.ConnectError("down")
+
+    monkeypatch.setattr(backend_client, "warm", warm)
+    warmer = Warmer(ttl=60, failure_ttl=60)
+
+    async def main():
+        warmer.warm("kb")
+        await asyncio.gather(*warmer._tasks)
+        return warmer.warm("kb")
+
+    assert not asyncio.run(main())
+    assert warmer.stats()["failed"] == 1
+
+
+def test_remote_warm_ups_stop_after_a_client_error(monkeypatch):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(404)
+
+    client = httpx.AsyncClient(
+        base_url="http://backend", transport=httpx.MockTransport(handler)
+    )
+    monkeypatch.setattr(backend_client, "ENGINE", "remote")
+    monkeypatch.setattr(backend_client, "get_client", lambda base_url: client)
+    monkeypatch.setattr(backend_client, "_remote_warm_supported", True)
+
+    async def main():
+        await backend_client.warm("kb")
+        await backend_client.warm("kb")
+        await client.aclose()
+
+    asyncio.run(main())
+    assert len(requests) == 1
+    assert not backend_client._remote_warm_supported